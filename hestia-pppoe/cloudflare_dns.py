@@ -2,81 +2,305 @@
 # Funciones para interactuar con la API de Cloudflare
 # Todos los comentarios y documentación estarán en español.
 
-import requests
 import random
+import requests
+import threading
 import time
-from typing import List, Dict, Any, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from filter_utils import filter_excluded
+from logger import get_logger
+from rate_limiter import TokenBucketRateLimiter
+from http_client import create_session, DEFAULT_TIMEOUT
+import telemetry
+
+logger = get_logger(__name__)
+
+# Tamaño de página solicitado a la API para minimizar viajes de ida y vuelta.
+# Zonas: 50 es el máximo documentado del endpoint.
+# Registros DNS: el endpoint devuelve 100 por omisión y admite hasta 5.000.000 por página; se piden
+# 5000 para acotar el tamaño de cada respuesta. La paginación sigue 'result_info.total_pages', por lo
+# que el recorrido es correcto aunque la API devuelva páginas más pequeñas.
+ZONES_MAX_PER_PAGE = 50
+DNS_RECORDS_PER_PAGE = 5000
+
+# Máximo de cambios por petición al endpoint de lotes (límite del plan gratuito de Cloudflare)
+BATCH_MAX_CHANGES = 200
 
-# Estas funciones asumen que el token y la URL base se obtienen de variables de entorno o configuración externa
+# Reintentos ante límite de tasa (429), errores del servidor (5xx) y errores de conexión
+DEFAULT_RETRY_ATTEMPTS = 3
+# Segundos de espera por reintentos que puede acumular una ejecución completa
+DEFAULT_RETRY_BUDGET = 60
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 30
 
 
-def _delay_before_request():
+def is_retryable_status(status_code: int) -> bool:
+    """Indica si una respuesta de Cloudflare es transitoria: límite de tasa o error del servidor."""
+    return status_code == 429 or status_code >= 500
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
     """
-    Añade un retraso aleatorio alrededor del minimo 204ms antes de cada petición a la API.
-    Esto ayuda a evitar sobrecargar los servidores de Cloudflare.
+    Interpreta la cabecera Retry-After (segundos o fecha HTTP) y devuelve los segundos de espera,
+    o None si no viene o no es válida.
     """
-    time.sleep(random.uniform(0.14, 0.31))
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, OverflowError):
+        return None
 
 
-def find_zone_for_domain(api_base_url: str, api_token: str, domain: str) -> Optional[Dict[str, str]]:
+def backoff_delay(attempt: int, base: float = RETRY_BACKOFF_BASE, cap: float = RETRY_BACKOFF_MAX) -> float:
     """
-    Encuentra la zona de Cloudflare que corresponde a un dominio dado.
-    Si el dominio es un registro DNS (ej: subdominio.ejemplo.com), encuentra la zona padre (ej: ejemplo.com).
+    Espera antes del reintento número 'attempt' (desde 0): backoff exponencial con jitter completo,
+    para que los hilos que fallan a la vez no vuelvan a chocar en el mismo instante.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CloudflareClient:
+    """
+    Cliente de la API de Cloudflare.
+
+    Mantiene una única sesión HTTP con conexiones keep-alive y las cabeceras de autenticación
+    ya configuradas, el timeout por petición y el limitador de tasa compartido por todas las
+    funciones de este módulo. Se crea una vez por ejecución en main y se pasa a cada llamada.
+
+    Las respuestas 429 y 5xx y los errores de conexión se reintentan hasta 'max_retries' veces,
+    respetando Retry-After o con backoff exponencial, mientras quede presupuesto de espera
+    ('retry_budget' segundos por ejecución, ver reset_retry_budget).
+    """
+
+    def __init__(self, api_base_url: str, api_token: str, session: Optional[requests.Session] = None,
+                 timeout: float = DEFAULT_TIMEOUT, rate_limiter: Optional[TokenBucketRateLimiter] = None,
+                 max_retries: int = DEFAULT_RETRY_ATTEMPTS, retry_budget: float = DEFAULT_RETRY_BUDGET):
+        self.api_base_url = api_base_url.rstrip("/")
+        self.session = session or create_session()
+        self.session.headers.update({"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"})
+        self.timeout = timeout
+        # Límite global de la API de Cloudflare: 1200 peticiones cada 5 minutos
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter(max_requests=1200, window_seconds=300, burst=100)
+        # Peticiones realizadas por el cliente (para medir el costo de cada etapa)
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        # Reintentos realizados por el cliente
+        self.retry_count = 0
+        self._retry_lock = threading.Lock()
+        self.reset_retry_budget()
+
+    def reset_retry_budget(self):
+        """Restablece el presupuesto de espera por reintentos; se llama al inicio de cada ejecución."""
+        with self._retry_lock:
+            self._retry_budget_left = float(self.retry_budget)
+
+    def _reserve_retry(self, delay: float) -> bool:
+        """Descuenta 'delay' del presupuesto de reintentos; devuelve False si no alcanza."""
+        with self._retry_lock:
+            if delay > self._retry_budget_left:
+                return False
+            self._retry_budget_left -= delay
+            self.retry_count += 1
+            return True
+
+    def request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        """
+        Realiza una petición a la API respetando el limitador de tasa y devuelve el JSON de respuesta.
+
+        Los errores transitorios (429, 5xx, errores de conexión y timeouts) se reintentan: la espera
+        es la indicada por Retry-After o, si no viene, un backoff exponencial con jitter. Un 429
+        detiene el limitador de tasa durante la espera, de modo que todos los hilos frenan y no solo
+        el que recibió la respuesta. Repetir una escritura tras un timeout no tiene efectos adicionales:
+        los registros sueltos se escriben con PUT y los lotes (POST a /dns_records/batch, ver
+        batch_patch_dns_records) solo llevan 'patches' que fijan valores absolutos (contenido, TTL y
+        proxy) de registros existentes, sin altas ni bajas, por lo que aplicar dos veces el mismo
+        lote deja los registros igual que aplicarlo una vez.
+
+        Lanza requests.HTTPError si la respuesta no es exitosa (o sigue fallando al agotar los
+        reintentos o el presupuesto de espera) y requests.RequestException ante errores de conexión.
+        """
+        attempt = 0
+        while True:
+            waited = self.rate_limiter.acquire()
+            if waited > 0:
+                logger.debug(f"Límite de tasa de Cloudflare alcanzado, esperando {waited:.2f}s")
+                telemetry.incr("rate_limit_wait_seconds", waited)
+            with self._count_lock:
+                self.request_count += 1
+
+            response = None
+            url = f"{self.api_base_url}{path}"
+            inicio = time.monotonic()
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, retry_after = e, None
+                motivo = type(e).__name__
+                telemetry.record_http(method, url, None, time.monotonic() - inicio)
+            else:
+                if not is_retryable_status(response.status_code):
+                    response.raise_for_status()
+                    return response.json()
+                error, retry_after = None, parse_retry_after(response.headers.get("Retry-After"))
+                motivo = f"HTTP {response.status_code}"
+
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            if attempt >= self.max_retries or not self._reserve_retry(delay):
+                logger.warning(f"Error transitorio de Cloudflare ({motivo}) en {method} {path}; sin más reintentos")
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+
+            attempt += 1
+            telemetry.incr("http_retries")
+            logger.warning(f"Error transitorio de Cloudflare ({motivo}) en {method} {path}; reintento {attempt}/{self.max_retries} en {delay:.2f}s")
+            if response is not None and response.status_code == 429:
+                self.rate_limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+    def close(self):
+        """Cierra las conexiones abiertas de la sesión."""
+        self.session.close()
+
+
+def build_zone_index(zones: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Construye un índice en memoria de las zonas de Cloudflare indexado por nombre de zona.
+    Se construye una sola vez por ejecución a partir del resultado de list_zones, de modo que
+    la búsqueda de la zona de cada dominio no requiere nuevas llamadas a la API.
     """
-    _delay_before_request()
-    zones = list_zones(api_base_url, api_token)
-    
-    # Ordenar zonas por longitud de nombre (más larga primero) para encontrar la coincidencia más específica
-    zones_sorted = sorted(zones, key=lambda z: len(z['name']), reverse=True)
-    
-    # Buscar la zona más específica que coincida con el dominio o sea un padre del mismo
-    domain_parts = domain.split('.')
+    return {zone['name'].lower().rstrip('.'): zone for zone in zones}
+
+
+def find_zone_in_index(zone_index: Dict[str, Dict[str, Any]], domain: str) -> Optional[Dict[str, Any]]:
+    """
+    Busca en el índice la zona más específica que corresponde a un dominio.
+    Recorre los sufijos del dominio de más largo a más corto (ej: a.b.ejemplo.com, b.ejemplo.com,
+    ejemplo.com), por lo que el costo es O(etiquetas) consultas al diccionario.
+    """
+    domain_parts = domain.lower().rstrip('.').split('.')
     for i in range(len(domain_parts) - 1):
-        possible_zone = '.'.join(domain_parts[i:])
-        for zone in zones_sorted:
-            if zone['name'] == possible_zone:
-                return zone
+        zone = zone_index.get('.'.join(domain_parts[i:]))
+        if zone:
+            return zone
     return None
 
 
-def list_zones(api_base_url: str, api_token: str) -> List[Dict[str, Any]]:
+def find_zone_for_domain(client: CloudflareClient, domain: str,
+                         zone_index: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[Dict[str, str]]:
+    """
+    Encuentra la zona de Cloudflare que corresponde a un dominio dado.
+    Si el dominio es un registro DNS (ej: subdominio.ejemplo.com), encuentra la zona padre (ej: ejemplo.com).
+    Si se proporciona 'zone_index' (ver build_zone_index) no se consulta la API.
+    """
+    if zone_index is None:
+        zone_index = build_zone_index(list_zones(client))
+    return find_zone_in_index(zone_index, domain)
+
+
+def _iter_paginated(client: CloudflareClient, path: str, params: Dict[str, Any], per_page: int) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre un endpoint paginado de Cloudflare y entrega los elementos de 'result' a medida que llegan.
+    Sigue 'result_info.total_pages'; al ser un generador, el llamador puede detenerse antes de la última página.
+    """
+    page = 1
+    while True:
+        data = client.request("GET", path, params={**params, "page": page, "per_page": per_page})
+        result = data.get("result") or []
+        yield from result
+
+        result_info = data.get("result_info") or {}
+        if not result or page >= result_info.get("total_pages", 1):
+            break
+        page += 1
+
+
+def iter_zones(client: CloudflareClient, per_page: int = ZONES_MAX_PER_PAGE) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre todas las páginas de zonas (dominios) de Cloudflare.
+    Entrega diccionarios con al menos 'id' y 'name'.
+    """
+    for z in _iter_paginated(client, "/zones", {}, per_page):
+        yield {"id": z["id"], "name": z["name"]}
+
+
+def iter_dns_records(client: CloudflareClient, zone_id: str, name: str = None,
+                     record_type: str = None, per_page: int = DNS_RECORDS_PER_PAGE) -> Iterator[Dict[str, Any]]:
     """
-    Obtiene la lista de zonas (dominios) de Cloudflare.
+    Recorre todas las páginas de registros DNS de una zona específica de Cloudflare.
+    Si se proporciona 'name' y/o 'record_type', filtra los registros en el servidor.
+    """
+    params = {}
+    if name:
+        params["name"] = name
+    if record_type:
+        params["type"] = record_type
+    yield from _iter_paginated(client, f"/zones/{zone_id}/dns_records", params, per_page)
+
+
+def list_zones(client: CloudflareClient) -> List[Dict[str, Any]]:
+    """
+    Obtiene la lista completa de zonas (dominios) de Cloudflare, recorriendo todas las páginas.
     Devuelve una lista de diccionarios con al menos 'id' y 'name'.
     """
-    _delay_before_request()
-    url = f"{api_base_url}/zones"
-    headers = {"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"}
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    data = response.json()
-    return [{"id": z["id"], "name": z["name"]} for z in data.get("result", [])]
+    return list(iter_zones(client))
 
 
-def list_dns_records(api_base_url: str, api_token: str, zone_id: str, name: str = None) -> List[Dict[str, Any]]:
+def list_dns_records(client: CloudflareClient, zone_id: str, name: str = None) -> List[Dict[str, Any]]:
     """
-    Obtiene los registros DNS de una zona específica de Cloudflare.
+    Obtiene los registros DNS de una zona específica de Cloudflare, recorriendo todas las páginas.
     Si se proporciona 'name', filtra los registros por ese nombre.
     """
-    _delay_before_request()
-    url = f"{api_base_url}/zones/{zone_id}/dns_records"
-    if name:
-        url += f"?name={name}"
-    headers = {"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"}
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    data = response.json()
-    return data.get("result", [])
+    return list(iter_dns_records(client, zone_id, name=name))
+
+
+def get_zone_a_records_snapshot(client: CloudflareClient, zone_id: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Obtiene en un solo barrido paginado todos los registros A de una zona y los indexa por nombre.
+    Reemplaza una consulta por dominio con una consulta por zona.
+    """
+    snapshot: Dict[str, List[Dict[str, Any]]] = {}
+    for record in iter_dns_records(client, zone_id, record_type="A"):
+        snapshot.setdefault(record["name"].lower(), []).append(record)
+    return snapshot
+
+
+def plan_zone_updates(snapshot: Dict[str, List[Dict[str, Any]]], domains: List[str], ip: str) -> Dict[str, List[Any]]:
+    """
+    Compara localmente los registros A de una zona (ver get_zone_a_records_snapshot) con la IP deseada.
+    Devuelve un diccionario con:
+    - 'update': registros que deben apuntar a la nueva IP
+    - 'unchanged': registros que ya tienen la IP
+    - 'missing': dominios sin registro A en la zona
+    """
+    plan: Dict[str, List[Any]] = {"update": [], "unchanged": [], "missing": []}
+    seen_ids = set()
+    for domain in domains:
+        records = snapshot.get(domain.lower())
+        if not records:
+            plan["missing"].append(domain)
+            continue
+        for record in records:
+            if record["id"] in seen_ids:
+                continue
+            seen_ids.add(record["id"])
+            plan["unchanged" if record["content"] == ip else "update"].append(record)
+    return plan
 
 
-def update_dns_record(api_base_url: str, api_token: str, zone_id: str, record_id: str, name: str, ip: str, ttl: int = 1, proxied: bool = False) -> Dict[str, Any]:
+def update_dns_record(client: CloudflareClient, zone_id: str, record_id: str, name: str, ip: str, ttl: int = 1, proxied: bool = False) -> Dict[str, Any]:
     """
     Actualiza el registro A de un dominio en Cloudflare con la nueva IP.
     """
-    _delay_before_request()
-    url = f"{api_base_url}/zones/{zone_id}/dns_records/{record_id}"
-    headers = {"Authorization": f"Bearer {api_token}", "Content-Type": "application/json"}
     payload = {
         "type": "A",
         "name": name,
@@ -84,6 +308,71 @@ def update_dns_record(api_base_url: str, api_token: str, zone_id: str, record_id
         "ttl": ttl,
         "proxied": proxied
     }
-    response = requests.put(url, headers=headers, json=payload)
-    response.raise_for_status()
-    return response.json()
+    return client.request("PUT", f"/zones/{zone_id}/dns_records/{record_id}", json=payload)
+
+
+def batch_patch_dns_records(client: CloudflareClient, zone_id: str, patches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Aplica varios cambios parciales (PATCH) a registros de una zona en una sola petición
+    mediante POST /zones/{zone_id}/dns_records/batch. Cloudflare ejecuta el lote como una
+    transacción: si un cambio falla, no se aplica ninguno.
+    Devuelve la lista de registros resultantes ('result.patches').
+    """
+    data = client.request("POST", f"/zones/{zone_id}/dns_records/batch", json={"patches": patches})
+    if not data.get("success", False):
+        raise requests.RequestException(f"Lote rechazado por Cloudflare: {data.get('errors')}")
+    return (data.get("result") or {}).get("patches") or []
+
+
+def _update_records_individually(client: CloudflareClient, zone_id: str, records: List[Dict[str, Any]],
+                                 ip: str, ttl: int, proxied: bool) -> List[Dict[str, Any]]:
+    """
+    Actualiza registros uno a uno con PUT. Se usa como respaldo cuando un lote falla.
+    """
+    results = []
+    for record in records:
+        try:
+            update_dns_record(client, zone_id, record["id"], record["name"], ip, ttl=ttl, proxied=proxied)
+            results.append({"id": record["id"], "name": record["name"], "status": "updated", "error": None})
+        except Exception as e:
+            results.append({"id": record["id"], "name": record["name"], "status": "error", "error": str(e)})
+    return results
+
+
+def apply_zone_updates(client: CloudflareClient, zone_id: str, records: List[Dict[str, Any]], ip: str,
+                       ttl: int = 1, proxied: bool = False, batch_size: int = BATCH_MAX_CHANGES,
+                       fallback_individual: bool = True) -> List[Dict[str, Any]]:
+    """
+    Actualiza con la nueva IP todos los registros indicados de una zona.
+    Los cambios se agrupan en lotes de hasta 'batch_size' registros (ver batch_patch_dns_records);
+    si un lote falla se reintenta registro a registro con PUT, salvo con 'fallback_individual' en
+    False, en cuyo caso todos los registros del lote quedan con error. Con 'batch_size' <= 1 se usa solo PUT.
+    Devuelve un resultado por registro: {'id', 'name', 'status' ('updated' | 'error'), 'error'}.
+    """
+    if batch_size <= 1:
+        return _update_records_individually(client, zone_id, records, ip, ttl, proxied)
+
+    results = []
+    for start in range(0, len(records), batch_size):
+        chunk = records[start:start + batch_size]
+        patches = [{"id": r["id"], "content": ip, "ttl": ttl, "proxied": proxied} for r in chunk]
+        try:
+            updated = {r["id"]: r for r in batch_patch_dns_records(client, zone_id, patches)}
+        except Exception as e:
+            if not fallback_individual:
+                logger.debug(f"Error en lote de {len(chunk)} registros en zona {zone_id}: {e}")
+                results.extend({"id": r["id"], "name": r["name"], "status": "error", "error": str(e)} for r in chunk)
+                continue
+            logger.warning(f"Error en lote de {len(chunk)} registros en zona {zone_id}: {e}. Reintentando registro a registro...")
+            results.extend(_update_records_individually(client, zone_id, chunk, ip, ttl, proxied))
+            continue
+
+        # Mapear el resultado del lote a cada registro solicitado
+        for record in chunk:
+            result = updated.get(record["id"])
+            if result and result.get("content") == ip:
+                results.append({"id": record["id"], "name": record["name"], "status": "updated", "error": None})
+            else:
+                results.append({"id": record["id"], "name": record["name"], "status": "error",
+                                "error": "El registro no figura actualizado en la respuesta del lote"})
+    return results
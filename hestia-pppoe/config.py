@@ -15,13 +15,58 @@ logger = get_logger(__name__)
 DEFAULT_CONFIG: Dict[str, Any] = {
     "CLOUDFLARE_API_BASE_URL": "https://api.cloudflare.com/client/v4",
     "IP_SERVICE_URLS": "https://api.ipify.org,https://ifconfig.me/ip",
+    "IP_SERVICE_MODE": "race",  # serial: uno tras otro; race: en paralelo, gana la primera respuesta válida
+    "IP_SERVICE_RACE_COUNT": "0",  # Servicios consultados en paralelo en modo race (0 = todos)
+    "IP_SERVICE_QUORUM": "1",  # Servicios que deben coincidir en la IP en modo race
+    "IP_SERVICE_FAILURE_THRESHOLD": "3",  # Fallos consecutivos tras los que se omite temporalmente un servicio
+    "IP_SERVICE_COOLDOWN": "300",  # Segundos que se omite un servicio (se duplica con cada fallo adicional)
     "LOG_LEVEL": "INFO",
     "V_LIST_USERS_PATH": "/usr/local/hestia/bin/v-list-users",
     "V_LIST_WEB_DOMAINS_PATH": "/usr/local/hestia/bin/v-list-web-domains",
     "V_UPDATE_SYS_IP_PATH": "/usr/local/hestia/bin/v-update-sys-ip",
+    "HESTIA_DATA_DIR": "/usr/local/hestia/data",  # Datos de usuarios de HestiaCP (users/<usuario>/web.conf)
+    "HESTIA_INVENTORY_BACKEND": "auto",  # native: lee HESTIA_DATA_DIR; cli: v-list-*; auto: native con respaldo cli
+    "HESTIA_MAX_WORKERS": "4",  # Usuarios consultados en paralelo con v-list-web-domains
+    "HESTIA_CLI_TIMEOUT": "30",  # Tiempo máximo por comando de la CLI de Hestia en segundos
+    "STATE_DIR": "/var/lib/hestia-pppoe",  # Estado persistente entre ejecuciones
+    "RUN_REPORT_PATH": "",  # Reporte JSON de tiempos de cada ejecución (vacío = STATE_DIR/run_report.json)
+    "RUN_DEBOUNCE_SECONDS": "5",  # Espera antes de actualizar para agrupar reconexiones seguidas en una sola ejecución
+    "DAEMON_INTERFACE": "",  # Interfaz vigilada en modo --daemon (ej: ppp0); vacío = consultar servicios de IP
+    "DAEMON_POLL_INTERVAL": "300",  # Segundos entre consultas de respaldo en modo --daemon
     "CLOUDFLARE_EXCLUDED_DOMAINS": "",  # Lista vacía por defecto
+    "CLOUDFLARE_PRIORITY_DOMAINS": "",  # Patrones (fnmatch) de dominios prioritarios, en orden de prioridad
+    "RUN_DEADLINE_SECONDS": "0",  # Plazo de cada ejecución; las zonas no prioritarias que no alcanzan se postergan (0 = sin plazo)
+    "CLOUDFLARE_BATCH_SIZE": "200",  # Cambios por lote en dns_records/batch (0 o 1 = un PUT por registro)
+    "CLOUDFLARE_MAX_WORKERS": "4",  # Zonas procesadas en paralelo (1 = secuencial)
+    "CLOUDFLARE_RECORD_CACHE_MAX_AGE": "86400",  # Segundos de vigencia de las zonas e IDs de registros en caché (0 = sin caché)
+    "CLOUDFLARE_RATE_LIMIT_REQUESTS": "1200",  # Peticiones permitidas por ventana (límite de Cloudflare)
+    "CLOUDFLARE_RATE_LIMIT_WINDOW": "300",  # Duración de la ventana en segundos
+    "CLOUDFLARE_RATE_LIMIT_BURST": "100",  # Peticiones que pueden salir en ráfaga sin espera
+    "CLOUDFLARE_MAX_RETRIES": "3",  # Reintentos ante 429, 5xx y errores de conexión de la API de Cloudflare
+    "CLOUDFLARE_RETRY_BUDGET": "60",  # Segundos de espera por reintentos que puede acumular cada ejecución
+    "HTTP_TIMEOUT": "10",  # Timeout por petición HTTP en segundos
+    "HTTP_POOL_MAXSIZE": "10",  # Conexiones keep-alive por host en cada sesión HTTP
+    "HTTP_MAX_RETRIES": "2",  # Reintentos inmediatos del adaptador HTTP ante errores de conexión
+    "HTTP_TRANSPORT_MODE": "live",  # live: red real; record: graba las peticiones en un cassette; replay: responde desde el cassette
+    "HTTP_CASSETTE_PATH": "",  # Cassette de record/replay (vacío = STATE_DIR/http_cassette.json)
+    "HTTP_REPLAY_LATENCY": "0",  # Demora simulada en replay: segundos por petición o "recorded" (la grabada)
 }
 
+def _parse_int(key: str, value: Any, minimum: int = 0) -> int:
+    """
+    Convierte a entero un valor de configuración.
+    Si el valor no es válido se registra una advertencia y se usa el valor por defecto.
+    """
+    try:
+        parsed = int(value)
+        if parsed >= minimum:
+            return parsed
+    except (TypeError, ValueError):
+        pass
+    default = int(DEFAULT_CONFIG[key])
+    logger.warning(f"Valor inválido para {key}: {value}. Usando valor por defecto: {default}")
+    return default
+
 def load_environment() -> bool:
     """
     Carga las variables de entorno desde el archivo .env si existe.
@@ -66,12 +111,62 @@ def get_config() -> Dict[str, Any]:
             if d.strip()
         ]
         
+        config["CLOUDFLARE_PRIORITY_DOMAINS"] = [
+            p.strip().lower().rstrip('.')
+            for p in os.getenv("CLOUDFLARE_PRIORITY_DOMAINS", "").split(",")
+            if p.strip()
+        ]
+        
         config["IP_SERVICE_URLS"] = [
             url.strip() 
             for url in os.getenv("IP_SERVICE_URLS", DEFAULT_CONFIG["IP_SERVICE_URLS"]).split(",") 
             if url.strip()
         ]
         
+        config["IP_SERVICE_MODE"] = config["IP_SERVICE_MODE"].strip().lower()
+        if config["IP_SERVICE_MODE"] not in ("serial", "race"):
+            logger.warning(f"Modo de servicios de IP inválido: {config['IP_SERVICE_MODE']}. Usando valor por defecto: {DEFAULT_CONFIG['IP_SERVICE_MODE']}")
+            config["IP_SERVICE_MODE"] = DEFAULT_CONFIG["IP_SERVICE_MODE"]
+        config["IP_SERVICE_RACE_COUNT"] = _parse_int("IP_SERVICE_RACE_COUNT", config["IP_SERVICE_RACE_COUNT"])
+        config["IP_SERVICE_QUORUM"] = _parse_int("IP_SERVICE_QUORUM", config["IP_SERVICE_QUORUM"], minimum=1)
+        config["IP_SERVICE_FAILURE_THRESHOLD"] = _parse_int("IP_SERVICE_FAILURE_THRESHOLD", config["IP_SERVICE_FAILURE_THRESHOLD"], minimum=1)
+        config["IP_SERVICE_COOLDOWN"] = _parse_int("IP_SERVICE_COOLDOWN", config["IP_SERVICE_COOLDOWN"])
+        
+        config["HESTIA_INVENTORY_BACKEND"] = config["HESTIA_INVENTORY_BACKEND"].strip().lower()
+        if config["HESTIA_INVENTORY_BACKEND"] not in ("auto", "native", "cli"):
+            logger.warning(f"Backend de inventario de Hestia inválido: {config['HESTIA_INVENTORY_BACKEND']}. Usando valor por defecto: {DEFAULT_CONFIG['HESTIA_INVENTORY_BACKEND']}")
+            config["HESTIA_INVENTORY_BACKEND"] = DEFAULT_CONFIG["HESTIA_INVENTORY_BACKEND"]
+        
+        config["RUN_REPORT_PATH"] = config["RUN_REPORT_PATH"].strip() or os.path.join(config["STATE_DIR"], "run_report.json")
+        config["RUN_DEBOUNCE_SECONDS"] = _parse_int("RUN_DEBOUNCE_SECONDS", config["RUN_DEBOUNCE_SECONDS"])
+        config["RUN_DEADLINE_SECONDS"] = _parse_int("RUN_DEADLINE_SECONDS", config["RUN_DEADLINE_SECONDS"])
+        config["DAEMON_INTERFACE"] = config["DAEMON_INTERFACE"].strip()
+        config["DAEMON_POLL_INTERVAL"] = _parse_int("DAEMON_POLL_INTERVAL", config["DAEMON_POLL_INTERVAL"], minimum=1)
+        
+        config["CLOUDFLARE_BATCH_SIZE"] = _parse_int("CLOUDFLARE_BATCH_SIZE", config["CLOUDFLARE_BATCH_SIZE"])
+        config["CLOUDFLARE_RECORD_CACHE_MAX_AGE"] = _parse_int("CLOUDFLARE_RECORD_CACHE_MAX_AGE", config["CLOUDFLARE_RECORD_CACHE_MAX_AGE"])
+        for key in ("CLOUDFLARE_RATE_LIMIT_REQUESTS", "CLOUDFLARE_RATE_LIMIT_WINDOW", "CLOUDFLARE_RATE_LIMIT_BURST",
+                    "CLOUDFLARE_MAX_WORKERS", "HTTP_TIMEOUT", "HTTP_POOL_MAXSIZE",
+                    "HESTIA_MAX_WORKERS", "HESTIA_CLI_TIMEOUT"):
+            config[key] = _parse_int(key, config[key], minimum=1)
+        config["HTTP_MAX_RETRIES"] = _parse_int("HTTP_MAX_RETRIES", config["HTTP_MAX_RETRIES"])
+        config["CLOUDFLARE_MAX_RETRIES"] = _parse_int("CLOUDFLARE_MAX_RETRIES", config["CLOUDFLARE_MAX_RETRIES"])
+        config["CLOUDFLARE_RETRY_BUDGET"] = _parse_int("CLOUDFLARE_RETRY_BUDGET", config["CLOUDFLARE_RETRY_BUDGET"])
+        
+        config["HTTP_TRANSPORT_MODE"] = config["HTTP_TRANSPORT_MODE"].strip().lower()
+        if config["HTTP_TRANSPORT_MODE"] not in ("live", "record", "replay"):
+            logger.warning(f"Modo de transporte HTTP inválido: {config['HTTP_TRANSPORT_MODE']}. Usando valor por defecto: {DEFAULT_CONFIG['HTTP_TRANSPORT_MODE']}")
+            config["HTTP_TRANSPORT_MODE"] = DEFAULT_CONFIG["HTTP_TRANSPORT_MODE"]
+        config["HTTP_CASSETTE_PATH"] = config["HTTP_CASSETTE_PATH"].strip() or os.path.join(config["STATE_DIR"], "http_cassette.json")
+        latencia = config["HTTP_REPLAY_LATENCY"].strip().lower()
+        if latencia != "recorded":
+            try:
+                latencia = max(float(latencia), 0.0)
+            except ValueError:
+                logger.warning(f"Valor inválido para HTTP_REPLAY_LATENCY: {latencia}. Usando valor por defecto: {DEFAULT_CONFIG['HTTP_REPLAY_LATENCY']}")
+                latencia = float(DEFAULT_CONFIG["HTTP_REPLAY_LATENCY"])
+        config["HTTP_REPLAY_LATENCY"] = latencia
+        
         # Asegurar que el nivel de log sea válido
         log_level = config["LOG_LEVEL"].upper()
         valid_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
@@ -120,8 +215,38 @@ if not CLOUDFLARE_API_TOKEN:
 # Exportar configuración como variables de módulo
 CLOUDFLARE_API_BASE_URL = config["CLOUDFLARE_API_BASE_URL"]
 CLOUDFLARE_EXCLUDED_DOMAINS = config["CLOUDFLARE_EXCLUDED_DOMAINS"]
+CLOUDFLARE_PRIORITY_DOMAINS = config["CLOUDFLARE_PRIORITY_DOMAINS"]
+CLOUDFLARE_BATCH_SIZE = config["CLOUDFLARE_BATCH_SIZE"]
+CLOUDFLARE_MAX_WORKERS = config["CLOUDFLARE_MAX_WORKERS"]
+CLOUDFLARE_RECORD_CACHE_MAX_AGE = config["CLOUDFLARE_RECORD_CACHE_MAX_AGE"]
+CLOUDFLARE_RATE_LIMIT_REQUESTS = config["CLOUDFLARE_RATE_LIMIT_REQUESTS"]
+CLOUDFLARE_RATE_LIMIT_WINDOW = config["CLOUDFLARE_RATE_LIMIT_WINDOW"]
+CLOUDFLARE_RATE_LIMIT_BURST = config["CLOUDFLARE_RATE_LIMIT_BURST"]
+CLOUDFLARE_MAX_RETRIES = config["CLOUDFLARE_MAX_RETRIES"]
+CLOUDFLARE_RETRY_BUDGET = config["CLOUDFLARE_RETRY_BUDGET"]
+HTTP_TIMEOUT = config["HTTP_TIMEOUT"]
+HTTP_POOL_MAXSIZE = config["HTTP_POOL_MAXSIZE"]
+HTTP_MAX_RETRIES = config["HTTP_MAX_RETRIES"]
+HTTP_TRANSPORT_MODE = config["HTTP_TRANSPORT_MODE"]
+HTTP_CASSETTE_PATH = config["HTTP_CASSETTE_PATH"]
+HTTP_REPLAY_LATENCY = config["HTTP_REPLAY_LATENCY"]
 LOG_LEVEL = config["LOG_LEVEL"]
 IP_SERVICE_URLS = config["IP_SERVICE_URLS"]
+IP_SERVICE_MODE = config["IP_SERVICE_MODE"]
+IP_SERVICE_RACE_COUNT = config["IP_SERVICE_RACE_COUNT"]
+IP_SERVICE_QUORUM = config["IP_SERVICE_QUORUM"]
+IP_SERVICE_FAILURE_THRESHOLD = config["IP_SERVICE_FAILURE_THRESHOLD"]
+IP_SERVICE_COOLDOWN = config["IP_SERVICE_COOLDOWN"]
 V_LIST_USERS_PATH = config["V_LIST_USERS_PATH"]
 V_LIST_WEB_DOMAINS_PATH = config["V_LIST_WEB_DOMAINS_PATH"]
 V_UPDATE_SYS_IP_PATH = config["V_UPDATE_SYS_IP_PATH"]
+HESTIA_DATA_DIR = config["HESTIA_DATA_DIR"]
+HESTIA_INVENTORY_BACKEND = config["HESTIA_INVENTORY_BACKEND"]
+HESTIA_MAX_WORKERS = config["HESTIA_MAX_WORKERS"]
+HESTIA_CLI_TIMEOUT = config["HESTIA_CLI_TIMEOUT"]
+STATE_DIR = config["STATE_DIR"]
+RUN_REPORT_PATH = config["RUN_REPORT_PATH"]
+RUN_DEBOUNCE_SECONDS = config["RUN_DEBOUNCE_SECONDS"]
+RUN_DEADLINE_SECONDS = config["RUN_DEADLINE_SECONDS"]
+DAEMON_INTERFACE = config["DAEMON_INTERFACE"]
+DAEMON_POLL_INTERVAL = config["DAEMON_POLL_INTERVAL"]
@@ -0,0 +1,153 @@
+# dns_updater.py
+# Ejecutor del plan de actualización de registros DNS por zona, con ejecución concurrente acotada
+# Todos los comentarios y documentación estarán en español.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+from cloudflare_dns import CloudflareClient, BATCH_MAX_CHANGES, apply_zone_updates
+from planner import plan_zone
+from record_cache import evict_zone, set_records_content
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Estados posibles de cada registro en el reporte de ejecución
+RECORD_STATUSES = ("updated", "unchanged", "missing", "error", "deferred")
+
+
+def apply_zone_plan(client: CloudflareClient, zone_plan: Dict[str, Any], ip: str, ttl: int = 1,
+                    proxied: bool = False, batch_size: int = BATCH_MAX_CHANGES,
+                    record_cache: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Aplica el plan de una zona (ver planner.plan_zone). Las operaciones de una misma zona son
+    secuenciales. Un error en la zona no se propaga: queda registrado en los resultados de sus dominios.
+
+    Si el plan proviene de la caché y alguna escritura falla (ID inexistente o que no coincide),
+    la zona se descarta de la caché, se vuelve a planificar con su snapshot y se aplican los
+    cambios pendientes, sin repetir los registros ya escritos.
+
+    Returns:
+        Lista de resultados por registro: {'zone', 'name', 'id', 'status', 'error'}
+    """
+    zone_name, zone_id = zone_plan['name'], zone_plan['id']
+    logger.info(f"Procesando zona: {zone_name} ({zone_id})")
+
+    def _result(name, record_id, status, error=None):
+        return {"zone": zone_name, "name": name, "id": record_id, "status": status, "error": error}
+
+    if zone_plan['source'] == 'error':
+        return [_result(dominio, None, "error", zone_plan['error']) for dominio in zone_plan['domains']]
+
+    if zone_plan['source'] == 'cache':
+        # Ir directo a la escritura con los IDs conocidos; sin reintento individual para detectar IDs obsoletos
+        logger.debug(f"Usando {len(zone_plan['update']) + len(zone_plan['unchanged'])} registros en caché para la zona {zone_name}")
+        aplicados = apply_zone_updates(client, zone_id, zone_plan['update'], ip, ttl=ttl, proxied=proxied,
+                                       batch_size=batch_size, fallback_individual=False) if zone_plan['update'] else []
+        escritos = [r for r in aplicados if r['status'] == 'updated']
+        for resultado in escritos:
+            logger.info(f"Registro A actualizado: {resultado['name']} ({resultado['id']}) en zona {zone_name} con IP {ip}")
+        if record_cache is not None:
+            set_records_content(record_cache, zone_name, [r['id'] for r in escritos], ip)
+        if len(escritos) == len(aplicados):
+            for record in zone_plan['unchanged']:
+                logger.info(f"El registro A para {record['name']} ya está actualizado con la IP {ip}")
+            return [_result(dominio, None, "missing") for dominio in zone_plan['missing']] + \
+                [_result(r['name'], r['id'], "unchanged") for r in zone_plan['unchanged']] + \
+                [_result(r['name'], r['id'], "updated") for r in escritos]
+
+        logger.info(f"{len(aplicados) - len(escritos)} IDs en caché no son válidos en la zona {zone_name}, volviendo a consultar sus registros")
+        if record_cache is not None:
+            evict_zone(record_cache, zone_name)
+        nuevo_plan = plan_zone(client, zone_name, zone_id, zone_plan['domains'], ip,
+                               record_cache=record_cache, use_cache=False)
+        actualizados = {r['id'] for r in escritos}
+        # Los registros ya escritos figuran como actualizados y no como sin cambios
+        return [_result(r['name'], r['id'], "updated") for r in escritos] + [
+            r for r in apply_zone_plan(client, nuevo_plan, ip, ttl=ttl, proxied=proxied, batch_size=batch_size,
+                                       record_cache=record_cache)
+            if not (r['status'] == 'unchanged' and r['id'] in actualizados)
+        ]
+
+    resultados = []
+    for dominio in zone_plan['missing']:
+        logger.debug(f"No existe registro A para {dominio} en zona {zone_name}, omitiendo...")
+        resultados.append(_result(dominio, None, "missing"))
+
+    for record in zone_plan['unchanged']:
+        logger.info(f"El registro A para {record['name']} ya está actualizado con la IP {ip}")
+        resultados.append(_result(record['name'], record['id'], "unchanged"))
+
+    if not zone_plan['update']:
+        return resultados
+
+    # Actualizar en lotes los registros desactualizados de la zona
+    logger.info(f"Actualizando {len(zone_plan['update'])} registros A en zona {zone_name} con IP {ip}")
+    escritos = []
+    for resultado in apply_zone_updates(client, zone_id, zone_plan['update'], ip, ttl=ttl, proxied=proxied,
+                                        batch_size=batch_size):
+        if resultado['status'] == 'updated':
+            logger.info(f"Registro A actualizado: {resultado['name']} ({resultado['id']}) en zona {zone_name} con IP {ip}")
+            escritos.append(resultado['id'])
+        else:
+            logger.error(f"Error al actualizar registro {resultado['name']} en zona {zone_name}: {resultado['error']}")
+        resultados.append(_result(resultado['name'], resultado['id'], resultado['status'], resultado['error']))
+    # La caché guardó el contenido previo a la escritura (ver planner.plan_zone)
+    if record_cache is not None:
+        set_records_content(record_cache, zone_name, escritos, ip)
+    return resultados
+
+
+def execute_plan(client: CloudflareClient, plan: Dict[str, Any], ttl: int = 1, proxied: bool = False,
+                 batch_size: int = BATCH_MAX_CHANGES, max_workers: int = 1,
+                 record_cache: Optional[Dict[str, Any]] = None,
+                 should_defer: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Dict[str, Any]:
+    """
+    Aplica un plan (ver planner.build_plan), procesando hasta 'max_workers' zonas en paralelo.
+    Todas las zonas comparten el cliente (y por lo tanto su sesión y su limitador de tasa),
+    de modo que el tiempo total depende de la zona más lenta y no de la suma de todas.
+    Con max_workers <= 1 las zonas se procesan una tras otra en el hilo actual.
+    Cada zona solo modifica su propia entrada de 'record_cache'.
+
+    Las zonas se empiezan en el orden del plan (ver scheduler.prioritize_plan). Si 'should_defer'
+    devuelve True para una zona justo antes de empezarla, la zona no se aplica: sus dominios quedan
+    con estado 'deferred' y su plan en 'deferred' para una pasada posterior.
+
+    Returns:
+        Reporte de la ejecución: {'ip', 'zones', 'duration', 'summary', 'results', 'deferred'}, donde
+        'results' conserva el orden de las zonas y 'summary' cuenta los registros por estado.
+    """
+    inicio = time.monotonic()
+    ip = plan['ip']
+    zonas = plan['zones']
+
+    def _procesar(zone_plan):
+        if should_defer is not None and should_defer(zone_plan):
+            logger.info(f"Zona {zone_plan['name']} postergada: no alcanza el plazo de la ejecución")
+            return [{"zone": zone_plan['name'], "name": dominio, "id": None, "status": "deferred", "error": None}
+                    for dominio in zone_plan['domains']]
+        return apply_zone_plan(client, zone_plan, ip, ttl=ttl, proxied=proxied, batch_size=batch_size,
+                               record_cache=record_cache)
+
+    if max_workers <= 1 or len(zonas) <= 1:
+        por_zona = [_procesar(zone_plan) for zone_plan in zonas]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(zonas)), thread_name_prefix="zona") as executor:
+            # map conserva el orden de las zonas en los resultados
+            por_zona = list(executor.map(_procesar, zonas))
+
+    resultados = [r for zona in por_zona for r in zona]
+    postergadas = [zone_plan for zone_plan, zona in zip(zonas, por_zona)
+                   if zona and all(r['status'] == 'deferred' for r in zona)]
+    summary = {status: 0 for status in RECORD_STATUSES}
+    for r in resultados:
+        summary[r['status']] = summary.get(r['status'], 0) + 1
+
+    return {
+        "ip": ip,
+        "zones": len(zonas),
+        "duration": round(time.monotonic() - inicio, 3),
+        "summary": summary,
+        "results": resultados,
+        "deferred": postergadas
+    }
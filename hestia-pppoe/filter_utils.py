@@ -2,14 +2,111 @@
 # Utilidades de filtrado para el proyecto Hestia
 # Todos los comentarios y documentación estarán en español.
 
-from typing import List, Any
+import re
+from typing import List, Any, Iterable, Optional, Union
+from logger import get_logger
 
-def filter_excluded(objetos: List[Any], lista_excluir: List[str], campo: str = None) -> List[Any]:
+logger = get_logger(__name__)
+
+# Prefijo de las reglas de exclusión que son expresiones regulares (ej: "re:^dev\d+\.ejemplo\.com$")
+REGEX_RULE_PREFIX = "re:"
+
+
+def normalize_domain(domain: str) -> str:
+    """Normaliza un nombre de dominio para compararlo: minúsculas y sin punto final."""
+    return domain.strip().lower().rstrip('.')
+
+
+class ExclusionMatcher:
+    """
+    Reglas de exclusión de dominios compiladas una sola vez.
+
+    - Nombre exacto (ej: "ejemplo.com"): conjunto hash, O(1) por dominio.
+    - Comodín "*.ejemplo.com": excluye todos los subdominios de ejemplo.com (no el propio
+      ejemplo.com). Se guardan los sufijos en un conjunto y cada dominio se compara recorriendo
+      sus sufijos de etiquetas, por lo que el costo es O(etiquetas) y no depende del número de reglas.
+    - "re:<expresión>": expresión regular (re.fullmatch) sobre el nombre normalizado. Todas las
+      expresiones se combinan en un único patrón compilado.
+
+    Las reglas repetidas se descartan y una expresión regular inválida se ignora con una advertencia.
+    """
+
+    def __init__(self, rules: Iterable[str]):
+        self.exact = set()
+        self.suffixes = set()
+        expresiones = []
+        for regla in rules:
+            regla = regla.strip()
+            if not regla:
+                continue
+            if regla.startswith(REGEX_RULE_PREFIX):
+                expresion = regla[len(REGEX_RULE_PREFIX):]
+                try:
+                    re.compile(expresion)
+                except re.error as e:
+                    logger.warning(f"Regla de exclusión inválida {regla}: {e}. Se ignora")
+                    continue
+                if expresion not in expresiones:
+                    expresiones.append(expresion)
+            elif regla.startswith("*."):
+                self.suffixes.add(normalize_domain(regla[2:]))
+            else:
+                self.exact.add(normalize_domain(regla))
+        self.regex = re.compile("|".join(f"(?:{e})" for e in expresiones), re.IGNORECASE) if expresiones else None
+        self.regex_count = len(expresiones)
+
+    def __len__(self) -> int:
+        return len(self.exact) + len(self.suffixes) + self.regex_count
+
+    def matches(self, domain: str) -> bool:
+        """Indica si el dominio coincide con alguna regla de exclusión."""
+        nombre = normalize_domain(domain)
+        if nombre in self.exact:
+            return True
+        if self.suffixes:
+            # Sufijos estrictos: "a.b.ejemplo.com" -> "b.ejemplo.com", "ejemplo.com", "com"
+            pos = nombre.find('.')
+            while pos != -1:
+                if nombre[pos + 1:] in self.suffixes:
+                    return True
+                pos = nombre.find('.', pos + 1)
+        return bool(self.regex and self.regex.fullmatch(nombre))
+
+
+def compile_exclusions(rules: Iterable[str]) -> ExclusionMatcher:
+    """Compila una lista de reglas de exclusión (ver ExclusionMatcher)."""
+    return ExclusionMatcher(rules)
+
+
+def filter_excluded(objetos: List[Any], lista_excluir: Union[List[str], ExclusionMatcher], campo: str = None) -> List[Any]:
     """
     Filtra una lista de objetos (dict o str) excluyendo aquellos cuyo campo especificado
     coincide exactamente con algún valor de lista_excluir. Si campo es None, filtra el objeto directamente.
+    Si lista_excluir es un ExclusionMatcher se aplican sus reglas (exactas, comodines y expresiones).
     """
+    if isinstance(lista_excluir, ExclusionMatcher):
+        if campo:
+            return [obj for obj in objetos if not lista_excluir.matches(obj.get(campo) or "")]
+        return [obj for obj in objetos if not lista_excluir.matches(obj)]
     if campo:
         return [obj for obj in objetos if obj.get(campo) not in lista_excluir]
     else:
         return [obj for obj in objetos if obj not in lista_excluir]
+
+
+def filter_domains(domains: Iterable[str], matcher: Optional[ExclusionMatcher] = None) -> List[str]:
+    """
+    Normaliza y deduplica una lista de dominios (conservando el orden de la primera aparición)
+    y descarta los que coinciden con 'matcher'.
+    """
+    vistos = set()
+    resultado = []
+    for dominio in domains:
+        nombre = normalize_domain(dominio)
+        if not nombre or nombre in vistos:
+            continue
+        vistos.add(nombre)
+        if matcher is not None and matcher.matches(nombre):
+            continue
+        resultado.append(nombre)
+    return resultado
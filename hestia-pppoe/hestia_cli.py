@@ -4,10 +4,35 @@
 
 import json
 import subprocess
-from typing import List, Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from filter_utils import filter_excluded
+from logger import get_logger
+import telemetry
 import os
 
+logger = get_logger(__name__)
+
+# Valores por defecto de las llamadas a la CLI de Hestia
+DEFAULT_CLI_TIMEOUT = 30
+DEFAULT_MAX_WORKERS = 4
+
+
+def run_command(args: List[str], timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """
+    Ejecuta un comando de la CLI de Hestia (subprocess.run con check=True) registrando su duración
+    en el reporte de la ejecución. Propaga CalledProcessError y TimeoutExpired.
+    """
+    inicio = time.monotonic()
+    error = True
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, check=True, timeout=timeout)
+        error = False
+        return result
+    finally:
+        telemetry.record_subprocess(args[0], time.monotonic() - inicio, error)
+
 
 def update_hestia_system_ip(v_update_sys_ip_path: str, logger) -> bool:
     """
@@ -18,7 +43,7 @@ def update_hestia_system_ip(v_update_sys_ip_path: str, logger) -> bool:
     if v_update_sys_ip_path and os.path.exists(v_update_sys_ip_path):
         try:
             logger.info(f"Ejecutando sincronización de IP en HestiaCP: {v_update_sys_ip_path}")
-            result = subprocess.run([v_update_sys_ip_path], capture_output=True, text=True, check=True)
+            result = run_command([v_update_sys_ip_path])
             logger.info("Sincronización de IP en HestiaCP completada exitosamente")
             return True
         except Exception as e:
@@ -28,50 +53,97 @@ def update_hestia_system_ip(v_update_sys_ip_path: str, logger) -> bool:
     return False
 
 
-def list_users(cmd_path: str = "v-list-users", use_json: bool = True) -> List[str]:
+def list_users(cmd_path: str = "v-list-users", use_json: bool = True, timeout: Optional[float] = None) -> List[str]:
     """
     Ejecuta la CLI de HestiaCP para obtener la lista de usuarios. Devuelve una lista de nombres de usuario.
     """
     args = [cmd_path]
     if use_json:
         args.append("json")
-    result = subprocess.run(args, capture_output=True, text=True, check=True)
+    result = run_command(args, timeout=timeout)
     data = json.loads(result.stdout)
     return list(data.keys())
 
 
-def list_web_domains(user: str, cmd_path: str = "v-list-web-domains", use_json: bool = True) -> List[Dict[str, Any]]:
+def parse_aliases(alias_value: str) -> List[str]:
+    """
+    Convierte el campo ALIAS de un dominio web en una lista de alias.
+    Puede ser string separado por coma o espacio.
+    """
+    if not alias_value:
+        return []
+    return [a.strip() for a in alias_value.replace(',', ' ').split() if a.strip()]
+
+
+def list_web_domains(user: str, cmd_path: str = "v-list-web-domains", use_json: bool = True,
+                     timeout: Optional[float] = None) -> List[Dict[str, Any]]:
     """
     Ejecuta la CLI de HestiaCP para obtener los dominios y alias de un usuario.
     Devuelve una lista de diccionarios con los dominios y sus alias.
+    Lanza subprocess.TimeoutExpired si el comando tarda más de 'timeout' segundos.
     """
     args = [cmd_path, user]
     if use_json:
         args.append("json")
-    result = subprocess.run(args, capture_output=True, text=True, check=True)
+    result = run_command(args, timeout=timeout)
     data = json.loads(result.stdout)
     dominios = []
     for dominio, props in data.items():
-        aliases = []
-        if 'ALIAS' in props and props['ALIAS']:
-            # Puede ser string separado por coma o espacio
-            aliases = [a.strip() for a in props['ALIAS'].replace(',', ' ').split() if a.strip()]
         dominios.append({
             'DOMAIN': dominio,
-            'ALIASES': aliases
+            'ALIASES': parse_aliases(props.get('ALIAS'))
         })
     return dominios
 
 
+def list_all_web_domains(users: List[str], cmd_path: str = "v-list-web-domains", max_workers: int = DEFAULT_MAX_WORKERS,
+                         timeout: Optional[float] = DEFAULT_CLI_TIMEOUT,
+                         errors: Optional[Dict[str, str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Obtiene los dominios y alias de varios usuarios ejecutando v-list-web-domains con hasta
+    'max_workers' procesos simultáneos, cada uno limitado a 'timeout' segundos.
+
+    Un usuario cuyo comando falla, excede el timeout o devuelve datos inválidos no interrumpe
+    al resto: se omite del resultado y, si se proporciona 'errors', se registra ahí su error.
+
+    Returns:
+        {usuario: [{'DOMAIN', 'ALIASES'}]} en el mismo orden que 'users'
+    """
+    def _listar(user):
+        try:
+            return list_web_domains(user, cmd_path=cmd_path, timeout=timeout), None
+        except subprocess.TimeoutExpired:
+            return None, f"sin respuesta tras {timeout}s"
+        except subprocess.CalledProcessError as e:
+            return None, f"código de salida {e.returncode}: {(e.stderr or '').strip()}"
+        except (OSError, ValueError, AttributeError) as e:
+            return None, str(e)
+
+    if max_workers <= 1 or len(users) <= 1:
+        listados = [_listar(user) for user in users]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(users)), thread_name_prefix="hestia") as executor:
+            # map conserva el orden de los usuarios en los resultados
+            listados = list(executor.map(_listar, users))
+
+    resultado = {}
+    for user, (dominios, error) in zip(users, listados):
+        if error is not None:
+            logger.error(f"Error al obtener los dominios del usuario {user}: {error}")
+            if errors is not None:
+                errors[user] = error
+            continue
+        resultado[user] = dominios
+    return resultado
+
+
 def get_all_hestia_domains(users: List[str]) -> List[str]:
     """
     Devuelve una lista de todos los dominios y alias gestionados por todos los usuarios de Hestia.
     """
     todos = []
-    for user in users:
-        dominios = list_web_domains(user)
+    for dominios in list_all_web_domains(users).values():
         for d in dominios:
             todos.append(d['DOMAIN'])
             todos.extend(d['ALIASES'])
     return todos
-
@@ -0,0 +1,196 @@
+# hestia_inventory.py
+# Inventario de usuarios y dominios web de HestiaCP, leído directamente de sus archivos de datos
+# o, como alternativa, mediante la CLI (v-list-users / v-list-web-domains)
+# Todos los comentarios y documentación estarán en español.
+
+import os
+import re
+from typing import List, Dict, Any, Optional
+from hestia_cli import (
+    list_users,
+    list_all_web_domains,
+    parse_aliases,
+    DEFAULT_CLI_TIMEOUT,
+    DEFAULT_MAX_WORKERS
+)
+from state import load_json_file, save_json_file, file_signature
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Backends de inventario disponibles:
+#   native: lee HESTIA_DATA_DIR/users/*/web.conf sin ejecutar procesos
+#   cli: ejecuta v-list-users y v-list-web-domains por cada usuario
+#   auto: native si el directorio de datos existe, cli en caso contrario o si la lectura falla
+INVENTORY_BACKENDS = ("auto", "native", "cli")
+
+# Caché del inventario en STATE_DIR, invalidada por usuario según la firma de su web.conf
+INVENTORY_CACHE_FILE_NAME = "inventory_cache.json"
+
+# Formato de los archivos .conf de Hestia: una línea por objeto con pares CLAVE='valor'
+_CONF_PAIR_RE = re.compile(r"(\w+)='([^']*)'")
+
+
+def parse_conf_line(line: str) -> Dict[str, str]:
+    """Convierte una línea CLAVE='valor' CLAVE2='valor2' de un archivo .conf de Hestia en un diccionario."""
+    return dict(_CONF_PAIR_RE.findall(line))
+
+
+def native_list_users(data_dir: str) -> List[str]:
+    """
+    Obtiene la lista de usuarios de Hestia a partir de HESTIA_DATA_DIR/users.
+    Igual que v-list-users, un usuario es un directorio que contiene user.conf.
+    """
+    users_dir = os.path.join(data_dir, "users")
+    return sorted(
+        entry.name for entry in os.scandir(users_dir)
+        if entry.is_dir() and os.path.isfile(os.path.join(entry.path, "user.conf"))
+    )
+
+
+def native_list_web_domains(user: str, data_dir: str) -> List[Dict[str, Any]]:
+    """
+    Obtiene los dominios y alias de un usuario leyendo su web.conf.
+    Devuelve el mismo formato que hestia_cli.list_web_domains: [{'DOMAIN', 'ALIASES'}].
+    Un usuario sin web.conf no tiene dominios web.
+    """
+    path = os.path.join(data_dir, "users", user, "web.conf")
+    if not os.path.exists(path):
+        return []
+
+    dominios = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            props = parse_conf_line(line)
+            if not props.get('DOMAIN'):
+                continue
+            dominios.append({
+                'DOMAIN': props['DOMAIN'],
+                'ALIASES': parse_aliases(props.get('ALIAS'))
+            })
+    return dominios
+
+
+def _read_users(backend: str, data_dir: str, users_cmd: str, timeout: Optional[float]) -> List[str]:
+    """Lista los usuarios con el backend indicado ('native' o 'cli')."""
+    if backend == "native":
+        return native_list_users(data_dir)
+    return list_users(cmd_path=users_cmd, timeout=timeout)
+
+
+def _read_domains(backend: str, users: List[str], data_dir: str, domains_cmd: str, max_workers: int,
+                  timeout: Optional[float], errors: Optional[Dict[str, str]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Obtiene los dominios de los usuarios indicados con el backend indicado ('native' o 'cli')."""
+    if backend == "native":
+        return {user: native_list_web_domains(user, data_dir) for user in users}
+    # Con la CLI los usuarios se consultan en paralelo
+    return list_all_web_domains(users, cmd_path=domains_cmd, max_workers=max_workers, timeout=timeout, errors=errors)
+
+
+def _user_signature(data_dir: str, user: str) -> str:
+    """Firma del web.conf de un usuario ('-' si no tiene)."""
+    return file_signature(os.path.join(data_dir, "users", user, "web.conf")) or "-"
+
+
+def _collect(backend: str, data_dir: str, users_cmd: str, domains_cmd: str, max_workers: int,
+             timeout: Optional[float], errors: Optional[Dict[str, str]], cache_path: Optional[str],
+             refresh: bool) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Obtiene el inventario con un backend concreto ('native' o 'cli').
+
+    Con 'cache_path' solo se vuelven a leer los usuarios cuyo web.conf cambió desde la ejecución
+    anterior; la lista de usuarios se reutiliza mientras el directorio users/ no cambie. Así, una
+    ejecución sin cambios en Hestia no lee ningún web.conf ni ejecuta ningún comando.
+    """
+    if not cache_path:
+        return _read_domains(backend, _read_users(backend, data_dir, users_cmd, timeout), data_dir,
+                             domains_cmd, max_workers, timeout, errors)
+
+    cache = {} if refresh else load_json_file(cache_path)
+    if cache.get("data_dir") != data_dir:
+        cache = {}
+    cached_users = cache.get("users", {})
+
+    # La lista de usuarios solo cambia al crear o eliminar directorios en users/
+    users_signature = file_signature(os.path.join(data_dir, "users"))
+    if users_signature is not None and cache.get("users_signature") == users_signature:
+        users = cache.get("user_list", [])
+    else:
+        users = _read_users(backend, data_dir, users_cmd, timeout)
+
+    firmas = {user: _user_signature(data_dir, user) for user in users}
+    cambiados = [user for user in users if cached_users.get(user, {}).get("signature") != firmas[user]]
+    leidos = _read_domains(backend, cambiados, data_dir, domains_cmd, max_workers, timeout, errors) if cambiados else {}
+    logger.debug(f"Caché de inventario: {len(users) - len(cambiados)} usuarios sin cambios, {len(cambiados)} leídos")
+
+    inventario = {}
+    nuevo_cache = {}
+    for user in users:
+        if user in leidos:
+            dominios = leidos[user]
+        elif user not in cambiados:
+            dominios = cached_users[user]["domains"]
+        else:
+            # Usuario con error: se omite y no se guarda para volver a leerlo en la próxima ejecución
+            continue
+        inventario[user] = dominios
+        nuevo_cache[user] = {"signature": firmas[user], "domains": dominios}
+
+    if cambiados or cache.get("users_signature") != users_signature or cache.get("user_list") != users:
+        save_json_file(cache_path, {
+            "data_dir": data_dir,
+            "users_signature": users_signature,
+            "user_list": users,
+            "users": nuevo_cache
+        })
+    return inventario
+
+
+def collect_inventory(backend: str = "auto", data_dir: str = "/usr/local/hestia/data",
+                      users_cmd: str = "v-list-users", domains_cmd: str = "v-list-web-domains",
+                      max_workers: int = DEFAULT_MAX_WORKERS, timeout: Optional[float] = DEFAULT_CLI_TIMEOUT,
+                      errors: Optional[Dict[str, str]] = None, cache_path: Optional[str] = None,
+                      refresh: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Obtiene el inventario de Hestia: {usuario: [{'DOMAIN', 'ALIASES'}]}.
+
+    Args:
+        backend: 'native', 'cli' o 'auto' (ver INVENTORY_BACKENDS)
+        data_dir: Directorio de datos de Hestia (HESTIA_DATA_DIR)
+        users_cmd: Ruta a v-list-users (backend cli)
+        domains_cmd: Ruta a v-list-web-domains (backend cli)
+        max_workers: Usuarios consultados en paralelo con la CLI
+        timeout: Tiempo máximo por comando de la CLI en segundos
+        errors: Diccionario opcional donde se registran los usuarios omitidos por error y su causa
+        cache_path: Archivo de caché del inventario (solo se usa si el directorio de datos existe)
+        refresh: Ignorar el contenido de la caché y volver a leer todos los usuarios
+    """
+    data_disponible = os.path.isdir(os.path.join(data_dir, "users"))
+    if not data_disponible:
+        # Sin datos de Hestia no hay firmas con las que validar la caché
+        cache_path = None
+
+    if backend == "cli" or (backend == "auto" and not data_disponible):
+        if backend == "auto":
+            logger.debug(f"No se encontró {os.path.join(data_dir, 'users')}, usando la CLI de Hestia para el inventario")
+        return _collect("cli", data_dir, users_cmd, domains_cmd, max_workers, timeout, errors, cache_path, refresh)
+
+    try:
+        inventario = _collect("native", data_dir, users_cmd, domains_cmd, max_workers, timeout, errors, cache_path, refresh)
+        logger.debug(f"Inventario de Hestia leído desde {data_dir}")
+        return inventario
+    except (OSError, UnicodeDecodeError) as e:
+        if backend == "native":
+            raise
+        logger.warning(f"No se pudieron leer los datos de Hestia en {data_dir}: {e}. Usando la CLI de Hestia")
+        return _collect("cli", data_dir, users_cmd, domains_cmd, max_workers, timeout, errors, cache_path, refresh)
+
+
+def inventory_domains(inventory: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+    """Aplana el inventario en la lista de dominios y alias, en orden de usuario y de dominio."""
+    todos = []
+    for dominios in inventory.values():
+        for d in dominios:
+            todos.append(d['DOMAIN'])
+            todos.extend(d['ALIASES'])
+    return todos
@@ -0,0 +1,58 @@
+# http_client.py
+# Sesiones HTTP persistentes compartidas por los clientes de Cloudflare y de servicios de IP
+# Todos los comentarios y documentación estarán en español.
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Optional, Tuple
+from telemetry import http_response_hook
+
+# Valores por defecto de las sesiones HTTP
+DEFAULT_TIMEOUT = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_STATUSES = (502, 503, 504)
+
+
+def create_session(pool_maxsize: int = DEFAULT_POOL_MAXSIZE, max_retries: int = DEFAULT_MAX_RETRIES,
+                   headers: Optional[Dict[str, str]] = None,
+                   retry_statuses: Tuple[int, ...] = DEFAULT_RETRY_STATUSES) -> requests.Session:
+    """
+    Crea una sesión de requests con conexiones keep-alive reutilizables.
+
+    El HTTPAdapter mantiene hasta 'pool_maxsize' conexiones abiertas por host, de modo que una
+    ejecución completa reutiliza unas pocas conexiones TCP/TLS en lugar de abrir una por petición.
+    Los reintentos cubren errores de conexión y las respuestas 'retry_statuses' de métodos idempotentes;
+    con 'retry_statuses' vacío el adaptador solo reintenta errores de conexión y las respuestas
+    quedan a cargo del llamador (ej: CloudflareClient, que además respeta Retry-After).
+
+    Args:
+        pool_maxsize: Conexiones persistentes por host
+        max_retries: Reintentos ante errores transitorios
+        headers: Cabeceras por defecto para todas las peticiones de la sesión
+        retry_statuses: Códigos HTTP que el adaptador reintenta
+
+    Returns:
+        La sesión configurada
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=0.5,
+        status=max_retries if retry_statuses else 0,
+        status_forcelist=retry_statuses,
+        allowed_methods=frozenset({"GET", "PUT"}),
+        # Sin códigos a reintentar, tampoco se reintentan los 429/503 con Retry-After
+        respect_retry_after_header=bool(retry_statuses),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    # Duración y tamaño de cada respuesta para el reporte de la ejecución (ver telemetry)
+    session.hooks["response"].append(http_response_hook)
+    return session
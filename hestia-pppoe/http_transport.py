@@ -0,0 +1,250 @@
+# http_transport.py
+# Transporte HTTP intercambiable: en vivo, grabación y reproducción de peticiones (cassettes)
+# Todos los comentarios y documentación estarán en español.
+
+import base64
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from logger import get_logger
+from state import load_json_file, save_json_file
+
+logger = get_logger(__name__)
+
+# live: red real; record: red real grabando cada petición en el cassette; replay: respuestas del cassette, sin red
+TRANSPORT_MODES = ("live", "record", "replay")
+
+CASSETTE_VERSION = 1
+
+# Cabeceras de respuesta que no se guardan (no se reproducen o pueden contener datos sensibles)
+SKIPPED_RESPONSE_HEADERS = {"set-cookie", "content-encoding", "transfer-encoding", "connection", "content-length"}
+
+# Excepciones de requests que se pueden grabar y volver a lanzar al reproducir
+REPLAYABLE_ERRORS = {
+    "ConnectTimeout": requests.ConnectTimeout,
+    "ReadTimeout": requests.ReadTimeout,
+    "Timeout": requests.Timeout,
+    "ConnectionError": requests.ConnectionError,
+}
+
+
+def _body_text(body: Union[bytes, str, None]) -> Optional[str]:
+    """Cuerpo de una petición como texto (None si no tiene)."""
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        return body.decode("utf-8", errors="replace")
+    return str(body)
+
+
+def _interaction_key(method: str, url: str, body: Optional[str]) -> Tuple[str, str, Optional[str]]:
+    return (method.upper(), url, body or None)
+
+
+class Cassette:
+    """
+    Pares petición/respuesta grabados, con su duración, guardados como JSON:
+
+        {"version": 1, "interactions": [
+            {"request": {"method": "GET", "url": "...", "body": null},
+             "response": {"status": 200, "reason": "OK", "headers": {...}, "body": "..."},
+             "elapsed": 0.042, "offset": 1.305}
+        ]}
+
+    'offset' son los segundos desde el inicio de la grabación. Una petición que falló sin respuesta
+    (timeout o error de conexión) se guarda con "error": {"type": "...", "message": "..."} en lugar de
+    "response". No se graban las cabeceras de la petición (Authorization).
+    """
+
+    def __init__(self, path: str, interactions: Optional[List[Dict[str, Any]]] = None):
+        self.path = path
+        self.interactions = interactions or []
+        self._lock = threading.Lock()
+        self._inicio = time.monotonic()
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        """Carga un cassette. Si no existe o no es válido se devuelve vacío (con una advertencia)."""
+        data = load_json_file(path)
+        interactions = data.get("interactions")
+        if not isinstance(interactions, list):
+            logger.warning(f"El cassette {path} no existe o no contiene interacciones")
+            interactions = []
+        return cls(path, interactions)
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    def append(self, request: requests.PreparedRequest, elapsed: float,
+               response: Optional[requests.Response] = None, error: Optional[Exception] = None):
+        """Agrega una interacción (con su respuesta o con el error que la interrumpió)."""
+        interaction = {
+            "request": {"method": request.method, "url": request.url, "body": _body_text(request.body)},
+            "elapsed": round(elapsed, 4),
+            "offset": round(time.monotonic() - self._inicio, 4),
+        }
+        if response is not None:
+            cuerpo = response.content or b""
+            try:
+                texto, codificado = cuerpo.decode("utf-8"), None
+            except UnicodeDecodeError:
+                texto, codificado = None, base64.b64encode(cuerpo).decode("ascii")
+            interaction["response"] = {
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_RESPONSE_HEADERS},
+                "body": texto,
+            }
+            if codificado is not None:
+                interaction["response"]["body_base64"] = codificado
+        else:
+            interaction["error"] = {"type": type(error).__name__, "message": str(error)}
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def save(self) -> bool:
+        """Guarda el cassette de forma atómica."""
+        with self._lock:
+            data = {"version": CASSETTE_VERSION, "interactions": list(self.interactions)}
+        if save_json_file(self.path, data):
+            logger.info(f"Cassette HTTP guardado en {self.path} ({len(data['interactions'])} peticiones)")
+            return True
+        return False
+
+
+class RecordingAdapter(BaseAdapter):
+    """Adaptador que envía las peticiones con el adaptador real y graba cada petición y su respuesta."""
+
+    def __init__(self, inner: BaseAdapter, cassette: Cassette):
+        super().__init__()
+        self.inner = inner
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        inicio = time.monotonic()
+        try:
+            response = self.inner.send(request, **kwargs)
+            # Leer el cuerpo aquí para que la duración grabada incluya su descarga
+            response.content
+        except requests.RequestException as e:
+            self.cassette.append(request, time.monotonic() - inicio, error=e)
+            raise
+        self.cassette.append(request, time.monotonic() - inicio, response=response)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Adaptador que responde desde un cassette, sin red.
+
+    Cada petición se busca por método, URL y cuerpo; si no hay una grabación idéntica se usa la de
+    mismo método y URL (ej: un lote con otra IP). Las grabaciones repetidas de una misma petición se
+    devuelven en el orden en que se grabaron (ej: un 429 y luego el 200 del reintento) y, agotadas,
+    se repite la última. Sin grabación se lanza requests.ConnectionError, como un servicio caído.
+
+    'latency' simula la demora de la red: None (sin demora), "recorded" (la duración grabada de cada
+    petición) o un número fijo de segundos.
+    """
+
+    def __init__(self, cassette: Cassette, latency: Union[None, str, float] = None):
+        super().__init__()
+        self.cassette = cassette
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._exactas = defaultdict(list)
+        self._por_url = defaultdict(list)
+        for interaction in cassette.interactions:
+            req = interaction.get("request", {})
+            key = _interaction_key(req.get("method", "GET"), req.get("url", ""), req.get("body"))
+            self._exactas[key].append(interaction)
+            self._por_url[key[:2]].append(interaction)
+        self._cursores = defaultdict(int)
+
+    def _next_interaction(self, method: str, url: str, body: Optional[str]) -> Optional[Dict[str, Any]]:
+        key = _interaction_key(method, url, body)
+        for indice, candidatas in ((key, self._exactas.get(key)), (key[:2], self._por_url.get(key[:2]))):
+            if candidatas:
+                with self._lock:
+                    posicion = self._cursores[indice]
+                    self._cursores[indice] = posicion + 1
+                return candidatas[min(posicion, len(candidatas) - 1)]
+        return None
+
+    def _delay(self, interaction: Dict[str, Any]) -> float:
+        if self.latency == "recorded":
+            return float(interaction.get("elapsed") or 0)
+        return float(self.latency or 0)
+
+    def send(self, request, **kwargs):
+        interaction = self._next_interaction(request.method, request.url, _body_text(request.body))
+        if interaction is None:
+            logger.warning(f"Sin respuesta grabada para {request.method} {request.url}")
+            raise requests.ConnectionError(f"Sin respuesta grabada para {request.method} {request.url}", request=request)
+
+        demora = self._delay(interaction)
+        if demora > 0:
+            time.sleep(demora)
+
+        if "error" in interaction:
+            error = interaction["error"]
+            raise REPLAYABLE_ERRORS.get(error.get("type"), requests.ConnectionError)(error.get("message"), request=request)
+
+        grabada = interaction["response"]
+        response = requests.Response()
+        response.status_code = grabada["status"]
+        response.reason = grabada.get("reason")
+        response.headers = CaseInsensitiveDict(grabada.get("headers", {}))
+        if grabada.get("body_base64") is not None:
+            response._content = base64.b64decode(grabada["body_base64"])
+        else:
+            response._content = (grabada.get("body") or "").encode("utf-8")
+        response._content_consumed = True
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or "utf-8"
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=demora)
+        return response
+
+    def close(self):
+        pass
+
+
+def open_cassette(mode: str, path: str) -> Optional[Cassette]:
+    """Cassette del modo indicado: nuevo al grabar, cargado de 'path' al reproducir, None en vivo."""
+    if mode == "record":
+        logger.info(f"Transporte HTTP en modo grabación: {path}")
+        return Cassette(path)
+    if mode == "replay":
+        cassette = Cassette.load(path)
+        logger.info(f"Transporte HTTP en modo reproducción: {len(cassette)} peticiones grabadas en {path}")
+        return cassette
+    return None
+
+
+def install_transport(session: requests.Session, mode: str, cassette: Optional[Cassette],
+                      latency: Union[None, str, float] = None) -> requests.Session:
+    """
+    Reemplaza el transporte de una sesión (ver http_client.create_session) según el modo:
+    'record' envuelve el adaptador real con RecordingAdapter y 'replay' lo sustituye por ReplayAdapter.
+    En modo 'live' (o sin cassette) la sesión no se modifica.
+    """
+    if cassette is None or mode == "live":
+        return session
+    if mode == "record":
+        # create_session monta el mismo adaptador (pool y reintentos) para http y https
+        adaptador = RecordingAdapter(session.get_adapter("https://"), cassette)
+    else:
+        adaptador = ReplayAdapter(cassette, latency)
+    session.mount("https://", adaptador)
+    session.mount("http://", adaptador)
+    return session
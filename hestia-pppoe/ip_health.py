@@ -0,0 +1,116 @@
+# ip_health.py
+# Tabla persistente de salud de los servicios de detección de IP (orden adaptativo y circuit breaker)
+# Todos los comentarios y documentación estarán en español.
+
+import math
+import os
+import time
+from typing import List, Dict, Any, Optional
+from state import load_json_file, save_json_file
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+HEALTH_FILE_NAME = "ip_services_health.json"
+
+# Muestras recientes conservadas por servicio para calcular tasa de éxito y percentiles
+MAX_SAMPLES = 20
+# Tiempo máximo de bloqueo de un servicio aunque siga fallando
+MAX_COOLDOWN = 6 * 3600
+
+
+def load_health(state_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Carga la tabla de salud de los servicios de IP."""
+    return load_json_file(os.path.join(state_dir, HEALTH_FILE_NAME))
+
+
+def save_health(state_dir: str, health: Dict[str, Dict[str, Any]]) -> bool:
+    """Guarda la tabla de salud de los servicios de IP."""
+    return save_json_file(os.path.join(state_dir, HEALTH_FILE_NAME), health)
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano de una lista de valores (None si está vacía)."""
+    if not values:
+        return None
+    ordenados = sorted(values)
+    indice = max(math.ceil(pct / 100 * len(ordenados)) - 1, 0)
+    return ordenados[indice]
+
+
+def summarize(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calcula las métricas de un servicio a partir de sus muestras recientes:
+    tasa de éxito y latencias p50/p95 de las respuestas exitosas.
+    """
+    samples = entry.get("samples", [])
+    latencias = [latency for ok, latency in samples if ok]
+    return {
+        "success_rate": round(len(latencias) / len(samples), 3) if samples else None,
+        "p50": _percentile(latencias, 50),
+        "p95": _percentile(latencias, 95)
+    }
+
+
+def record_results(health: Dict[str, Dict[str, Any]], stats: Dict[str, Dict[str, Any]],
+                   failure_threshold: int = 3, cooldown: int = 300, now: Optional[float] = None):
+    """
+    Incorpora a la tabla los resultados de una consulta (ver ip_utils.get_external_ip, parámetro 'stats').
+
+    Tras 'failure_threshold' fallos consecutivos el circuito del servicio se abre durante 'cooldown'
+    segundos, duplicando la espera con cada fallo adicional (hasta MAX_COOLDOWN). Pasado ese tiempo el
+    servicio vuelve a probarse; un éxito lo rehabilita por completo.
+
+    Un servicio que perdió una carrera sin responder ('pending') suma una muestra fallida, de modo
+    que baja en el orden, pero solo cuenta como fallo consecutivo si no tiene ninguna respuesta
+    exitosa entre sus muestras recientes: así un servicio caído termina con el circuito abierto
+    y uno sano, solo más lento que el ganador, no.
+    """
+    now = time.time() if now is None else now
+    # Copia: los hilos de consulta abandonados pueden seguir escribiendo en 'stats'
+    for url, resultado in list(stats.items()):
+        entry = health.setdefault(url, {"samples": [], "consecutive_failures": 0, "open_until": 0,
+                                        "last_failure": None, "last_error": None})
+        responde = any(ok for ok, _ in entry.get("samples", []))
+        entry["samples"] = (entry.get("samples", []) + [[bool(resultado["ok"]), resultado["latency"]]])[-MAX_SAMPLES:]
+        if resultado["ok"]:
+            entry["consecutive_failures"] = 0
+            entry["open_until"] = 0
+        elif not (resultado.get("pending") and responde):
+            # Un servicio que responde, pero fue más lento que el ganador, no cuenta para el circuit breaker
+            entry["consecutive_failures"] = entry.get("consecutive_failures", 0) + 1
+            entry["last_failure"] = now
+            entry["last_error"] = resultado.get("error")
+            excedentes = entry["consecutive_failures"] - failure_threshold
+            if excedentes >= 0:
+                entry["open_until"] = now + min(cooldown * (2 ** excedentes), MAX_COOLDOWN)
+                logger.warning(f"Servicio de IP {url} deshabilitado temporalmente tras {entry['consecutive_failures']} fallos consecutivos")
+        entry.update(summarize(entry))
+
+
+def order_services(urls: List[str], health: Dict[str, Dict[str, Any]], timeout: float,
+                   now: Optional[float] = None) -> List[str]:
+    """
+    Ordena los servicios de IP del más conveniente al menos conveniente y omite los que tienen
+    el circuito abierto. El costo esperado de un servicio es su latencia p50 más el timeout que
+    se pierde cuando falla; los servicios sin historial conservan su posición relativa al inicio.
+    Si todos los servicios están bloqueados se devuelven todos, para no quedarse sin IP.
+    """
+    now = time.time() if now is None else now
+
+    def _costo(url):
+        entry = health.get(url)
+        if not entry or not entry.get("samples"):
+            return 0.0
+        metricas = summarize(entry)
+        return (metricas["p50"] or timeout) + (1 - (metricas["success_rate"] or 0)) * timeout
+
+    disponibles = [u for u in urls if health.get(u, {}).get("open_until", 0) <= now]
+    omitidos = [u for u in urls if u not in disponibles]
+    if omitidos:
+        logger.debug(f"Servicios de IP omitidos por fallos recientes: {omitidos}")
+    if not disponibles:
+        logger.warning("Todos los servicios de IP tienen fallos recientes; se consultarán igualmente")
+        disponibles = list(urls)
+    # sorted es estable: a igual costo se respeta el orden configurado
+    return sorted(disponibles, key=_costo)
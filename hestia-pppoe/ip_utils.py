@@ -1,37 +1,149 @@
 # src/ip_utils.py
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 import requests
 import ipaddress
+import queue
+import threading
+import time
+from collections import Counter
 from logger import get_logger
+import telemetry
 
 logger = get_logger(__name__)
 
-def get_external_ip(ip_service_urls: List[str]) -> Optional[str]:
+
+def _fetch_ip(http, service_url: str, timeout: float) -> str:
+    """
+    Consulta un servicio de IP y devuelve la IP obtenida.
+    Lanza requests.RequestException o ValueError si la respuesta no contiene una IP válida.
+    """
+    response = http.get(service_url, timeout=timeout)
+    response.raise_for_status()
+
+    # Intentar extraer IP de JSON o usar texto plano
+    content_type = response.headers.get("content-type", "").lower()
+    ip_str = response.json().get("ip", "") if "json" in content_type else response.text.strip()
+
+    if not ip_str:
+        raise ValueError("Respuesta vacía")
+    ipaddress.ip_address(ip_str)
+    return ip_str
+
+
+def _query_service(http, service_url: str, timeout: float, stats: Optional[Dict[str, Dict[str, Any]]]) -> Optional[str]:
+    """
+    Consulta un servicio de IP midiendo su latencia. Registra el resultado en 'stats' si se proporciona.
+    Devuelve la IP obtenida o None si el servicio falló.
+    """
+    inicio = time.monotonic()
+    ip_str, error = None, None
+    try:
+        logger.debug(f"Intentando obtener IP desde: {service_url}")
+        ip_str = _fetch_ip(http, service_url, timeout)
+    except (requests.RequestException, ValueError, AttributeError) as e:
+        error = str(e)
+        logger.debug(f"Error con {service_url}: {error}")
+        if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+            # Sin respuesta: el hook de la sesión no la registró
+            telemetry.record_http("GET", service_url, None, time.monotonic() - inicio)
+    if stats is not None:
+        stats[service_url] = {"ok": ip_str is not None, "latency": round(time.monotonic() - inicio, 3), "error": error}
+    return ip_str
+
+
+def _record_unfinished(ip_service_urls: List[str], stats: Optional[Dict[str, Dict[str, Any]]],
+                       elapsed: float, pending: bool):
+    """
+    Registra en 'stats' los servicios de una carrera que aún no respondieron, para que su historial
+    (ver ip_health.record_results) no quede vacío. Con 'pending' la carrera terminó porque otro servicio
+    respondió antes: la latencia registrada es solo una cota inferior. Sin 'pending' es un timeout.
+    """
+    if stats is None:
+        return
+    error = "Sin respuesta antes que el servicio ganador" if pending else "Sin respuesta dentro del tiempo máximo"
+    for url in ip_service_urls:
+        # setdefault: el hilo de consulta puede registrar su resultado real en este mismo momento
+        stats.setdefault(url, {"ok": False, "latency": round(elapsed, 3), "error": error, "pending": pending})
+
+
+def _race_external_ip(http, ip_service_urls: List[str], timeout: float, quorum: int,
+                      stats: Optional[Dict[str, Dict[str, Any]]]) -> Optional[str]:
+    """
+    Consulta en paralelo todos los servicios indicados y devuelve la primera IP válida,
+    o la primera IP en la que coincidan 'quorum' servicios.
+
+    Cada consulta corre en un hilo daemon: en cuanto hay respuesta se devuelve sin esperar
+    al resto, cuyas respuestas se descartan y no retrasan el fin del proceso. Los servicios que
+    no respondieron a tiempo quedan igualmente en 'stats' (ver _record_unfinished).
+    """
+    resultados: "queue.Queue" = queue.Queue()
+    inicio = time.monotonic()
+
+    def _worker(url):
+        resultados.put((url, _query_service(http, url, timeout, stats)))
+
+    for url in ip_service_urls:
+        threading.Thread(target=_worker, args=(url,), name=f"ip-{url}", daemon=True).start()
+
+    votos: Counter = Counter()
+    limite = time.monotonic() + timeout + 1
+    for _ in ip_service_urls:
+        try:
+            url, ip_str = resultados.get(timeout=max(limite - time.monotonic(), 0))
+        except queue.Empty:
+            break
+        if not ip_str:
+            continue
+        votos[ip_str] += 1
+        if votos[ip_str] >= quorum:
+            logger.info(f"IP externa obtenida: {ip_str} de {url}" + (f" (quórum {quorum})" if quorum > 1 else ""))
+            _record_unfinished(ip_service_urls, stats, time.monotonic() - inicio, pending=True)
+            return ip_str
+
+    # Sin ganador: los que aún no respondieron superaron el tiempo máximo de la carrera
+    _record_unfinished(ip_service_urls, stats, time.monotonic() - inicio, pending=False)
+    if votos:
+        logger.warning(f"Los servicios de IP no alcanzaron el quórum de {quorum}: {dict(votos)}")
+    return None
+
+
+def get_external_ip(ip_service_urls: List[str], session: Optional[requests.Session] = None,
+                    timeout: float = 10, mode: str = "serial", race_count: int = 0, quorum: int = 1,
+                    stats: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[str]:
     """
     Obtiene la IP externa consultando los servicios proporcionados.
-    
+
     Args:
         ip_service_urls: Lista de URLs de servicios para obtener la IP
-        
+        session: Sesión HTTP persistente a reutilizar (ver http_client.create_session)
+        timeout: Tiempo máximo de espera por servicio en segundos
+        mode: 'serial' consulta los servicios de uno en uno, en orden; 'race' consulta en paralelo
+              los primeros 'race_count' servicios (0 = todos) y usa la primera respuesta válida
+        race_count: Cantidad de servicios consultados en paralelo en modo 'race'
+        quorum: Servicios que deben coincidir en la IP en modo 'race' (1 = la primera respuesta válida)
+        stats: Diccionario opcional donde se registra, por servicio, {'ok', 'latency', 'error', 'pending'};
+               'pending' indica un servicio que perdió la carrera sin haber respondido
+
     Returns:
         La IP como string si se pudo obtener, None en caso contrario
     """
-    for service_url in ip_service_urls:
-        try:
-            logger.debug(f"Intentando obtener IP desde: {service_url}")
-            response = requests.get(service_url, timeout=10)
-            response.raise_for_status()
-            
-            # Intentar extraer IP de JSON o usar texto plano
-            content_type = response.headers.get("content-type", "").lower()
-            ip_str = response.json().get("ip", "") if "json" in content_type else response.text.strip()
-            
-            if ip_str and ipaddress.ip_address(ip_str):
-                logger.info(f"IP externa obtenida: {ip_str} de {service_url}")
-                return ip_str
-                
-        except (requests.RequestException, ValueError, AttributeError) as e:
-            logger.debug(f"Error con {service_url}: {str(e)}")
-    
+    http = session or requests
+    pendientes = list(ip_service_urls)
+
+    if mode == "race" and pendientes:
+        en_carrera = pendientes[:race_count] if race_count > 0 else pendientes
+        pendientes = pendientes[len(en_carrera):]
+        ip_str = _race_external_ip(http, en_carrera, timeout, max(min(quorum, len(en_carrera)), 1), stats)
+        if ip_str or quorum > 1:
+            return ip_str
+        if pendientes:
+            logger.debug("Ningún servicio de IP respondió en paralelo, probando el resto en orden")
+
+    for service_url in pendientes:
+        ip_str = _query_service(http, service_url, timeout, stats)
+        if ip_str:
+            logger.info(f"IP externa obtenida: {ip_str} de {service_url}")
+            return ip_str
+
     logger.debug("No se pudo obtener la IP externa de ningún servicio")
     return None
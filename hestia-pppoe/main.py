@@ -3,117 +3,414 @@
 # Todos los comentarios y mensajes están en español.
 
 import sys
+import json
+import ipaddress
+import signal
+import time
+import argparse
+from typing import Dict, Any, Optional
 from config import (
     CLOUDFLARE_API_TOKEN,
     CLOUDFLARE_API_BASE_URL,
     CLOUDFLARE_EXCLUDED_DOMAINS,
+    CLOUDFLARE_BATCH_SIZE,
+    CLOUDFLARE_MAX_WORKERS,
+    CLOUDFLARE_RATE_LIMIT_REQUESTS,
+    CLOUDFLARE_RATE_LIMIT_WINDOW,
+    CLOUDFLARE_RATE_LIMIT_BURST,
+    CLOUDFLARE_MAX_RETRIES,
+    CLOUDFLARE_RETRY_BUDGET,
+    HTTP_TIMEOUT,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_TRANSPORT_MODE,
+    HTTP_CASSETTE_PATH,
+    HTTP_REPLAY_LATENCY,
     V_LIST_USERS_PATH,
     V_LIST_WEB_DOMAINS_PATH,
     V_UPDATE_SYS_IP_PATH,
     IP_SERVICE_URLS,
+    IP_SERVICE_MODE,
+    IP_SERVICE_RACE_COUNT,
+    IP_SERVICE_QUORUM,
+    IP_SERVICE_FAILURE_THRESHOLD,
+    IP_SERVICE_COOLDOWN,
+    HESTIA_DATA_DIR,
+    HESTIA_INVENTORY_BACKEND,
+    HESTIA_MAX_WORKERS,
+    HESTIA_CLI_TIMEOUT,
+    CLOUDFLARE_RECORD_CACHE_MAX_AGE,
+    STATE_DIR,
+    RUN_REPORT_PATH,
+    DAEMON_INTERFACE,
+    DAEMON_POLL_INTERVAL,
+    RUN_DEBOUNCE_SECONDS,
+    RUN_DEADLINE_SECONDS,
+    CLOUDFLARE_PRIORITY_DOMAINS,
     logger
 )
-from hestia_cli import list_users, list_web_domains, update_hestia_system_ip
-from cloudflare_dns import list_zones, list_dns_records, update_dns_record, find_zone_for_domain
-from filter_utils import filter_excluded
+from hestia_cli import update_hestia_system_ip
+from hestia_inventory import collect_inventory, inventory_domains, INVENTORY_CACHE_FILE_NAME
+from cloudflare_dns import CloudflareClient
+from planner import build_plan
+from dns_updater import execute_plan
+from scheduler import prioritize_plan, make_deferral_check, merge_reports
+from record_cache import load_record_cache, save_record_cache
+from filter_utils import compile_exclusions, filter_domains
 from ip_utils import get_external_ip
+from ip_health import load_health, save_health, record_results, order_services
+from http_client import create_session
+from http_transport import open_cassette, install_transport
+from rate_limiter import TokenBucketRateLimiter
+from state import load_state, save_state, is_already_published, hestia_data_fingerprint, domains_fingerprint
+from netlink_monitor import watch_interface_ip, get_interface_ipv4
+from run_lock import run_single_flight
+import telemetry
 import os
-import subprocess
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Procesa los argumentos de línea de comandos.
+    Se ignoran los argumentos desconocidos: los hooks de /etc/ppp/ip-up.d reciben como argumentos
+    posicionales la interfaz, el tty, la velocidad y las IPs de la conexión PPP.
+    """
+    parser = argparse.ArgumentParser(prog="hestia-pppoe", description="Actualiza los registros A de Cloudflare con la IP pública actual.")
+    parser.add_argument("--force", action="store_true",
+                        help="Actualizar aunque la IP y el inventario no hayan cambiado desde la última publicación")
+    parser.add_argument("--plan", "--dry-run", dest="plan", action="store_true",
+                        help="Mostrar en JSON el plan de cambios (registros, peticiones y tiempo estimado) sin escribir nada")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Quedar en ejecución y actualizar cada vez que cambie la IP (ver DAEMON_INTERFACE)")
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+
+def create_context() -> Dict[str, Any]:
+    """
+    Crea los recursos que se reutilizan entre ejecuciones del flujo de actualización: sesiones HTTP
+    persistentes, cliente de Cloudflare con su limitador de tasa y las cachés en memoria
+    (salud de los servicios de IP y zonas/IDs de registros). En modo daemon se crea una sola vez.
+    """
+    # Transporte de las sesiones: red real, grabación o reproducción de un cassette (HTTP_TRANSPORT_MODE)
+    cassette = open_cassette(HTTP_TRANSPORT_MODE, HTTP_CASSETTE_PATH)
+    # Sesiones HTTP persistentes reutilizadas por todas las llamadas de la ejecución.
+    # Los servicios de IP no se reintentan en el adaptador: si uno falla se pasa al siguiente.
+    ip_session = install_transport(create_session(pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0),
+                                   HTTP_TRANSPORT_MODE, cassette, HTTP_REPLAY_LATENCY)
+    client = CloudflareClient(
+        CLOUDFLARE_API_BASE_URL,
+        CLOUDFLARE_API_TOKEN,
+        # El pool debe admitir al menos una conexión por zona procesada en paralelo.
+        # El adaptador solo reintenta errores de conexión: las respuestas 429/5xx las reintenta el
+        # cliente respetando Retry-After y el limitador de tasa
+        session=install_transport(create_session(
+            pool_maxsize=max(HTTP_POOL_MAXSIZE, CLOUDFLARE_MAX_WORKERS),
+            max_retries=HTTP_MAX_RETRIES,
+            retry_statuses=()
+        ), HTTP_TRANSPORT_MODE, cassette, HTTP_REPLAY_LATENCY),
+        timeout=HTTP_TIMEOUT,
+        max_retries=CLOUDFLARE_MAX_RETRIES,
+        retry_budget=CLOUDFLARE_RETRY_BUDGET,
+        # Limitador de tasa compartido por todas las llamadas a Cloudflare
+        rate_limiter=TokenBucketRateLimiter(
+            CLOUDFLARE_RATE_LIMIT_REQUESTS,
+            CLOUDFLARE_RATE_LIMIT_WINDOW,
+            CLOUDFLARE_RATE_LIMIT_BURST
+        )
+    )
+    return {
+        "client": client,
+        "ip_session": ip_session,
+        "cassette": cassette,
+        # Reglas de exclusión compiladas una sola vez (nombres exactos, comodines y expresiones)
+        "exclusions": compile_exclusions(CLOUDFLARE_EXCLUDED_DOMAINS),
+        # Cachés en memoria; se cargan de STATE_DIR en la primera ejecución
+        "ip_health": None,
+        "record_cache": None
+    }
+
+
+def close_context(context: Dict[str, Any]):
+    """Cierra las conexiones abiertas del contexto y guarda el cassette si se estaba grabando."""
+    context["client"].close()
+    context["ip_session"].close()
+    if HTTP_TRANSPORT_MODE == "record" and context["cassette"] is not None:
+        context["cassette"].save()
+
+
+def run_update(context: Dict[str, Any], ip: Optional[str] = None, force: bool = False, plan_only: bool = False) -> bool:
+    """
+    Ejecuta una vez el flujo completo de actualización usando los recursos de 'context' (ver create_context).
+    Al terminar registra en syslog una línea con los tiempos de la ejecución y guarda el reporte
+    completo (fases, peticiones HTTP, procesos y reintentos) en RUN_REPORT_PATH.
+
+    Args:
+        context: Sesiones, cliente de Cloudflare y cachés en memoria reutilizados entre ejecuciones
+        ip: IP pública ya conocida; si no se indica se consulta a los servicios de IP
+        force: Actualizar aunque la IP y el inventario no hayan cambiado, descartando las cachés
+        plan_only: Mostrar el plan en JSON sin escribir nada
+
+    Returns:
+        False si no se pudo obtener la IP o el flujo falló, True en caso contrario
+    """
+    medicion = telemetry.start_run()
+    medicion.set_attribute("force", force)
+    medicion.set_attribute("plan_only", plan_only)
+    ok = False
+    try:
+        ok = _run_update(context, ip=ip, force=force, plan_only=plan_only)
+        return ok
+    finally:
+        telemetry.finish_run(medicion, ok, RUN_REPORT_PATH)
+
+
+def _run_update(context: Dict[str, Any], ip: Optional[str], force: bool, plan_only: bool) -> bool:
+    """Flujo de actualización de run_update, con cada fase medida (ver telemetry)."""
+    client = context["client"]
+    # Cada ejecución dispone del presupuesto completo de espera por reintentos
+    client.reset_retry_budget()
+    # El plazo de la ejecución (RUN_DEADLINE_SECONDS) se cuenta desde aquí
+    inicio = time.monotonic()
     try:
         logger.info("Iniciando actualización de registros DNS en Cloudflare...")
-        # Obtener la IP pública real
-        nueva_ip = get_external_ip(IP_SERVICE_URLS)
+        with telemetry.span("ip"):
+            if ip:
+                # IP conocida localmente (ej: dirección de la interfaz PPP), sin consultar servicios externos
+                nueva_ip = ip
+            else:
+                # Obtener la IP pública real
+                # Los servicios de IP se consultan según su salud en ejecuciones anteriores
+                if context["ip_health"] is None:
+                    context["ip_health"] = load_health(STATE_DIR)
+                salud_ip = context["ip_health"]
+                latencias_ip = {}
+                servicios_ip = order_services(IP_SERVICE_URLS, salud_ip, timeout=HTTP_TIMEOUT)
+                nueva_ip = get_external_ip(
+                    servicios_ip,
+                    session=context["ip_session"],
+                    timeout=HTTP_TIMEOUT,
+                    mode=IP_SERVICE_MODE,
+                    race_count=IP_SERVICE_RACE_COUNT,
+                    quorum=IP_SERVICE_QUORUM,
+                    stats=latencias_ip
+                )
+                # Un servicio sano puede quedar omitido por perder carreras sin responder (ver ip_health.record_results):
+                # si ninguno de los disponibles respondió, se prueban los omitidos uno tras otro
+                omitidos = [url for url in IP_SERVICE_URLS if url not in servicios_ip]
+                if not nueva_ip and omitidos and IP_SERVICE_QUORUM <= 1:
+                    logger.info(f"Ningún servicio de IP disponible respondió, probando los omitidos: {omitidos}")
+                    nueva_ip = get_external_ip(omitidos, session=context["ip_session"], timeout=HTTP_TIMEOUT,
+                                               mode="serial", stats=latencias_ip)
+                logger.debug(f"Resultados de los servicios de IP: {latencias_ip}")
+                record_results(salud_ip, latencias_ip, failure_threshold=IP_SERVICE_FAILURE_THRESHOLD, cooldown=IP_SERVICE_COOLDOWN)
+                save_health(STATE_DIR, salud_ip)
         if not nueva_ip:
             logger.error("No se pudo obtener la IP pública. Saliendo...")
-            sys.exit(1)
+            return False
         logger.info(f"IP pública detectada: {nueva_ip}")
+        telemetry.set_attribute("ip", nueva_ip)
+
+        # Salir de inmediato si la IP y el inventario no cambiaron desde la última publicación exitosa
+        with telemetry.span("estado"):
+            estado = load_state(STATE_DIR)
+            huella = hestia_data_fingerprint(HESTIA_DATA_DIR, extra=CLOUDFLARE_EXCLUDED_DOMAINS)
+        if not force and not plan_only and is_already_published(estado, nueva_ip, huella):
+            logger.info(f"La IP {nueva_ip} y el inventario de Hestia no cambiaron desde la última publicación, nada que hacer (use --force para forzar)")
+            telemetry.set_attribute("skipped", True)
+            return True
 
-        # 1. Obtener usuarios de Hestia
-        usuarios = list_users(cmd_path=V_LIST_USERS_PATH)
-        logger.info(f"Usuarios Hestia encontrados: {usuarios}")
+        # 1. Obtener usuarios de Hestia y sus dominios web
+        # Un usuario que no se pudo consultar se omite sin interrumpir al resto
+        usuarios_con_error = {}
+        with telemetry.span("inventario"):
+            inventario = collect_inventory(
+                HESTIA_INVENTORY_BACKEND,
+                data_dir=HESTIA_DATA_DIR,
+                users_cmd=V_LIST_USERS_PATH,
+                domains_cmd=V_LIST_WEB_DOMAINS_PATH,
+                max_workers=HESTIA_MAX_WORKERS,
+                timeout=HESTIA_CLI_TIMEOUT,
+                errors=usuarios_con_error,
+                # Solo se vuelven a leer los usuarios cuyo web.conf cambió (--force lee todos)
+                cache_path=os.path.join(STATE_DIR, INVENTORY_CACHE_FILE_NAME),
+                refresh=force
+            )
+        logger.info(f"Usuarios Hestia encontrados: {list(inventario.keys())}")
 
         # 2. Obtener dominios y alias gestionados por cada usuario
-        hestia_domains = []
-        for user in usuarios:
-            dominios = list_web_domains(user, cmd_path=V_LIST_WEB_DOMAINS_PATH)
-            for d in dominios:
-                hestia_domains.append(d['DOMAIN'])
-                hestia_domains.extend(d['ALIASES'])
+        hestia_domains = inventory_domains(inventario)
         logger.info(f"Dominios y alias gestionados por Hestia: {hestia_domains}")
 
-        # 3. Filtrar dominios y alias excluidos
-        excluidos = CLOUDFLARE_EXCLUDED_DOMAINS  # Ya es una lista procesada en config.py
-        hestia_domains_filtrados = filter_excluded(hestia_domains, excluidos)
+        # 3. Filtrar dominios y alias excluidos, descartando repetidos
+        hestia_domains_filtrados = filter_domains(hestia_domains, context["exclusions"])
         logger.info(f"Dominios tras exclusión: {hestia_domains_filtrados}")
 
-        # 4. Obtener zonas de Cloudflare y mapear dominios a sus zonas
-        dominios_por_zona = {}
-        for dominio in hestia_domains_filtrados:
-            zona = find_zone_for_domain(CLOUDFLARE_API_BASE_URL, CLOUDFLARE_API_TOKEN, dominio)
-            if not zona:
-                logger.warning(f"No se encontró zona para el dominio {dominio}, omitiendo...")
-                continue
-            
-            if zona['name'] not in dominios_por_zona:
-                dominios_por_zona[zona['name']] = {
-                    'zone_id': zona['id'],
-                    'dominios': []
-                }
-            dominios_por_zona[zona['name']]['dominios'].append(dominio)
-        
-        logger.info(f"Zonas a actualizar: {list(dominios_por_zona.keys())}")
-
-        # 5. Para cada zona, obtener registros DNS y actualizar
-        for zona_nombre, zona_info in dominios_por_zona.items():
-            logger.info(f"Procesando zona: {zona_nombre} ({zona_info['zone_id']})")
-            
-            # Obtener registros DNS para los dominios de esta zona
-            for dominio in zona_info['dominios']:
-                registros = list_dns_records(
-                    CLOUDFLARE_API_BASE_URL, 
-                    CLOUDFLARE_API_TOKEN, 
-                    zona_info['zone_id'],
-                    name=dominio
+        # Sin acceso a los datos de Hestia, la huella se calcula a partir de los dominios obtenidos
+        if huella is None:
+            huella = domains_fingerprint(hestia_domains_filtrados)
+            if not force and not plan_only and is_already_published(estado, nueva_ip, huella):
+                logger.info(f"La IP {nueva_ip} y los dominios de Hestia no cambiaron desde la última publicación, nada que hacer (use --force para forzar)")
+                telemetry.set_attribute("skipped", True)
+                return True
+
+        # 4. Planificar: obtener zonas de Cloudflare (una sola vez, o de la caché si sigue vigente),
+        # mapear dominios a sus zonas y comparar sus registros A con la IP, sin escribir nada.
+        # Con --force se descartan las zonas e IDs guardados y se vuelven a consultar
+        if force or context["record_cache"] is None:
+            context["record_cache"] = {} if force else load_record_cache(STATE_DIR)
+        cache_registros = context["record_cache"]
+        with telemetry.span("plan"):
+            plan = build_plan(
+                client,
+                hestia_domains_filtrados,
+                nueva_ip,
+                record_cache=cache_registros,
+                cache_max_age=CLOUDFLARE_RECORD_CACHE_MAX_AGE,
+                batch_size=CLOUDFLARE_BATCH_SIZE,
+                max_workers=CLOUDFLARE_MAX_WORKERS
+            )
+        if CLOUDFLARE_PRIORITY_DOMAINS:
+            # Las zonas y registros prioritarios se escriben primero
+            plan = prioritize_plan(plan, CLOUDFLARE_PRIORITY_DOMAINS)
+        logger.info(f"Plan: {plan['summary']}, {plan['requests']['writes']} peticiones de escritura (~{plan['estimated_seconds']}s de espera por límite de tasa)")
+        if plan_only:
+            print(json.dumps(plan, indent=2, ensure_ascii=False))
+            return True
+
+        # 5. Aplicar el plan (zonas en paralelo). Con plazo, las zonas no prioritarias que ya no
+        # alcanzan a aplicarse a tiempo se postergan hasta después de sincronizar la IP del sistema
+        postergar = make_deferral_check(
+            client,
+            inicio + RUN_DEADLINE_SECONDS if RUN_DEADLINE_SECONDS > 0 else None,
+            critical_priority=len(CLOUDFLARE_PRIORITY_DOMAINS),
+            batch_size=CLOUDFLARE_BATCH_SIZE
+        )
+        with telemetry.span("registros"):
+            reporte = execute_plan(
+                client,
+                plan,
+                ttl=1,
+                proxied=False,
+                batch_size=CLOUDFLARE_BATCH_SIZE,
+                max_workers=CLOUDFLARE_MAX_WORKERS,
+                record_cache=cache_registros,
+                should_defer=postergar
+            )
+        logger.info(f"Resumen de registros A ({reporte['zones']} zonas en {reporte['duration']}s): {reporte['summary']}")
+
+        ip_sistema_sincronizada = False
+        if reporte['deferred']:
+            logger.info(f"{len(reporte['deferred'])} zonas postergadas; se aplicarán tras sincronizar la IP del sistema")
+            with telemetry.span("ip_sistema"):
+                update_hestia_system_ip(V_UPDATE_SYS_IP_PATH, logger)
+            ip_sistema_sincronizada = True
+            # Segunda pasada, sin plazo, con las zonas postergadas
+            with telemetry.span("registros"):
+                segunda = execute_plan(
+                    client,
+                    {"ip": nueva_ip, "zones": reporte['deferred']},
+                    ttl=1,
+                    proxied=False,
+                    batch_size=CLOUDFLARE_BATCH_SIZE,
+                    max_workers=CLOUDFLARE_MAX_WORKERS,
+                    record_cache=cache_registros
                 )
-                
-                # Filtrar solo registros A que coincidan exactamente con el dominio
-                registros_filtrados = [
-                    r for r in registros 
-                    if r['type'] == 'A' and r['name'] == dominio
-                ]
-                
-                # Actualizar cada registro
-                for record in registros_filtrados:
-                    if record['content'] == nueva_ip:
-                        logger.info(f"El registro A para {dominio} ya está actualizado con la IP {nueva_ip}")
-                        continue
-                        
-                    logger.info(f"Actualizando registro A: {dominio} ({record['id']}) en zona {zona_nombre} con IP {nueva_ip}")
-                    try:
-                        resultado = update_dns_record(
-                            CLOUDFLARE_API_BASE_URL,
-                            CLOUDFLARE_API_TOKEN,
-                            zona_info['zone_id'],
-                            record['id'],
-                            dominio,
-                            nueva_ip,
-                            ttl=1,
-                            proxied=False
-                        )
-                        logger.debug(f"Respuesta Cloudflare: {resultado}")
-                    except Exception as e:
-                        logger.error(f"Error al actualizar registro {dominio} en zona {zona_nombre}: {e}")
+            reporte = merge_reports(reporte, segunda)
+            logger.info(f"Resumen tras la segunda pasada ({segunda['duration']}s): {reporte['summary']}")
+
+        telemetry.set_attribute("records", reporte['summary'])
+
+        # Guardar las zonas e IDs conocidos; ante errores se vuelven a consultar las zonas en la próxima ejecución
+        if CLOUDFLARE_RECORD_CACHE_MAX_AGE > 0:
+            if reporte['summary']['error']:
+                cache_registros.pop("zones_validated_at", None)
+            save_record_cache(STATE_DIR, cache_registros)
+
+        # Registrar la publicación solo si todos los registros y usuarios quedaron al día
+        if reporte['summary']['error'] == 0 and not usuarios_con_error:
+            save_state(STATE_DIR, nueva_ip, huella)
+        elif usuarios_con_error:
+            logger.warning(f"No se pudieron consultar los usuarios {list(usuarios_con_error.keys())}; la próxima ejecución volverá a intentarlo")
+        else:
+            logger.warning(f"{reporte['summary']['error']} registros con error; la próxima ejecución volverá a intentarlo")
 
         logger.info("Actualización de registros DNS completada.")
 
         # Sincronizar la IP del sistema en HestiaCP al final del flujo
-        update_hestia_system_ip(V_UPDATE_SYS_IP_PATH, logger)
+        if not ip_sistema_sincronizada:
+            with telemetry.span("ip_sistema"):
+                update_hestia_system_ip(V_UPDATE_SYS_IP_PATH, logger)
+        return True
 
     except Exception as e:
         logger.error(f"Error en el flujo principal: {e}")
+        return False
+
+
+def run_daemon(force: bool = False):
+    """
+    Modo daemon: mantiene el contexto (sesiones y cachés) en memoria y ejecuta el flujo cada vez
+    que cambia la IP. Con DAEMON_INTERFACE configurada, la IP nueva se obtiene localmente de los
+    eventos netlink de la interfaz (ver netlink_monitor.watch_interface_ip), con consulta periódica
+    cada DAEMON_POLL_INTERVAL segundos como respaldo. Sin interfaz, se consulta a los servicios de
+    IP en cada intervalo; las ejecuciones sin cambios terminan sin llamar a Cloudflare.
+    """
+    # SIGTERM (systemctl stop) termina el bucle ordenadamente y cierra las conexiones
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    context = create_context()
+    try:
+        if DAEMON_INTERFACE:
+            logger.info(f"Modo daemon: esperando cambios de dirección en {DAEMON_INTERFACE}")
+            primera = True
+            for ip_evento in watch_interface_ip(DAEMON_INTERFACE, DAEMON_POLL_INTERVAL):
+                logger.info(f"Dirección de {DAEMON_INTERFACE}: {ip_evento}")
+
+                def _ejecutar(forzar):
+                    # Tras la ventana de agrupación se usa la dirección actual de la interfaz, no la del evento
+                    ip = get_interface_ipv4(DAEMON_INTERFACE) or ip_evento
+                    if not ipaddress.ip_address(ip).is_global:
+                        # Dirección privada o CGNAT: la IP pública se obtiene de los servicios de IP
+                        logger.info(f"La dirección {ip} no es pública, se consultará la IP pública")
+                        ip = None
+                    return run_update(context, ip=ip, force=forzar)
+
+                run_single_flight(STATE_DIR, _ejecutar, force=force and primera, debounce=RUN_DEBOUNCE_SECONDS)
+                primera = False
+        else:
+            logger.info(f"Modo daemon: consultando la IP pública cada {DAEMON_POLL_INTERVAL}s")
+            primera = True
+            while True:
+                # Misma ventana de agrupación que con eventos netlink: un enlace inestable no encadena ejecuciones
+                run_single_flight(STATE_DIR, lambda forzar: run_update(context, force=forzar), force=force and primera,
+                                  debounce=RUN_DEBOUNCE_SECONDS)
+                primera = False
+                time.sleep(DAEMON_POLL_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Modo daemon finalizado")
+        close_context(context)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.daemon:
+        run_daemon(force=args.force)
+        return
+
+    context = create_context()
+    try:
+        if args.plan:
+            # El plan no escribe nada: no necesita el candado de ejecución
+            ok = run_update(context, plan_only=True)
+        else:
+            # Las invocaciones simultáneas (ej: reconexiones PPPoE seguidas) se agrupan en una sola ejecución
+            ok = run_single_flight(STATE_DIR, lambda forzar: run_update(context, force=forzar),
+                                   force=args.force, debounce=RUN_DEBOUNCE_SECONDS)
+    finally:
+        close_context(context)
+    if ok is False:
         sys.exit(1)
 
 if __name__ == "__main__":
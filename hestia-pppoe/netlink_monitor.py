@@ -0,0 +1,134 @@
+# netlink_monitor.py
+# Detección local de cambios de dirección IPv4 de una interfaz (ej: ppp0) mediante eventos
+# rtnetlink del kernel, con consulta periódica como respaldo
+# Todos los comentarios y documentación estarán en español.
+
+import fcntl
+import socket
+import struct
+import time
+from typing import Iterator, List, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Constantes de rtnetlink (linux/rtnetlink.h, linux/if_addr.h)
+NETLINK_ROUTE = 0
+RTMGRP_IPV4_IFADDR = 0x10
+RTM_NEWADDR = 20
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_LABEL = 3
+
+# ioctl para obtener la dirección IPv4 de una interfaz (linux/sockios.h)
+SIOCGIFADDR = 0x8915
+
+_NLMSGHDR = struct.Struct("=LHHLL")   # longitud, tipo, flags, secuencia, pid
+_IFADDRMSG = struct.Struct("=BBBBI")  # familia, prefijo, flags, scope, índice de interfaz
+_RTATTR = struct.Struct("=HH")        # longitud, tipo
+
+
+def _align(length: int) -> int:
+    """Alinea una longitud a 4 bytes, como exige netlink."""
+    return (length + 3) & ~3
+
+
+def parse_newaddr_messages(data: bytes) -> List[dict]:
+    """
+    Extrae de un datagrama rtnetlink los mensajes RTM_NEWADDR de IPv4.
+    Devuelve una lista de {'index', 'label', 'address'}, donde 'address' es la dirección local
+    (IFA_LOCAL, la propia en enlaces punto a punto como PPP) o, si no viene, IFA_ADDRESS.
+    """
+    eventos = []
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        msg_len, msg_type, _, _, _ = _NLMSGHDR.unpack_from(data, offset)
+        if msg_len < _NLMSGHDR.size:
+            break
+        fin = offset + msg_len
+        if msg_type == RTM_NEWADDR and fin - offset >= _NLMSGHDR.size + _IFADDRMSG.size:
+            family, _, _, _, index = _IFADDRMSG.unpack_from(data, offset + _NLMSGHDR.size)
+            atributos = {}
+            pos = offset + _NLMSGHDR.size + _IFADDRMSG.size
+            while pos + _RTATTR.size <= fin:
+                attr_len, attr_type = _RTATTR.unpack_from(data, pos)
+                if attr_len < _RTATTR.size:
+                    break
+                atributos[attr_type] = data[pos + _RTATTR.size:pos + attr_len]
+                pos += _align(attr_len)
+            direccion = atributos.get(IFA_LOCAL) or atributos.get(IFA_ADDRESS)
+            if family == socket.AF_INET and direccion and len(direccion) == 4:
+                eventos.append({
+                    "index": index,
+                    "label": atributos.get(IFA_LABEL, b"").split(b"\0", 1)[0].decode(errors="replace"),
+                    "address": socket.inet_ntoa(direccion)
+                })
+        offset += _align(msg_len)
+    return eventos
+
+
+def get_interface_ipv4(interface: str) -> Optional[str]:
+    """Devuelve la dirección IPv4 actual de una interfaz, o None si no existe o no tiene dirección."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        try:
+            resultado = fcntl.ioctl(s.fileno(), SIOCGIFADDR, struct.pack("256s", interface[:15].encode()))
+        except OSError:
+            return None
+    return socket.inet_ntoa(resultado[20:24])
+
+
+def open_netlink_socket() -> Optional[socket.socket]:
+    """
+    Abre un socket rtnetlink suscrito a los cambios de direcciones IPv4.
+    Devuelve None si el sistema no lo permite (se usará solo la consulta periódica).
+    """
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        sock.bind((0, RTMGRP_IPV4_IFADDR))
+        return sock
+    except (AttributeError, OSError) as e:
+        logger.warning(f"No se pudo abrir el socket netlink ({e}); se usará solo la consulta periódica")
+        return None
+
+
+def watch_interface_ip(interface: str, poll_interval: float) -> Iterator[str]:
+    """
+    Entrega la IPv4 de 'interface' cada vez que cambia, empezando por la actual si la tiene.
+
+    Los cambios llegan como eventos RTM_NEWADDR de rtnetlink, sin consultar ningún servicio
+    externo. Si no llega ningún evento en 'poll_interval' segundos se consulta la dirección
+    de la interfaz directamente, lo que cubre eventos perdidos y sistemas sin netlink.
+    """
+    # El socket se abre antes de leer la dirección inicial: los eventos que lleguen mientras
+    # se procesa una actualización quedan en su búfer y no se pierden
+    sock = open_netlink_socket()
+    try:
+        ultima_ip = get_interface_ipv4(interface)
+        if ultima_ip:
+            yield ultima_ip
+
+        while True:
+            ip_actual = None
+            if sock is not None:
+                sock.settimeout(poll_interval)
+                try:
+                    for evento in parse_newaddr_messages(sock.recv(65536)):
+                        if evento["label"] == interface:
+                            ip_actual = evento["address"]
+                            logger.debug(f"Evento netlink: {interface} tiene la dirección {ip_actual}")
+                except socket.timeout:
+                    ip_actual = get_interface_ipv4(interface)
+                except OSError as e:
+                    # ENOBUFS: se perdieron eventos; la dirección actual se obtiene consultando la interfaz
+                    logger.debug(f"Error al leer eventos netlink: {e}")
+                    ip_actual = get_interface_ipv4(interface)
+            else:
+                time.sleep(poll_interval)
+                ip_actual = get_interface_ipv4(interface)
+
+            if ip_actual and ip_actual != ultima_ip:
+                ultima_ip = ip_actual
+                yield ip_actual
+    finally:
+        if sock is not None:
+            sock.close()
@@ -0,0 +1,169 @@
+# planner.py
+# Etapa de planificación: a partir del inventario y de las zonas de Cloudflare construye el plan
+# completo de la ejecución (qué registros cambiar, cuántas peticiones y cuánto tiempo costará)
+# Todos los comentarios y documentación estarán en español.
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from cloudflare_dns import (
+    CloudflareClient,
+    BATCH_MAX_CHANGES,
+    list_zones,
+    build_zone_index,
+    find_zone_in_index,
+    get_zone_a_records_snapshot,
+    plan_zone_updates
+)
+from record_cache import get_cached_zones, store_zones, get_cached_zone_records, store_zone_records
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Origen de los registros de cada zona del plan
+ZONE_SOURCES = ("cache", "snapshot", "error")
+
+
+def _record_summary(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Datos de un registro que se incluyen en el plan."""
+    return {"id": record["id"], "name": record["name"], "content": record.get("content")}
+
+
+def map_domains_to_zones(zone_index: Dict[str, Dict[str, Any]],
+                         domains: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Agrupa los dominios por su zona de Cloudflare (ver cloudflare_dns.build_zone_index).
+
+    Returns:
+        ({zona: {'zone_id', 'dominios'}}, [dominios sin zona])
+    """
+    dominios_por_zona: Dict[str, Dict[str, Any]] = {}
+    sin_zona = []
+    for dominio in domains:
+        zona = find_zone_in_index(zone_index, dominio)
+        if not zona:
+            logger.warning(f"No se encontró zona para el dominio {dominio}, omitiendo...")
+            sin_zona.append(dominio)
+            continue
+        if zona['name'] not in dominios_por_zona:
+            dominios_por_zona[zona['name']] = {'zone_id': zona['id'], 'dominios': []}
+        dominios_por_zona[zona['name']]['dominios'].append(dominio)
+    return dominios_por_zona, sin_zona
+
+
+def plan_zone(client: CloudflareClient, zone_name: str, zone_id: str, domains: List[str], ip: str,
+              record_cache: Optional[Dict[str, Any]] = None, cache_max_age: int = 0,
+              use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Planifica los cambios de una zona.
+
+    Si 'record_cache' tiene vigentes los registros de todos los dominios, el plan se arma sin consultar
+    la API (origen 'cache'), comparando con la IP el contenido guardado de cada registro. En caso
+    contrario se obtiene el snapshot de registros A de la zona (origen 'snapshot'), se compara con
+    la IP y se guardan los IDs en la caché. Un error al consultar la zona queda en el plan (origen 'error').
+
+    Returns:
+        {'name', 'id', 'source', 'domains', 'update', 'unchanged', 'missing', 'error'}
+    """
+    zone_plan = {"name": zone_name, "id": zone_id, "source": "snapshot", "domains": list(domains),
+                 "update": [], "unchanged": [], "missing": [], "error": None}
+
+    en_cache = None
+    if use_cache and record_cache is not None:
+        en_cache = get_cached_zone_records(record_cache, zone_name, zone_id, domains, cache_max_age)
+    if en_cache is not None:
+        zone_plan.update(
+            source="cache",
+            update=[_record_summary(r) for r in en_cache["records"] if r.get("content") != ip],
+            unchanged=[_record_summary(r) for r in en_cache["records"] if r.get("content") == ip],
+            missing=en_cache["missing"]
+        )
+        return zone_plan
+
+    try:
+        snapshot = get_zone_a_records_snapshot(client, zone_id)
+    except Exception as e:
+        logger.error(f"Error al obtener los registros de la zona {zone_name}: {e}")
+        zone_plan.update(source="error", error=str(e))
+        return zone_plan
+
+    if record_cache is not None:
+        store_zone_records(record_cache, zone_name, zone_id, snapshot, domains)
+    cambios = plan_zone_updates(snapshot, domains, ip)
+    zone_plan.update(
+        update=[_record_summary(r) for r in cambios["update"]],
+        unchanged=[_record_summary(r) for r in cambios["unchanged"]],
+        missing=cambios["missing"]
+    )
+    return zone_plan
+
+
+def count_write_requests(zone_plan: Dict[str, Any], batch_size: int = BATCH_MAX_CHANGES) -> int:
+    """Peticiones de escritura necesarias para aplicar el plan de una zona."""
+    cambios = len(zone_plan["update"])
+    if batch_size <= 1:
+        return cambios
+    return math.ceil(cambios / batch_size)
+
+
+def build_plan(client: CloudflareClient, domains: List[str], ip: str, record_cache: Optional[Dict[str, Any]] = None,
+               cache_max_age: int = 0, batch_size: int = BATCH_MAX_CHANGES, max_workers: int = 1) -> Dict[str, Any]:
+    """
+    Construye el plan completo de la ejecución sin escribir nada en Cloudflare.
+
+    Obtiene las zonas (de la caché si sigue vigente), agrupa los dominios por zona y planifica
+    hasta 'max_workers' zonas en paralelo. El plan incluye las peticiones ya realizadas para
+    construirlo, las escrituras pendientes y el tiempo que el límite de tasa actual impondría
+    a esas escrituras.
+
+    Returns:
+        {'ip', 'zones', 'unzoned', 'summary', 'requests', 'estimated_seconds'}, donde 'zones' es la
+        lista de planes por zona (ver plan_zone) en el orden de los dominios.
+    """
+    peticiones_iniciales = client.request_count
+
+    zonas = get_cached_zones(record_cache, domains, cache_max_age) if record_cache is not None else None
+    if zonas is None:
+        zonas = list_zones(client)
+        zonas_consultadas = True
+    else:
+        logger.debug("Usando la lista de zonas en caché")
+        zonas_consultadas = False
+    zone_index = build_zone_index(zonas)
+    logger.info(f"Zonas disponibles en Cloudflare: {len(zone_index)}")
+
+    dominios_por_zona, sin_zona = map_domains_to_zones(zone_index, domains)
+    if zonas_consultadas and record_cache is not None:
+        store_zones(record_cache, zonas, sin_zona)
+    logger.info(f"Zonas a actualizar: {list(dominios_por_zona.keys())}")
+
+    def _planificar(item):
+        zone_name, zone_info = item
+        return plan_zone(client, zone_name, zone_info['zone_id'], zone_info['dominios'], ip,
+                         record_cache=record_cache, cache_max_age=cache_max_age)
+
+    items = list(dominios_por_zona.items())
+    if record_cache is not None:
+        record_cache.setdefault("zones", {})
+    if max_workers <= 1 or len(items) <= 1:
+        planes = [_planificar(item) for item in items]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items)), thread_name_prefix="plan") as executor:
+            # map conserva el orden de las zonas
+            planes = list(executor.map(_planificar, items))
+
+    summary = {
+        "update": sum(len(p["update"]) for p in planes),
+        "unchanged": sum(len(p["unchanged"]) for p in planes),
+        "missing": sum(len(p["missing"]) for p in planes),
+        "error": sum(len(p["domains"]) for p in planes if p["source"] == "error")
+    }
+    escrituras = sum(count_write_requests(p, batch_size) for p in planes)
+    return {
+        "ip": ip,
+        "zones": planes,
+        "unzoned": sin_zona,
+        "summary": summary,
+        "requests": {"planning": client.request_count - peticiones_iniciales, "writes": escrituras},
+        "estimated_seconds": round(client.rate_limiter.estimate_wait(escrituras), 3)
+    }
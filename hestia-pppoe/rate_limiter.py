@@ -0,0 +1,74 @@
+# rate_limiter.py
+# Limitador de tasa de peticiones (token bucket) compartido por los clientes de API
+# Todos los comentarios y documentación estarán en español.
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucketRateLimiter:
+    """
+    Limitador de tasa tipo "token bucket" seguro para hilos.
+
+    El cubo admite ráfagas de hasta 'burst' peticiones sin espera y se rellena a una tasa
+    constante calculada para que, en cualquier ventana de 'window_seconds', nunca se superen
+    'max_requests' peticiones (ráfaga inicial incluida). Solo se espera cuando el presupuesto
+    está realmente agotado.
+    """
+
+    def __init__(self, max_requests: int, window_seconds: float, burst: Optional[int] = None):
+        if max_requests < 1 or window_seconds <= 0:
+            raise ValueError("max_requests debe ser >= 1 y window_seconds > 0")
+        if burst is None or burst < 1:
+            burst = 1
+        # La ráfaga no puede consumir todo el presupuesto de la ventana
+        self.capacity = min(burst, max(max_requests - 1, 1))
+        self.rate = max(max_requests - self.capacity, 1) / window_seconds
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Agrega los tokens generados desde la última recarga, sin superar la capacidad."""
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self) -> float:
+        """
+        Reserva un token para una petición, esperando solo si el cubo está vacío.
+        La reserva se hace bajo candado y la espera fuera de él, por lo que varios hilos
+        obtienen turnos ordenados sin bloquearse entre sí más de lo necesario.
+
+        Returns:
+            Segundos esperados antes de poder realizar la petición
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """
+        Detiene la emisión de peticiones durante 'seconds' segundos (ej: tras un 429 con Retry-After).
+        El cubo queda en deuda, de modo que todos los hilos esperan en acquire y luego el
+        ritmo se reanuda a la tasa configurada, sin ráfaga inmediata.
+        """
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def estimate_wait(self, requests: int) -> float:
+        """
+        Estima cuántos segundos habría que esperar, con el estado actual del cubo, para
+        realizar 'requests' peticiones seguidas. No consume tokens.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            deficit = requests - self._tokens
+        return deficit / self.rate if deficit > 0 else 0.0
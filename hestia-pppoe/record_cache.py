@@ -0,0 +1,128 @@
+# record_cache.py
+# Caché persistente de zonas y registros A de Cloudflare (dominio -> zona -> registro con su IP publicada)
+# Todos los comentarios y documentación estarán en español.
+
+import os
+import time
+from typing import List, Dict, Any, Optional
+from state import load_json_file, save_json_file
+
+RECORD_CACHE_FILE_NAME = "record_cache.json"
+
+
+def load_record_cache(state_dir: str) -> Dict[str, Any]:
+    """Carga la caché de zonas y registros."""
+    return load_json_file(os.path.join(state_dir, RECORD_CACHE_FILE_NAME))
+
+
+def save_record_cache(state_dir: str, cache: Dict[str, Any]) -> bool:
+    """Guarda la caché de zonas y registros."""
+    return save_json_file(os.path.join(state_dir, RECORD_CACHE_FILE_NAME), cache)
+
+
+def _is_fresh(validated_at: Optional[float], max_age: int, now: float) -> bool:
+    """Indica si una entrada validada en 'validated_at' sigue vigente."""
+    return max_age > 0 and validated_at is not None and now - validated_at < max_age
+
+
+def get_cached_zones(cache: Dict[str, Any], domains: List[str], max_age: int,
+                     now: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Devuelve la lista de zonas guardada si sigue vigente y cubre todos los dominios: cada dominio
+    debe pertenecer a una zona conocida o figurar entre los dominios sin zona de la última consulta.
+    Devuelve None si hay que volver a consultar las zonas.
+    """
+    now = time.time() if now is None else now
+    zonas = cache.get("zones_list")
+    if zonas is None or not _is_fresh(cache.get("zones_validated_at"), max_age, now):
+        return None
+
+    nombres = {z["name"].lower().rstrip(".") for z in zonas}
+    sin_zona = set(cache.get("unzoned", []))
+    for domain in domains:
+        partes = domain.lower().rstrip(".").split(".")
+        if domain.lower() not in sin_zona and not any(".".join(partes[i:]) in nombres for i in range(len(partes) - 1)):
+            return None
+    return zonas
+
+
+def store_zones(cache: Dict[str, Any], zones: List[Dict[str, Any]], unzoned: List[str], now: Optional[float] = None):
+    """Guarda la lista de zonas consultada y los dominios que no pertenecen a ninguna."""
+    cache["zones_list"] = [{"id": z["id"], "name": z["name"]} for z in zones]
+    cache["unzoned"] = sorted(set(d.lower() for d in unzoned))
+    cache["zones_validated_at"] = time.time() if now is None else now
+    # Descartar los registros de zonas que ya no existen
+    vigentes = {z["name"] for z in zones}
+    cache["zones"] = {name: entry for name, entry in cache.get("zones", {}).items() if name in vigentes}
+
+
+def get_cached_zone_records(cache: Dict[str, Any], zone_name: str, zone_id: str, domains: List[str],
+                            max_age: int, now: Optional[float] = None) -> Optional[Dict[str, List[Any]]]:
+    """
+    Devuelve los registros A conocidos de los dominios de una zona, sin consultar la API:
+    {'records': [{'id', 'name', 'content'}], 'missing': [dominios sin registro A]}, donde 'content'
+    es la última IP leída o escrita en el registro.
+    Devuelve None si la zona no está en la caché, cambió de ID, venció, hay dominios desconocidos o
+    algún registro no tiene contenido guardado (caché de una versión anterior): sin él, el plan
+    tendría que escribir todos los registros.
+    """
+    now = time.time() if now is None else now
+    entry = cache.get("zones", {}).get(zone_name)
+    if not entry or entry.get("id") != zone_id or not _is_fresh(entry.get("validated_at"), max_age, now):
+        return None
+
+    conocidos = entry.get("records", {})
+    sin_registro = set(entry.get("missing", []))
+    registros, faltantes, vistos = [], [], set()
+    for domain in domains:
+        clave = domain.lower()
+        if clave in conocidos:
+            for record in conocidos[clave]:
+                if "content" not in record:
+                    return None
+                if record["id"] not in vistos:
+                    vistos.add(record["id"])
+                    registros.append(record)
+        elif clave in sin_registro:
+            faltantes.append(domain)
+        else:
+            return None
+    return {"records": registros, "missing": faltantes}
+
+
+def store_zone_records(cache: Dict[str, Any], zone_name: str, zone_id: str, snapshot: Dict[str, List[Dict[str, Any]]],
+                       domains: List[str], now: Optional[float] = None):
+    """
+    Guarda los IDs y el contenido de los registros A de los dominios de una zona a partir de su
+    snapshot (ver cloudflare_dns.get_zone_a_records_snapshot).
+    """
+    records, missing = {}, []
+    for domain in domains:
+        encontrados = snapshot.get(domain.lower())
+        if encontrados:
+            records[domain.lower()] = [{"id": r["id"], "name": r["name"], "content": r.get("content")} for r in encontrados]
+        else:
+            missing.append(domain.lower())
+    cache.setdefault("zones", {})[zone_name] = {
+        "id": zone_id,
+        "validated_at": time.time() if now is None else now,
+        "records": records,
+        "missing": missing
+    }
+
+
+def set_records_content(cache: Dict[str, Any], zone_name: str, record_ids: List[str], content: str):
+    """Registra en la caché el contenido (IP) recién escrito en los registros indicados de una zona."""
+    ids = set(record_ids)
+    entry = cache.get("zones", {}).get(zone_name)
+    if not entry or not ids:
+        return
+    for registros in entry.get("records", {}).values():
+        for record in registros:
+            if record["id"] in ids:
+                record["content"] = content
+
+
+def evict_zone(cache: Dict[str, Any], zone_name: str):
+    """Elimina una zona de la caché (sus IDs dejaron de ser válidos)."""
+    cache.get("zones", {}).pop(zone_name, None)
@@ -0,0 +1,119 @@
+# run_lock.py
+# Ejecución única (single-flight) entre procesos: candado flock sobre STATE_DIR/run.lock,
+# ventana de espera (debounce) y marca de repetición para agrupar ráfagas de reconexiones
+# Todos los comentarios y documentación estarán en español.
+
+import fcntl
+import os
+import time
+from typing import Callable, Optional, TextIO
+from state import load_json_file, save_json_file
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+LOCK_FILE_NAME = "run.lock"
+# Solicitudes recibidas mientras otra ejecución tenía el candado
+PENDING_FILE_NAME = "run.pending"
+
+
+def try_lock(state_dir: str) -> Optional[TextIO]:
+    """
+    Intenta tomar el candado de ejecución sin esperar. Devuelve el archivo abierto (que mantiene
+    el candado hasta release_lock) o None si otro proceso lo tiene.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    handle = open(os.path.join(state_dir, LOCK_FILE_NAME), "a+")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
+
+def release_lock(handle: TextIO):
+    """Libera el candado de ejecución."""
+    fcntl.flock(handle, fcntl.LOCK_UN)
+    handle.close()
+
+
+def lock_owner(state_dir: str) -> Optional[str]:
+    """PID registrado por el proceso que tiene (o tuvo) el candado."""
+    try:
+        with open(os.path.join(state_dir, LOCK_FILE_NAME), "r") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def request_rerun(state_dir: str, force: bool = False):
+    """Deja una solicitud de repetición para el proceso que tiene el candado."""
+    path = os.path.join(state_dir, PENDING_FILE_NAME)
+    pendiente = load_json_file(path)
+    save_json_file(path, {"force": bool(pendiente.get("force")) or force, "requested_at": time.time()})
+
+
+def take_rerun_request(state_dir: str) -> Optional[dict]:
+    """Consume la solicitud de repetición pendiente, si existe."""
+    path = os.path.join(state_dir, PENDING_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    pendiente = load_json_file(path)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return pendiente
+
+
+def run_single_flight(state_dir: str, run: Callable[[bool], bool], force: bool = False,
+                      debounce: float = 0) -> Optional[bool]:
+    """
+    Ejecuta 'run(force)' garantizando que solo un proceso a la vez actualiza Cloudflare.
+
+    - Si otro proceso tiene el candado, se deja una solicitud de repetición y se termina de
+      inmediato: el proceso en curso volverá a ejecutar el flujo al terminar, con la IP más reciente.
+    - Con el candado tomado se esperan 'debounce' segundos antes de cada ejecución, de modo que
+      todas las solicitudes que lleguen en esa ventana se resuelven con una sola ejecución.
+    - Las solicitudes que llegan durante una ejecución provocan una única repetición.
+
+    Returns:
+        El resultado de la última ejecución, o None si la solicitud quedó a cargo de otro proceso
+    """
+    handle = try_lock(state_dir)
+    if handle is None:
+        request_rerun(state_dir, force)
+        # El otro proceso pudo haber terminado entre el intento y la solicitud
+        handle = try_lock(state_dir)
+        if handle is None:
+            logger.info(f"Ya hay una ejecución en curso (pid {lock_owner(state_dir)}); se repetirá al terminar con la IP más reciente")
+            return None
+
+    resultado = None
+    while True:
+        try:
+            while True:
+                if debounce > 0:
+                    logger.debug(f"Esperando {debounce}s para agrupar reconexiones cercanas")
+                    time.sleep(debounce)
+                # Las solicitudes recibidas hasta ahora quedan cubiertas por esta ejecución
+                pendiente = take_rerun_request(state_dir)
+                resultado = run(force or bool(pendiente and pendiente.get("force")))
+                force = False
+                if not os.path.exists(os.path.join(state_dir, PENDING_FILE_NAME)):
+                    break
+                logger.info("Se recibieron nuevas solicitudes durante la ejecución; repitiendo con la IP más reciente")
+        finally:
+            release_lock(handle)
+
+        # Una solicitud pudo llegar justo antes de liberar el candado
+        if not os.path.exists(os.path.join(state_dir, PENDING_FILE_NAME)):
+            return resultado
+        handle = try_lock(state_dir)
+        if handle is None:
+            return resultado
@@ -0,0 +1,88 @@
+# scheduler.py
+# Prioridad de dominios y plazo por ejecución: ordena el plan para que los registros prioritarios
+# se escriban primero y decide qué zonas se postergan a una segunda pasada
+# Todos los comentarios y documentación estarán en español.
+
+import time
+from fnmatch import fnmatchcase
+from typing import List, Dict, Any, Optional, Callable
+from cloudflare_dns import CloudflareClient, BATCH_MAX_CHANGES
+from planner import count_write_requests
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def domain_priority(domain: str, patterns: List[str]) -> int:
+    """
+    Prioridad de un dominio: posición del primer patrón (fnmatch, ej: 'ejemplo.com', '*.tienda.cl')
+    que coincide con él, o len(patterns) si ninguno coincide. Un número menor es más prioritario.
+    """
+    nombre = domain.lower().rstrip('.')
+    for i, patron in enumerate(patterns):
+        if fnmatchcase(nombre, patron):
+            return i
+    return len(patterns)
+
+
+def prioritize_plan(plan: Dict[str, Any], patterns: List[str]) -> Dict[str, Any]:
+    """
+    Devuelve una copia del plan (ver planner.build_plan) ordenada por prioridad.
+
+    Cada zona recibe la prioridad de su dominio más prioritario ('priority') y las zonas se
+    ordenan por ella, conservando el orden original entre zonas de igual prioridad. Dentro de
+    cada zona, los registros a actualizar también se ordenan, de modo que los prioritarios
+    van en el primer lote. Sin patrones el plan no cambia de orden.
+    """
+    zonas = []
+    for zone_plan in plan['zones']:
+        zonas.append({
+            **zone_plan,
+            "priority": min((domain_priority(d, patterns) for d in zone_plan['domains']), default=len(patterns)),
+            "update": sorted(zone_plan['update'], key=lambda r: domain_priority(r['name'], patterns))
+        })
+    zonas.sort(key=lambda zp: zp['priority'])
+    return {**plan, "zones": zonas}
+
+
+def make_deferral_check(client: CloudflareClient, deadline: Optional[float], critical_priority: int,
+                        batch_size: int = BATCH_MAX_CHANGES) -> Optional[Callable[[Dict[str, Any]], bool]]:
+    """
+    Construye la función que decide, justo antes de aplicar una zona, si se posterga.
+
+    Una zona se posterga cuando ya no alcanza el tiempo hasta 'deadline' (time.monotonic) para
+    sus escrituras, según la espera que impondría el limitador de tasa en ese momento. Las zonas
+    con prioridad menor que 'critical_priority' (las que coinciden con algún patrón) nunca se
+    postergan. Sin plazo devuelve None.
+    """
+    if deadline is None:
+        return None
+
+    def _postergar(zone_plan: Dict[str, Any]) -> bool:
+        if zone_plan.get('priority', critical_priority) < critical_priority or not zone_plan['update']:
+            return False
+        restante = deadline - time.monotonic()
+        if restante <= 0:
+            return True
+        return client.rate_limiter.estimate_wait(count_write_requests(zone_plan, batch_size)) > restante
+
+    return _postergar
+
+
+def merge_reports(first: Dict[str, Any], follow_up: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combina el reporte de la primera pasada (ver dns_updater.execute_plan) con el de la pasada
+    de las zonas postergadas: los resultados 'deferred' se reemplazan por los definitivos.
+    """
+    resultados = [r for r in first['results'] if r['status'] != 'deferred'] + follow_up['results']
+    summary = {status: 0 for status in first['summary']}
+    for r in resultados:
+        summary[r['status']] = summary.get(r['status'], 0) + 1
+    return {
+        "ip": first['ip'],
+        "zones": first['zones'],
+        "duration": round(first['duration'] + follow_up['duration'], 3),
+        "summary": summary,
+        "results": resultados,
+        "deferred": follow_up['deferred']
+    }
@@ -63,6 +63,19 @@ PYINSTALLER_CMD=(
     "--hidden-import" "hestia_cli"
     "--hidden-import" "ip_utils"
     "--hidden-import" "filter_utils"
+    "--hidden-import" "rate_limiter"
+    "--hidden-import" "http_client"
+    "--hidden-import" "http_transport"
+    "--hidden-import" "dns_updater"
+    "--hidden-import" "state"
+    "--hidden-import" "ip_health"
+    "--hidden-import" "hestia_inventory"
+    "--hidden-import" "record_cache"
+    "--hidden-import" "planner"
+    "--hidden-import" "netlink_monitor"
+    "--hidden-import" "run_lock"
+    "--hidden-import" "scheduler"
+    "--hidden-import" "telemetry"
 )
 
 # Añadir archivos al paquete
@@ -73,6 +86,19 @@ FILES=(
     "hestia_cli.py"
     "ip_utils.py"
     "filter_utils.py"
+    "rate_limiter.py"
+    "http_client.py"
+    "http_transport.py"
+    "dns_updater.py"
+    "state.py"
+    "ip_health.py"
+    "hestia_inventory.py"
+    "record_cache.py"
+    "planner.py"
+    "netlink_monitor.py"
+    "run_lock.py"
+    "scheduler.py"
+    "telemetry.py"
 )
 
 for file in "${FILES[@]}"; do
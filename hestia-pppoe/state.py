@@ -0,0 +1,108 @@
+# state.py
+# Estado persistente entre ejecuciones (última IP publicada y huella del inventario de Hestia)
+# Todos los comentarios y documentación estarán en español.
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+STATE_FILE_NAME = "state.json"
+
+
+def load_json_file(path: str) -> Dict[str, Any]:
+    """
+    Carga un archivo JSON de estado. Devuelve un diccionario vacío si no existe o está dañado.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudo leer el archivo de estado {path}: {e}")
+        return {}
+
+
+def save_json_file(path: str, data: Dict[str, Any]) -> bool:
+    """
+    Guarda un archivo JSON de estado de forma atómica (archivo temporal + rename),
+    creando el directorio si no existe. Devuelve True si se guardó correctamente.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el archivo de estado {path}: {e}")
+        return False
+
+
+def load_state(state_dir: str) -> Dict[str, Any]:
+    """Carga el estado de la última publicación exitosa."""
+    return load_json_file(os.path.join(state_dir, STATE_FILE_NAME))
+
+
+def save_state(state_dir: str, ip: str, inventory_fingerprint: str) -> bool:
+    """Registra la IP publicada y la huella del inventario con el que se publicó."""
+    return save_json_file(os.path.join(state_dir, STATE_FILE_NAME), {
+        "ip": ip,
+        "inventory_fingerprint": inventory_fingerprint,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    })
+
+
+def is_already_published(state: Dict[str, Any], ip: str, inventory_fingerprint: Optional[str]) -> bool:
+    """Indica si la IP y el inventario coinciden con la última publicación exitosa."""
+    return bool(inventory_fingerprint) and state.get("ip") == ip \
+        and state.get("inventory_fingerprint") == inventory_fingerprint
+
+
+def file_signature(path: str) -> Optional[str]:
+    """
+    Firma de un archivo o directorio a partir de su fecha de modificación y tamaño.
+    Devuelve None si no existe o no se puede leer.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def hestia_data_fingerprint(hestia_data_dir: str, extra: List[str] = None) -> Optional[str]:
+    """
+    Calcula una huella del inventario de Hestia sin ejecutar ningún comando: combina los nombres
+    de usuario con la fecha de modificación y el tamaño del web.conf de cada uno.
+    'extra' permite incluir otros valores que afectan al resultado (ej: dominios excluidos).
+    Devuelve None si el directorio de datos de Hestia no está disponible.
+    """
+    users_dir = os.path.join(hestia_data_dir, "users")
+    try:
+        users = sorted(entry.name for entry in os.scandir(users_dir) if entry.is_dir())
+    except OSError:
+        return None
+
+    digest = hashlib.sha256()
+    for user in users:
+        firma = file_signature(os.path.join(users_dir, user, "web.conf")) or "-"
+        digest.update(f"{user}:{firma}".encode() + b"\n")
+    for valor in sorted(extra or []):
+        digest.update(f"extra:{valor}".encode() + b"\n")
+    return digest.hexdigest()
+
+
+def domains_fingerprint(domains: List[str]) -> str:
+    """Calcula una huella del conjunto de dominios (independiente del orden y de duplicados)."""
+    digest = hashlib.sha256()
+    for domain in sorted(set(d.lower() for d in domains)):
+        digest.update(domain.encode() + b"\n")
+    return digest.hexdigest()
@@ -0,0 +1,254 @@
+# telemetry.py
+# Medición de tiempos por fase y de llamadas externas (HTTP y procesos) de cada ejecución
+# Todos los comentarios y documentación estarán en español.
+
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from logger import get_logger
+from state import save_json_file
+
+logger = get_logger(__name__)
+
+REPORT_VERSION = 1
+
+# Segmentos de URL seguidos de un identificador (ej: /zones/<id>/dns_records/<id>)
+_ID_COLLECTIONS = {"zones", "dns_records"}
+_NON_ID_SEGMENTS = {"dns_records", "batch"}
+_DIGITS = re.compile(r"^\d+$")
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """
+    Nombre agregable de un endpoint: método, host y ruta con los identificadores reemplazados por
+    ':id' (ej: 'PUT api.cloudflare.com/client/v4/zones/:id/dns_records/:id'). La query se descarta.
+    """
+    partes = urlsplit(url)
+    segmentos = partes.path.split("/")
+    for i in range(1, len(segmentos)):
+        anterior, segmento = segmentos[i - 1], segmentos[i]
+        if segmento and ((anterior in _ID_COLLECTIONS and segmento not in _NON_ID_SEGMENTS) or _DIGITS.match(segmento)):
+            segmentos[i] = ":id"
+    return f"{method.upper()} {partes.netloc}{'/'.join(segmentos)}"
+
+
+def _new_stats() -> Dict[str, Any]:
+    return {"count": 0, "duration": 0.0, "max": 0.0, "errors": 0}
+
+
+def _add(stats: Dict[str, Any], elapsed: float, error: bool = False):
+    stats["count"] += 1
+    stats["duration"] += elapsed
+    stats["max"] = max(stats["max"], elapsed)
+    if error:
+        stats["errors"] += 1
+
+
+def _rounded(stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in stats.items()}
+
+
+class RunTelemetry:
+    """
+    Tiempos de una ejecución, agregados por nombre (seguro entre hilos):
+
+    - Fases del flujo (span): duración total, cantidad, máximo y errores (excepciones).
+    - Peticiones HTTP por endpoint: cantidad, duración, códigos de respuesta y bytes enviados/recibidos.
+    - Procesos por comando: cantidad, duración y errores (código de salida distinto de 0 o timeout).
+    - Contadores (ej: reintentos, segundos de espera por límite de tasa) y atributos de la ejecución.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = datetime.now(timezone.utc)
+        self._inicio = time.monotonic()
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.http: Dict[str, Dict[str, Any]] = {}
+        self.subprocesses: Dict[str, Dict[str, Any]] = {}
+        self.counters: Counter = Counter()
+        self.attributes: Dict[str, Any] = {}
+
+    @contextmanager
+    def span(self, name: str):
+        """Mide la duración del bloque como una fase 'name' (cuenta un error si lanza una excepción)."""
+        inicio = time.monotonic()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            with self._lock:
+                _add(self.phases.setdefault(name, _new_stats()), time.monotonic() - inicio, error)
+
+    def record_http(self, method: str, url: str, status: Optional[int], elapsed: float,
+                    bytes_sent: int = 0, bytes_received: int = 0):
+        """Registra una petición HTTP; 'status' None indica que falló sin respuesta (conexión o timeout)."""
+        nombre = endpoint_name(method, url)
+        error = status is None or status >= 400
+        with self._lock:
+            stats = self.http.get(nombre)
+            if stats is None:
+                stats = self.http[nombre] = dict(_new_stats(), bytes_sent=0, bytes_received=0, status={})
+            _add(stats, elapsed, error)
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+            clave = str(status) if status is not None else "error"
+            stats["status"][clave] = stats["status"].get(clave, 0) + 1
+
+    def record_subprocess(self, command: str, elapsed: float, error: bool = False):
+        """Registra un proceso lanzado (por nombre de comando)."""
+        nombre = os.path.basename(command)
+        with self._lock:
+            _add(self.subprocesses.setdefault(nombre, _new_stats()), elapsed, error)
+
+    def incr(self, name: str, amount: float = 1):
+        """Suma 'amount' al contador 'name'."""
+        with self._lock:
+            self.counters[name] += amount
+
+    def set_attribute(self, name: str, value: Any):
+        """Fija un atributo de la ejecución (ej: la IP publicada)."""
+        with self._lock:
+            self.attributes[name] = value
+
+    def report(self, ok: bool) -> Dict[str, Any]:
+        """Reporte de la ejecución listo para guardarse como JSON."""
+        with self._lock:
+            http_total = _new_stats()
+            bytes_sent = bytes_received = 0
+            for stats in self.http.values():
+                http_total["count"] += stats["count"]
+                http_total["duration"] += stats["duration"]
+                http_total["max"] = max(http_total["max"], stats["max"])
+                http_total["errors"] += stats["errors"]
+                bytes_sent += stats["bytes_sent"]
+                bytes_received += stats["bytes_received"]
+            procesos_total = _new_stats()
+            for stats in self.subprocesses.values():
+                procesos_total["count"] += stats["count"]
+                procesos_total["duration"] += stats["duration"]
+                procesos_total["max"] = max(procesos_total["max"], stats["max"])
+                procesos_total["errors"] += stats["errors"]
+            return {
+                "version": REPORT_VERSION,
+                "started_at": self.started_at.isoformat(),
+                "duration": round(time.monotonic() - self._inicio, 4),
+                "ok": ok,
+                "attributes": dict(self.attributes),
+                "phases": {k: _rounded(v) for k, v in self.phases.items()},
+                "http": {
+                    "total": _rounded(dict(http_total, bytes_sent=bytes_sent, bytes_received=bytes_received)),
+                    "endpoints": {k: _rounded(v) for k, v in sorted(self.http.items())},
+                },
+                "subprocess": {
+                    "total": _rounded(procesos_total),
+                    "commands": {k: _rounded(v) for k, v in sorted(self.subprocesses.items())},
+                },
+                "counters": {k: round(v, 4) if isinstance(v, float) else v for k, v in self.counters.items()},
+            }
+
+
+def summary_line(report: Dict[str, Any]) -> str:
+    """Resumen del reporte en una línea para syslog."""
+    fases = ", ".join(f"{nombre} {stats['duration']:.2f}s" for nombre, stats in report["phases"].items())
+    http = report["http"]["total"]
+    procesos = report["subprocess"]["total"]
+    contadores = report["counters"]
+    kib = (http["bytes_sent"] + http["bytes_received"]) / 1024
+    estado = "correcta" if report["ok"] else "fallida"
+    return (f"Ejecución {estado} en {report['duration']:.2f}s"
+            + (f" | fases: {fases}" if fases else "")
+            + f" | HTTP: {http['count']} peticiones en {http['duration']:.2f}s"
+            + f" ({contadores.get('http_retries', 0)} reintentos, {http['errors']} errores, {kib:.1f} KiB)"
+            + f" | procesos: {procesos['count']} en {procesos['duration']:.2f}s")
+
+
+# Telemetría de la ejecución en curso; None fuera de una ejecución (las mediciones se descartan)
+_current: Optional[RunTelemetry] = None
+
+
+def start_run() -> RunTelemetry:
+    """Inicia la medición de una ejecución nueva y la deja como la ejecución en curso."""
+    global _current
+    _current = RunTelemetry()
+    return _current
+
+
+def finish_run(telemetry: RunTelemetry, ok: bool, report_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Termina la medición: registra el resumen en syslog, guarda el reporte JSON en 'report_path'
+    (si se indica) y devuelve el reporte.
+    """
+    global _current
+    if _current is telemetry:
+        _current = None
+    report = telemetry.report(ok)
+    logger.info(summary_line(report))
+    if report_path:
+        save_json_file(report_path, report)
+    return report
+
+
+@contextmanager
+def span(name: str):
+    """Mide una fase de la ejecución en curso (sin ejecución en curso no mide nada)."""
+    telemetry = _current
+    if telemetry is None:
+        yield
+        return
+    with telemetry.span(name):
+        yield
+
+
+def record_http(method: str, url: str, status: Optional[int], elapsed: float,
+                bytes_sent: int = 0, bytes_received: int = 0):
+    telemetry = _current
+    if telemetry is not None:
+        telemetry.record_http(method, url, status, elapsed, bytes_sent, bytes_received)
+
+
+def record_subprocess(command: str, elapsed: float, error: bool = False):
+    telemetry = _current
+    if telemetry is not None:
+        telemetry.record_subprocess(command, elapsed, error)
+
+
+def incr(name: str, amount: float = 1):
+    telemetry = _current
+    if telemetry is not None:
+        telemetry.incr(name, amount)
+
+
+def set_attribute(name: str, value: Any):
+    telemetry = _current
+    if telemetry is not None:
+        telemetry.set_attribute(name, value)
+
+
+def http_response_hook(response, *args, **kwargs):
+    """
+    Hook de respuesta de requests (ver http_client.create_session): registra cada respuesta con su
+    duración y tamaño. Las peticiones que fallan sin respuesta las registra quien las captura.
+    """
+    telemetry = _current
+    if telemetry is None:
+        return response
+    request = response.request
+    body = request.body or b""
+    # Sin stream el cuerpo se lee igual a continuación; con stream se usa Content-Length para no consumirlo
+    if kwargs.get("stream"):
+        recibidos = int(response.headers.get("Content-Length") or 0)
+    else:
+        recibidos = len(response.content or b"")
+    telemetry.record_http(request.method, request.url, response.status_code, response.elapsed.total_seconds(),
+                          len(body.encode("utf-8") if isinstance(body, str) else body), recibidos)
+    return response
@@ -6,4 +6,25 @@ Este paquete proporciona un servidor de prueba que simula los servicios de:
 - API de Cloudflare DNS
 """
 
+import os
+
 __version__ = "0.1.0"
+
+# Archivo de datos compartidos del servidor y de los scripts debug_v-list-*.
+# DEBUG_SHARED_DATA_PATH permite usar otro archivo (ej: una flota sintética de tests/scripts/benchmark_fleet.py)
+SHARED_DATA_PATH = os.path.abspath(
+    os.environ.get('DEBUG_SHARED_DATA_PATH') or os.path.join(os.path.dirname(__file__), 'debug_shared_data.json')
+)
+
+# Con DEBUG_VERBOSE=1 se imprime cada petición recibida (cabeceras, filtros y cuerpos).
+# Por defecto el servidor es silencioso para no ser el cuello de botella en las pruebas de carga.
+VERBOSE = os.environ.get('DEBUG_VERBOSE', '').lower() in ('1', 'true', 'yes')
+
+
+def debug_log(message, *args):
+    """
+    Imprime un mensaje de depuración solo si DEBUG_VERBOSE está activo.
+    Como en logging, los argumentos se formatean con '%' solo si el mensaje se imprime.
+    """
+    if VERBOSE:
+        print(message % args if args else message)
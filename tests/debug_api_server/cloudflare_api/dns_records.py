@@ -2,68 +2,16 @@
 Módulo que maneja el endpoint para listar registros DNS de Cloudflare.
 """
 
-import re
 from flask import Blueprint, jsonify, request
 from datetime import datetime, timezone
 
-# Importar zonas al final para evitar dependencias circulares
-from .zones import MOCK_ZONES
+from .pagination import paginate
+from .. import debug_log
+from ..store import store
 
 # Crear Blueprint para las rutas de registros DNS
 dns_records_bp = Blueprint('dns_records', __name__)
 
-import os
-import json
-
-# Ruta absoluta al archivo de datos compartidos
-SHARED_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'debug_shared_data.json'))
-
-def load_mock_dns_records():
-    print(f"[MOCK] Cargando registros DNS desde: {SHARED_DATA_PATH}")
-    if os.path.exists(SHARED_DATA_PATH):
-        try:
-            with open(SHARED_DATA_PATH, 'r') as f:
-                data = json.load(f)
-            cloudflare_domains = data.get("cloudflare_domains", {})
-            print(f"[MOCK] Dominios encontrados en cloudflare_domains: {list(cloudflare_domains.keys())}")
-            records = {}
-            for idx, (domain, registros) in enumerate(cloudflare_domains.items()):
-                zone_id = f"mock_zone_id_{idx+1}"
-                # Solo registros tipo A
-                registros_a = [
-                    {
-                        "id": f"mock_dns_id_{idx+1}_{i+1}",
-                        "type": "A",
-                        "name": reg["name"],
-                        "content": reg["content"],
-                        "proxied": False,
-                        "ttl": 1,
-                        "created_on": "2025-01-01T00:00:00Z",
-                        "modified_on": "2025-01-01T00:00:00Z"
-                    }
-                    for i, reg in enumerate(registros)
-                ]
-                records[zone_id] = registros_a
-            print(f"[MOCK] Registros DNS generados para zonas: {list(records.keys())}")
-            return records
-        except Exception as e:
-            print(f"[MOCK][ERROR] Error al leer debug_shared_data.json: {e}")
-            return {}
-    else:
-        print(f"[MOCK][ERROR] Archivo no encontrado: {SHARED_DATA_PATH}")
-    return {}
-
-MOCK_DNS_RECORDS = load_mock_dns_records()
-
-
-# Datos de ejemplo para zonas (usados en las respuestas)
-MOCK_ZONES = [
-    {
-        "id": "eee3864538734cd57fecd8eaa51a91bb",
-        "name": "binarius.cl"
-    }
-]
-
 def _verify_auth():
     """
     Verifica la autenticación del usuario.
@@ -93,7 +41,7 @@ def _verify_auth():
 
 @dns_records_bp.route('/zones/<zone_id>/dns_records', methods=['GET'])
 def list_dns_records(zone_id):
-    print(f"[DEBUG] GET /zones/{zone_id}/dns_records - Query: {request.args}")
+    debug_log("[DEBUG] GET /zones/%s/dns_records - Query: %s", zone_id, request.args)
     """
     Lista los registros DNS de una zona.
     
@@ -103,6 +51,8 @@ def list_dns_records(zone_id):
     Query Parameters:
         type (str, opcional): Filtra los registros por tipo (A, CNAME, etc.).
         name (str, opcional): Filtra los registros por nombre.
+        page (int, opcional): Página solicitada (por defecto 1).
+        per_page (int, opcional): Registros por página (por defecto 100, máximo 5000000).
         
     Returns:
         JSON: Lista de registros DNS que coinciden con los filtros.
@@ -116,19 +66,12 @@ def list_dns_records(zone_id):
     record_type = request.args.get('type')
     record_name = request.args.get('name')
     
-    # Obtener registros de la zona
-    records = MOCK_DNS_RECORDS.get(zone_id, [])
+    # Obtener los registros de la zona que coinciden con los filtros (índices por nombre y tipo)
+    records = store.list_records(zone_id, record_type=record_type, name=record_name)
+    zone_name = store.zone_name(zone_id)
     
-    # Filtrar registros según los parámetros
     filtered_records = []
     for record in records:
-        # Aplicar filtros
-        if record_type and record["type"] != record_type:
-            continue
-            
-        if record_name and record["name"] != record_name:
-            continue
-        
         # Construir respuesta con el formato de la API real
         record_data = {
             "id": record["id"],
@@ -140,10 +83,7 @@ def list_dns_records(zone_id):
             "ttl": record.get("ttl", 1),
             "locked": False,
             "zone_id": zone_id,
-            "zone_name": next(
-                (z["name"] for z in MOCK_ZONES if z["id"] == zone_id),
-                "binarius.cl"
-            ),
+            "zone_name": zone_name,
             "created_on": record.get("created_on", datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')),
             "modified_on": record.get("modified_on", datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')),
             "meta": {
@@ -155,23 +95,20 @@ def list_dns_records(zone_id):
         }
         filtered_records.append(record_data)
     
+    # Paginar como la API real (por defecto 100, máximo 5000000 registros por página)
+    page_records, result_info = paginate(filtered_records, default_per_page=100, max_per_page=5000000)
+    
     return jsonify({
         "success": True,
         "errors": [],
         "messages": [],
-        "result": filtered_records,
-        "result_info": {
-            "page": 1,
-            "per_page": 100,
-            "count": len(filtered_records),
-            "total_count": len(filtered_records),
-            "total_pages": 1
-        }
+        "result": page_records,
+        "result_info": result_info
     })
 
 @dns_records_bp.route('/zones/<zone_id>/dns_records/<record_id>', methods=['PUT'])
 def update_dns_record(zone_id, record_id):
-    print(f"[DEBUG] PUT /zones/{zone_id}/dns_records/{record_id} - Body: {request.json}")
+    debug_log("[DEBUG] PUT /zones/%s/dns_records/%s - Body: %s", zone_id, record_id, request.get_json(silent=True))
     """
     Actualiza un registro DNS existente.
     
@@ -246,11 +183,8 @@ def update_dns_record(zone_id, record_id):
             "result": None
         }), 400
     
-    # Buscar la zona
-    zone_records = MOCK_DNS_RECORDS.get(zone_id, [])
     # Buscar el registro a actualizar
-    record_to_update = next((r for r in zone_records if r["id"] == record_id), None)
-    if not record_to_update:
+    if not store.get_record(zone_id, record_id):
         return jsonify({
             "success": False, 
             "errors": [{"code": 81044, "message": "Record not found"}],
@@ -259,7 +193,7 @@ def update_dns_record(zone_id, record_id):
         }), 404
     
     # Validar que el nombre del registro pertenezca al dominio de la zona
-    zone_name = next((z["name"] for z in zones.MOCK_ZONES if z["id"] == zone_id), "")
+    zone_name = store.zone_name(zone_id)
     record_name = record_data['name']
     
     if not (record_name == zone_name or record_name.endswith('.' + zone_name)):
@@ -271,13 +205,12 @@ def update_dns_record(zone_id, record_id):
         }), 400
     
     # Actualizar el registro
-    record_to_update.update({
+    record_to_update = store.update_record(zone_id, record_id, {
         "name": record_name,
         "type": record_data['type'],
         "content": record_data['content'],
         "ttl": int(record_data['ttl']),
-        "proxied": bool(record_data['proxied']),
-        "modified_on": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+        "proxied": bool(record_data['proxied'])
     })
     
     # Devolver el registro actualizado en el formato correcto (idéntico a Cloudflare)
@@ -311,5 +244,71 @@ def update_dns_record(zone_id, record_id):
         }
     })
 
-# Importar zonas al final para evitar dependencias circulares
-from . import zones
+# Máximo de cambios por lote (límite del plan gratuito de Cloudflare)
+BATCH_MAX_CHANGES = 200
+
+def _batch_error(code, message, status):
+    """Construye una respuesta de error del endpoint de lotes."""
+    return jsonify({
+        "success": False,
+        "errors": [{"code": code, "message": message}],
+        "messages": [],
+        "result": None
+    }), status
+
+@dns_records_bp.route('/zones/<zone_id>/dns_records/batch', methods=['POST'])
+def batch_dns_records(zone_id):
+    debug_log("[DEBUG] POST /zones/%s/dns_records/batch - Body: %s", zone_id, request.get_json(silent=True))
+    """
+    Aplica un lote de cambios sobre los registros DNS de una zona.
+    Igual que la API real, el lote es transaccional: se valida completo antes de aplicar
+    y, si algún cambio no es válido, no se aplica ninguno.
+    
+    Args:
+        zone_id (str): ID de la zona DNS.
+        
+    Request Body:
+        JSON con las listas opcionales 'deletes', 'patches', 'puts' y 'posts'.
+        
+    Returns:
+        JSON: Registros resultantes agrupados por tipo de operación.
+    """
+    # Verificar autenticación
+    error, status = _verify_auth()
+    if error:
+        return jsonify(error), status
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return _batch_error(6003, "Invalid request body", 400)
+    
+    deletes = data.get('deletes') or []
+    patches = data.get('patches') or []
+    puts = data.get('puts') or []
+    posts = data.get('posts') or []
+    
+    total = len(deletes) + len(patches) + len(puts) + len(posts)
+    if total > BATCH_MAX_CHANGES:
+        return _batch_error(81058, f"Batch size limit exceeded: {total} > {BATCH_MAX_CHANGES}", 400)
+    
+    # Validar todo el lote antes de aplicar cualquier cambio
+    missing_ids = store.missing_records(zone_id, [change.get('id') for change in deletes + patches + puts])
+    if missing_ids:
+        return _batch_error(81044, f"Record not found: {missing_ids[0]}", 404)
+    for change in puts + posts:
+        missing = [f for f in ('type', 'name', 'content') if f not in change]
+        if missing:
+            return _batch_error(1004, f"Missing required fields: {', '.join(missing)}", 400)
+    for change in patches + puts + posts:
+        if change.get('type', 'A') != 'A':
+            return _batch_error(1005, "Only A records supported in mock", 400)
+    
+    # Aplicar en el mismo orden que Cloudflare: deletes, patches, puts, posts
+    result = store.apply_batch(zone_id, deletes, patches, puts, posts)
+    
+    return jsonify({
+        "success": True,
+        "errors": [],
+        "messages": [],
+        "result": result
+    })
@@ -0,0 +1,37 @@
+"""
+Utilidades de paginación para los endpoints simulados de la API de Cloudflare.
+"""
+
+from flask import request
+
+
+def paginate(items, default_per_page, max_per_page):
+    """
+    Pagina una lista de elementos según los parámetros 'page' y 'per_page' de la consulta,
+    imitando el comportamiento de la API real de Cloudflare.
+
+    Args:
+        items (list): Elementos ya filtrados.
+        default_per_page (int): Tamaño de página cuando no se indica 'per_page'.
+        max_per_page (int): Tamaño de página máximo admitido por el endpoint.
+
+    Returns:
+        tuple: (elementos de la página solicitada, diccionario 'result_info')
+    """
+    page = max(request.args.get('page', 1, type=int) or 1, 1)
+    per_page = request.args.get('per_page', default_per_page, type=int) or default_per_page
+    per_page = min(max(per_page, 1), max_per_page)
+
+    total_count = len(items)
+    total_pages = max((total_count + per_page - 1) // per_page, 1)
+    start = (page - 1) * per_page
+    page_items = items[start:start + per_page]
+
+    result_info = {
+        "page": page,
+        "per_page": per_page,
+        "count": len(page_items),
+        "total_count": total_count,
+        "total_pages": total_pages
+    }
+    return page_items, result_info
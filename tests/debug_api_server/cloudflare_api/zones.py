@@ -3,54 +3,26 @@ Módulo que maneja los endpoints relacionados con zonas DNS de Cloudflare.
 """
 
 from flask import Blueprint, jsonify, request
-from datetime import datetime, timezone
+
+from .pagination import paginate
+from .. import debug_log
+from ..store import store
 
 # Crear un Blueprint para las rutas de zonas
 zones_bp = Blueprint('zones', __name__)
 
-import os
-import json
-
-# Ruta absoluta al archivo de datos compartidos
-SHARED_DATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'debug_shared_data.json'))
-
-def load_mock_zones():
-    print(f"[MOCK] Cargando zonas desde: {SHARED_DATA_PATH}")
-    if os.path.exists(SHARED_DATA_PATH):
-        try:
-            with open(SHARED_DATA_PATH, 'r') as f:
-                data = json.load(f)
-            print(f"[MOCK] Dominios encontrados en cloudflare_domains: {data.get('cloudflare_domains', [])}")
-            zones = []
-            for idx, domain in enumerate(data.get("cloudflare_domains", [])):
-                zones.append({
-                    "id": f"mock_zone_id_{idx+1}",
-                    "name": domain,
-                    "status": "active",
-                    "created_on": "2025-01-01T00:00:00Z",
-                    "modified_on": "2025-01-01T00:00:00Z"
-                })
-            print(f"[MOCK] Zonas cargadas: {[z['name'] for z in zones]}")
-            return zones
-        except Exception as e:
-            print(f"[MOCK][ERROR] Error al leer debug_shared_data.json: {e}")
-            return []
-    else:
-        print(f"[MOCK][ERROR] Archivo no encontrado: {SHARED_DATA_PATH}")
-    return []
-
-MOCK_ZONES = load_mock_zones()
-
 
 @zones_bp.route('/zones', methods=['GET'])
 def list_zones():
-    print(f"[DEBUG] GET /zones - Query: {request.args}")
+    debug_log("[DEBUG] GET /zones - Query: %s", request.args)
     """
     Lista las zonas DNS disponibles.
     
     Query Parameters:
         name (str, opcional): Filtra las zonas por nombre.
         status (str, opcional): Filtra las zonas por estado (ej. 'active').
+        page (int, opcional): Página solicitada (por defecto 1).
+        per_page (int, opcional): Zonas por página (por defecto 20, máximo 50).
         
     Returns:
         JSON: Lista de zonas que coinciden con los filtros.
@@ -79,94 +51,27 @@ def list_zones():
     zone_name = request.args.get('name')
     status = request.args.get('status', 'active')
     
-    # Filtrar zonas según los parámetros
-    filtered_zones = []
-    for zone in MOCK_ZONES:
-        # Aplicar filtros
-        if zone_name and zone["name"] != zone_name:
-            continue
-            
-        if status and zone.get("status") != status:
-            continue
-            
-        # Construir respuesta con el formato de la API real
-        zone_data = {
-            "id": zone["id"],
-            "name": zone["name"],
-            "status": zone.get("status", "active"),
-            "paused": False,
-            "type": "full",
-            "development_mode": 0,
-            "name_servers": [
-                f"ns1.{zone['name']}",
-                f"ns2.{zone['name']}"
-            ],
-            "original_name_servers": None,
-            "original_registrar": None,
-            "original_dnshost": None,
-            "modified_on": zone.get("modified_on", datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')),
-            "created_on": zone.get("created_on", datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')),
-            "activated_on": zone.get("activated_on", datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')),
-            "meta": {
-                "step": 2,
-                "custom_certificate_quota": 0,
-                "page_rule_quota": 3,
-                "phishing_detected": False
-            },
-            "owner": {
-                "id": "7ae3782b91d2827bcd865d3cd9d7182c",
-                "type": "user",
-                "email": "usuario@ejemplo.com"
-            },
-            "account": {
-                "id": "9fff3513fb250e4890d55655f987effd",
-                "name": f"{zone['name']}'s Account"
-            },
-            "tenant": {
-                "id": None,
-                "name": None
-            },
-            "tenant_unit": {
-                "id": None
-            },
-            "permissions": ["#dns_records:read", "#zone:read"],
-            "plan": {
-                "id": "0feeeeeeeeeeeeeeeeeeeeeeeeeeeeee",
-                "name": "Free Website",
-                "price": 0,
-                "currency": "USD",
-                "frequency": "",
-                "legacy_id": "free",
-                "is_subscribed": True,
-                "can_subscribe": False
-            }
-        }
-        filtered_zones.append(zone_data)
+    # Filtrar zonas según los parámetros (índice por nombre; payloads precalculados)
+    filtered_zones = store.list_zones(name=zone_name, status=status)
     
+    # Paginar como la API real (por defecto 20, máximo 50 zonas por página)
+    page_zones, result_info = paginate(filtered_zones, default_per_page=20, max_per_page=50)
+
     # Construir respuesta
     response = {
-        "result": filtered_zones,
+        "result": page_zones,
+        "result_info": result_info,
         "success": True,
         "errors": [],
         "messages": []
     }
     
-    # Agregar información de paginación si hay resultados
-    if filtered_zones:
-        response["result_info"] = {
-            "page": 1,
-            "per_page": 20,
-            "count": len(filtered_zones),
-            "total_count": len(filtered_zones),
-            "total_pages": 1
-        }
-    
     return jsonify(response)
 
 
 @zones_bp.route('/zones/<zone_id>', methods=['GET'])
 def get_zone(zone_id):
-    print(f"[DEBUG] GET /zones/{zone_id}")
+    debug_log("[DEBUG] GET /zones/%s", zone_id)
     """
     Obtiene los detalles de una zona específica.
     
@@ -206,9 +111,9 @@ def get_zone(zone_id):
         }), 400
     
     # Buscar la zona
-    zone = next((z for z in MOCK_ZONES if z["id"] == zone_id), None)
+    zone_data = store.get_zone_payload(zone_id)
     
-    if not zone:
+    if not zone_data:
         return jsonify({
             "success": False,
             "errors": [{"code": 9109, "message": "Invalid zone identifier"}],
@@ -216,58 +121,7 @@ def get_zone(zone_id):
             "result": None
         }), 400
     
-    # Construir respuesta con el formato de la API real
-    zone_data = {
-        "id": zone["id"],
-        "name": zone["name"],
-        "status": zone.get("status", "active"),
-        "paused": False,
-        "type": "full",
-        "development_mode": 0,
-        "name_servers": [
-            f"ns1.cloudflare.com",
-            f"ns2.cloudflare.com"
-        ],
-        "original_name_servers": None,
-        "original_registrar": None,
-        "original_dnshost": None,
-        "modified_on": zone.get("modified_on", datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')),
-        "created_on": zone.get("created_on", datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')),
-        "activated_on": zone.get("activated_on", datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')),
-        "meta": {
-            "step": 2,
-            "custom_certificate_quota": 0,
-            "page_rule_quota": 3,
-            "phishing_detected": False
-        },
-        "owner": {
-            "id": "7ae3782b91d2827bcd865d3cd9d7182c",
-            "type": "user",
-            "email": "usuario@ejemplo.com"
-        },
-        "account": {
-            "id": "9fff3513fb250e4890d55655f987effd",
-            "name": f"{zone['name']}'s Account"
-        },
-        "tenant": {
-            "id": None,
-            "name": None
-        },
-        "tenant_unit": {
-            "id": None
-        },
-        "permissions": ["#dns_records:read", "#zone:read"],
-        "plan": {
-            "id": "0feeeeeeeeeeeeeeeeeeeeeeeeeeeeee",
-            "name": "Free Website",
-            "price": 0,
-            "currency": "USD",
-            "frequency": "",
-            "legacy_id": "free",
-            "is_subscribed": True,
-            "can_subscribe": False
-        }
-    }
+    zone_data = dict(zone_data, name_servers=["ns1.cloudflare.com", "ns2.cloudflare.com"])
     
     return jsonify({
         "success": True,
@@ -0,0 +1,291 @@
+"""
+Inyección de fallos y latencia en el servidor de depuración.
+
+Permite reproducir sin conexión el comportamiento de la API real de Cloudflare bajo carga:
+latencia, límite de tasa (429 con Retry-After), errores 5xx, conexiones cortadas y respuestas
+con cuerpo lento, para validar los reintentos, el limitador de tasa y la concurrencia del cliente.
+
+Configuración (JSON), por endpoint. La clave "*" aplica a todos y las claves de endpoint la completan:
+
+    {
+      "*":     {"latency": "uniform:0.01,0.05"},
+      "batch": {"error_rate": 0.1, "error_status": [502, 503]},
+      "dns_records": {"rate_limit": {"requests": 100, "window": 10}},
+      "zones": {"drop_rate": 0.05, "slow_body": 2.0}
+    }
+
+Endpoints: zones, zone, dns_records, dns_record, batch, ip (ver ENDPOINT_NAMES).
+
+Opciones de cada endpoint:
+    latency       Demora antes de responder: "fixed:S", "uniform:MIN,MAX", "normal:MEDIA,DESVIO"
+                  o "exponential:MEDIA" (segundos)
+    rate_limit    {"requests": N, "window": S, "retry_after": S}: a partir de la petición N+1 de cada
+                  ventana fija de S segundos responde 429 con Retry-After (por defecto, lo que falta
+                  para que termine la ventana)
+    error_rate    Probabilidad (0-1) de responder un error 5xx
+    error_status  Código o lista de códigos de error a elegir (por defecto 500, 502, 503 y 504)
+    drop_rate     Probabilidad de cortar la conexión sin responder (solo con el servidor de Werkzeug,
+                  modos debug y threaded: con waitress la configuración se rechaza)
+    slow_body     Segundos durante los que se entrega el cuerpo de la respuesta, por partes
+
+Origen de la configuración:
+    DEBUG_FAULTS       JSON con la configuración
+    DEBUG_FAULTS_FILE  Archivo JSON con la configuración (si no se define DEBUG_FAULTS)
+    DEBUG_FAULTS_SEED  Semilla del generador aleatorio, para resultados reproducibles
+
+Endpoints de administración:
+    GET    /debug/faults  Configuración actual y fallos inyectados por tipo
+    PUT    /debug/faults  Reemplaza la configuración (cuerpo JSON como el de arriba)
+    DELETE /debug/faults  Desactiva la inyección de fallos
+"""
+
+import json
+import math
+import os
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from flask import Blueprint, Response, g, jsonify, request
+
+faults_bp = Blueprint('faults', __name__)
+
+# Nombre corto de cada endpoint simulado (request.endpoint de Flask)
+ENDPOINT_NAMES = {
+    'zones.list_zones': 'zones',
+    'zones.get_zone': 'zone',
+    'dns_records.list_dns_records': 'dns_records',
+    'dns_records.update_dns_record': 'dns_record',
+    'dns_records.batch_dns_records': 'batch',
+    'get_ip': 'ip',
+}
+
+DEFAULT_ERROR_STATUS = [500, 502, 503, 504]
+
+# Partes en que se divide el cuerpo de una respuesta lenta
+SLOW_BODY_CHUNKS = 10
+
+_lock = threading.Lock()
+_config = {}
+_windows = {}
+_injected = Counter()
+_random = random.Random()
+# Si el servidor permite cortar conexiones (ver set_drop_supported)
+_drop_supported = True
+
+
+def load_config_from_env():
+    """Lee la configuración de DEBUG_FAULTS o DEBUG_FAULTS_FILE (vacía si no se definen)."""
+    seed = os.environ.get('DEBUG_FAULTS_SEED')
+    if seed:
+        _random.seed(seed)
+    raw = os.environ.get('DEBUG_FAULTS')
+    path = os.environ.get('DEBUG_FAULTS_FILE')
+    if not raw and path:
+        with open(path, 'r') as f:
+            raw = f.read()
+    return json.loads(raw) if raw else {}
+
+
+def set_drop_supported(supported):
+    """
+    Indica si el servidor permite cortar conexiones. _drop_connection necesita el socket que el
+    servidor de Werkzeug deja en el entorno WSGI; waitress no lo expone.
+    """
+    global _drop_supported
+    _drop_supported = supported
+
+
+def drops_configured(config):
+    """Indica si la configuración pide cortar conexiones en algún endpoint."""
+    return any(float(options.get('drop_rate', 0)) > 0 for options in config.values() if isinstance(options, dict))
+
+
+def set_config(config):
+    """
+    Reemplaza la configuración de fallos y reinicia las ventanas de límite de tasa.
+    Lanza ValueError si la configuración es inválida o pide cortar conexiones en un servidor que no puede.
+    """
+    if not isinstance(config, dict):
+        raise ValueError("La configuración de fallos debe ser un objeto JSON")
+    for key, options in config.items():
+        if not isinstance(options, dict):
+            raise ValueError(f"Opciones inválidas para '{key}'")
+        if 'latency' in options:
+            parse_latency(options['latency'])
+    if not _drop_supported and drops_configured(config):
+        raise ValueError("drop_rate requiere el servidor de Werkzeug (DEBUG_SERVER_MODE=debug o threaded)")
+    with _lock:
+        _config.clear()
+        _config.update(config)
+        _windows.clear()
+        _injected.clear()
+
+
+def parse_latency(spec):
+    """Convierte "dist:p1,p2" en (dist, [p1, p2]). Un número se interpreta como latencia fija."""
+    if isinstance(spec, (int, float)):
+        return 'fixed', [float(spec)]
+    dist, _, params = str(spec).partition(':')
+    valores = [float(p) for p in params.split(',') if p.strip()]
+    esperados = {'fixed': 1, 'uniform': 2, 'normal': 2, 'exponential': 1}
+    if dist not in esperados or len(valores) != esperados[dist]:
+        raise ValueError(f"Latencia inválida: {spec}")
+    return dist, valores
+
+
+def sample_latency(spec):
+    """Segundos de demora según la distribución configurada (nunca negativos)."""
+    dist, p = parse_latency(spec)
+    if dist == 'fixed':
+        valor = p[0]
+    elif dist == 'uniform':
+        valor = _random.uniform(p[0], p[1])
+    elif dist == 'normal':
+        valor = _random.gauss(p[0], p[1])
+    else:
+        valor = _random.expovariate(1 / p[0]) if p[0] > 0 else 0
+    return max(valor, 0.0)
+
+
+def _options_for(name):
+    """
+    Opciones efectivas de un endpoint: las de "*" completadas con las del endpoint.
+    Devuelve también la clave de la ventana de límite de tasa: un límite definido en "*" es
+    compartido por todos los endpoints, uno definido en el endpoint es propio.
+    """
+    with _lock:
+        propias = _config.get(name, {})
+        window_key = name if 'rate_limit' in propias else '*'
+        return {**_config.get('*', {}), **propias}, window_key
+
+
+def _cloudflare_error(status, code, message, headers=None):
+    """Respuesta de error con el formato de la API de Cloudflare."""
+    response = jsonify({"success": False, "errors": [{"code": code, "message": message}], "messages": [], "result": None})
+    response.status_code = status
+    for key, value in (headers or {}).items():
+        response.headers[key] = value
+    return response
+
+
+def _check_rate_limit(window_key, limit):
+    """Cuenta la petición en la ventana fija y devuelve los segundos de Retry-After si se superó el límite."""
+    ventana = float(limit.get('window', 1))
+    ahora = time.monotonic()
+    with _lock:
+        inicio, cuenta = _windows.get(window_key, (ahora, 0))
+        if ahora - inicio >= ventana:
+            inicio, cuenta = ahora, 0
+        cuenta += 1
+        _windows[window_key] = (inicio, cuenta)
+    if cuenta <= int(limit.get('requests', 0)):
+        return None
+    return limit.get('retry_after', max(math.ceil(inicio + ventana - ahora), 1))
+
+
+def _drop_connection():
+    """Cierra la conexión del cliente sin enviar respuesta (solo con el servidor de desarrollo de Werkzeug)."""
+    conexion = request.environ.get('werkzeug.socket')
+    if conexion is None:
+        return False
+    try:
+        conexion.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    conexion.close()
+    return True
+
+
+def _inject_faults():
+    """Aplica la configuración de fallos a la petición actual (before_request)."""
+    name = ENDPOINT_NAMES.get(request.endpoint)
+    if name is None or not _config:
+        return None
+    options, window_key = _options_for(name)
+    if not options:
+        return None
+
+    if 'latency' in options:
+        time.sleep(sample_latency(options['latency']))
+
+    if _random.random() < float(options.get('drop_rate', 0)) and _drop_connection():
+        _count('drop')
+        return Response(status=500)
+
+    if options.get('rate_limit'):
+        retry_after = _check_rate_limit(window_key, options['rate_limit'])
+        if retry_after is not None:
+            _count('rate_limit')
+            return _cloudflare_error(429, 971, "Please wait and consider throttling your request speed",
+                                     headers={"Retry-After": str(retry_after)})
+
+    if _random.random() < float(options.get('error_rate', 0)):
+        estados = options.get('error_status', DEFAULT_ERROR_STATUS)
+        estado = _random.choice(estados) if isinstance(estados, list) else int(estados)
+        _count(f'error_{estado}')
+        return _cloudflare_error(estado, 10000 + estado, "Injected server error")
+
+    if options.get('slow_body'):
+        g.slow_body = float(options['slow_body'])
+    return None
+
+
+def _slow_body(response):
+    """Entrega el cuerpo de la respuesta por partes durante g.slow_body segundos (after_request)."""
+    duracion = g.pop('slow_body', None)
+    if not duracion or response.direct_passthrough:
+        return response
+    cuerpo = response.get_data()
+    paso = max(math.ceil(len(cuerpo) / SLOW_BODY_CHUNKS), 1)
+
+    def _generar():
+        for i in range(0, len(cuerpo), paso):
+            time.sleep(duracion / SLOW_BODY_CHUNKS)
+            yield cuerpo[i:i + paso]
+
+    _count('slow_body')
+    response.response = _generar()
+    response.headers['Content-Length'] = str(len(cuerpo))
+    return response
+
+
+def _count(kind):
+    with _lock:
+        _injected[kind] += 1
+
+
+@faults_bp.route('/debug/faults', methods=['GET'])
+def get_faults():
+    with _lock:
+        return jsonify({"config": dict(_config), "injected": dict(_injected)})
+
+
+@faults_bp.route('/debug/faults', methods=['PUT'])
+def put_faults():
+    try:
+        set_config(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return get_faults()
+
+
+@faults_bp.route('/debug/faults', methods=['DELETE'])
+def delete_faults():
+    set_config({})
+    return get_faults()
+
+
+def init_fault_injection(app, drop_supported=True):
+    """
+    Registra la inyección de fallos en la aplicación Flask con la configuración del entorno.
+    Lanza ValueError si la configuración es inválida (ver set_config).
+    """
+    set_drop_supported(drop_supported)
+    set_config(load_config_from_env())
+    if _config:
+        print(f"[INFO] Inyección de fallos activa: {json.dumps(_config)}")
+    app.before_request(_inject_faults)
+    app.after_request(_slow_body)
+    app.register_blueprint(faults_bp)
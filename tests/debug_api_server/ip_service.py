@@ -1,33 +1,23 @@
-import os
-import json
 from flask import Blueprint, request
 
+from . import debug_log
+from .store import store
+
 bp = Blueprint('ip', __name__)
 
+def set_current_ip(ip):
+    """Fija la IP que devuelve el servicio (None vuelve a la del archivo de datos compartidos)."""
+    store.set_ip(ip)
+
 def get_ip_from_shared_data():
     """
-    Obtiene la IP desde el archivo debug_shared_data.json.
+    Obtiene la IP actual desde el almacén en memoria: la fijada con POST /debug/ip o la de
+    current_ip_services_ip en debug_shared_data.json (o DEBUG_SHARED_DATA_PATH), leída al iniciar.
     
     Returns:
-        str: La IP actual del servicio o '127.0.0.1' si hay un error
+        str: La IP actual del servicio o '127.0.0.1' si el archivo no la define
     """
-    try:
-        # Construir la ruta al archivo de datos compartidos
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        shared_data_file = os.path.join(current_dir, 'debug_shared_data.json')
-        
-        if os.path.exists(shared_data_file):
-            with open(shared_data_file, 'r') as f:
-                data = json.load(f)
-                # Obtener la IP de current_ip_services_ip
-                return data.get('current_ip_services_ip', '127.0.0.1')
-                
-        print(f"[WARNING] No se encontró el archivo: {shared_data_file}")
-        return "127.0.0.1"
-        
-    except Exception as e:
-        print(f"[ERROR] Error al cargar la IP desde debug_shared_data.json: {e}")
-        return "127.0.0.1"
+    return store.get_ip()
 
 @bp.route('/ip')
 def get_ip():
@@ -37,9 +27,9 @@ def get_ip():
     Returns:
         str: La IP actual en formato texto plano
     """
-    print(f"[DEBUG] GET /ip - Headers: {dict(request.headers)}")
+    debug_log("[DEBUG] GET /ip - Headers: %s", dict(request.headers))
     ip = get_ip_from_shared_data()
-    print(f"[DEBUG] Devolviendo IP: {ip}")
+    debug_log("[DEBUG] Devolviendo IP: %s", ip)
     return f"{ip}\n"
 
 def init_ip_service(app):
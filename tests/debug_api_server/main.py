@@ -1,5 +1,7 @@
 import os
 import sys
+import logging
+import importlib.util
 from flask import Flask, request, jsonify
 import json
 from datetime import datetime, timezone
@@ -11,16 +13,38 @@ if root_dir not in sys.path:
 
 # Importar blueprints locales
 from .cloudflare_api import blueprints as cloudflare_blueprints
-from .ip_service import init_ip_service, bp as ip_bp, get_ip_from_shared_data
+from .ip_service import init_ip_service, bp as ip_bp, get_ip_from_shared_data, set_current_ip
+from .stats import init_stats
+from .fault_injection import init_fault_injection
+from .store import store_bp
+from . import SHARED_DATA_PATH, VERBOSE, debug_log
 
 # Crear la aplicación Flask
 app = Flask(__name__)
 
+# Modo de ejecución (DEBUG_SERVER_MODE):
+#   debug       Servidor de desarrollo de Flask con recarga automática (por defecto)
+#   threaded    Servidor de Werkzeug multihilo, sin recarga ni depurador
+#   production  Servidor WSGI waitress (si está instalado) con DEBUG_SERVER_THREADS hilos
+SERVER_MODES = ('debug', 'threaded', 'production')
+SERVER_MODE = os.environ.get('DEBUG_SERVER_MODE', 'debug').lower()
+if SERVER_MODE not in SERVER_MODES:
+    print(f"[WARNING] DEBUG_SERVER_MODE inválido: {SERVER_MODE}. Se usa 'debug'")
+    SERVER_MODE = 'debug'
+SERVER_THREADS = int(os.environ.get('DEBUG_SERVER_THREADS', 16))
+# Sin waitress instalado, el modo production usa el servidor multihilo de Werkzeug
+USE_WAITRESS = SERVER_MODE == 'production' and importlib.util.find_spec('waitress') is not None
+
 # Configuración
-app.config['DEBUG'] = True
+app.config['DEBUG'] = SERVER_MODE == 'debug'
+
+# Fuera del modo debug no se registra cada petición (salvo con DEBUG_VERBOSE=1)
+if SERVER_MODE != 'debug' and not VERBOSE:
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    logging.getLogger('waitress').setLevel(logging.WARNING)
 
-# Ruta al archivo de datos compartidos
-SHARED_DATA_FILE = os.path.join(os.path.dirname(__file__), 'debug_shared_data.json')
+# Ruta al archivo de datos compartidos (DEBUG_SHARED_DATA_PATH permite usar otro)
+SHARED_DATA_FILE = SHARED_DATA_PATH
 
 def save_shared_data(data):
     """Guarda datos en el archivo compartido."""
@@ -38,26 +62,66 @@ def load_shared_data():
 for bp in cloudflare_blueprints:
     app.register_blueprint(bp, url_prefix='/client/v4')
 
+# Contadores de peticiones por endpoint (/debug/stats)
+init_stats(app)
+
+# Inyección de fallos y latencia (DEBUG_FAULTS, DEBUG_FAULTS_FILE o /debug/faults).
+# Las conexiones cortadas (drop_rate) solo se pueden simular con el servidor de Werkzeug
+try:
+    init_fault_injection(app, drop_supported=not USE_WAITRESS)
+except ValueError as e:
+    print(f"[ERROR] Configuración de fallos inválida: {e}")
+    sys.exit(1)
+
+# Recarga del almacén en memoria desde el archivo de datos compartidos (/debug/reload)
+app.register_blueprint(store_bp)
+
 # Endpoint para obtener la IP actual en texto plano
 @app.route('/ip', methods=['GET'])
 def get_ip():
     """Devuelve la IP actual en texto plano."""
-    print(f"[DEBUG] GET /ip - Headers: {dict(request.headers)}")
+    debug_log("[DEBUG] GET /ip - Headers: %s", dict(request.headers))
     ip = get_ip_from_shared_data()
-    print(f"[DEBUG] Devolviendo IP: {ip}")
+    debug_log("[DEBUG] Devolviendo IP: %s", ip)
     return f"{ip}\n", 200, {'Content-Type': 'text/plain'}
 
+# Endpoint para cambiar la IP que devuelve /ip (ej: simular una reconexión con IP nueva)
+@app.route('/debug/ip', methods=['POST'])
+def set_ip():
+    """Fija la IP que devuelve /ip. Cuerpo: {"ip": "1.2.3.4"} ({"ip": null} vuelve a la del archivo)."""
+    data = request.get_json(silent=True) or {}
+    set_current_ip(data.get('ip'))
+    return jsonify({"success": True, "ip": get_ip_from_shared_data()})
+
 if __name__ == '__main__':
     # Obtener el puerto de la variable de entorno o usar 5000 por defecto
     port = int(os.environ.get('PORT', 5000))
     
     # Iniciar el servidor
-    print(f"Iniciando servidor de depuración en http://localhost:{port}")
+    print(f"Iniciando servidor de depuración en http://localhost:{port} (modo {SERVER_MODE})")
     print("Endpoints disponibles:")
     print(f"  - GET  http://localhost:{port}/ip")
     print("\nEndpoints de la API de Cloudflare (requieren autenticación):")
     print(f"  - GET  http://localhost:{port}/client/v4/zones")
     print(f"  - GET  http://localhost:{port}/client/v4/zones/<zone_id>/dns_records")
     print(f"  - PUT  http://localhost:{port}/client/v4/zones/<zone_id>/dns_records/<record_id>")
+    print(f"  - POST http://localhost:{port}/client/v4/zones/<zone_id>/dns_records/batch")
+    print("\nEndpoints de depuración:")
+    print(f"  - GET  http://localhost:{port}/debug/stats")
+    print(f"  - POST http://localhost:{port}/debug/stats/reset")
+    print(f"  - POST http://localhost:{port}/debug/ip")
+    print(f"  - POST http://localhost:{port}/debug/reload")
+    print(f"  - GET/PUT/DELETE http://localhost:{port}/debug/faults")
+
+    if USE_WAITRESS:
+        from waitress import serve
+        serve(app, host='0.0.0.0', port=port, threads=SERVER_THREADS, connection_limit=1000, _quiet=not VERBOSE)
+        sys.exit(0)
+    if SERVER_MODE == 'production':
+        print("[WARNING] waitress no está instalado (pip install waitress). Se usa el modo 'threaded'")
 
-    app.run(host='0.0.0.0', port=port, debug=True)
+    if SERVER_MODE == 'debug':
+        app.run(host='0.0.0.0', port=port, debug=True)
+    else:
+        # El estado vive en memoria: un solo proceso con varios hilos
+        app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
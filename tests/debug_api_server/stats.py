@@ -0,0 +1,57 @@
+"""
+Contadores de peticiones del servidor de depuración, por endpoint.
+
+Permiten medir cuántas peticiones hace el cliente a cada endpoint durante una ejecución
+(ver tests/scripts/benchmark_fleet.py).
+
+Endpoints:
+    GET  /debug/stats        Contadores actuales: {"total": n, "requests": {"GET /client/v4/zones": n, ...}}
+    POST /debug/stats/reset  Pone los contadores a cero
+"""
+
+import threading
+from collections import Counter
+from flask import Blueprint, jsonify, request
+
+stats_bp = Blueprint('stats', __name__)
+
+_lock = threading.Lock()
+_counts = Counter()
+
+
+def _count_request():
+    """Cuenta la petición actual por método y regla de URL (ej: 'PUT /client/v4/zones/<zone_id>/dns_records/<record_id>')."""
+    if request.path.startswith('/debug/'):
+        return
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    with _lock:
+        _counts[f"{request.method} {rule}"] += 1
+
+
+def get_stats():
+    """Devuelve una copia de los contadores."""
+    with _lock:
+        return {"total": sum(_counts.values()), "requests": dict(_counts)}
+
+
+def reset_stats():
+    """Pone los contadores a cero."""
+    with _lock:
+        _counts.clear()
+
+
+@stats_bp.route('/debug/stats', methods=['GET'])
+def stats():
+    return jsonify(get_stats())
+
+
+@stats_bp.route('/debug/stats/reset', methods=['POST'])
+def stats_reset():
+    reset_stats()
+    return jsonify({"success": True})
+
+
+def init_stats(app):
+    """Registra los contadores de peticiones en la aplicación Flask."""
+    app.before_request(_count_request)
+    app.register_blueprint(stats_bp)
@@ -0,0 +1,371 @@
+"""
+Almacén en memoria de los datos del servidor de depuración.
+
+Los datos de DEBUG_SHARED_DATA_PATH (debug_shared_data.json) se leen una sola vez al iniciar
+y se indexan para que cada petición se resuelva sin recorrer listas ni volver a leer el archivo:
+
+    zonas      por id y por nombre (el payload de cada zona se construye una sola vez)
+    registros  por zona e id, y dentro de cada zona por nombre y por tipo
+    IP         la de current_ip_services_ip, en memoria (POST /debug/ip la reemplaza)
+
+Los cambios (PUT de registros y lotes) se hacen sobre el almacén. Con DEBUG_WRITE_BACK=1 se
+guardan además en el archivo de datos compartidos, agrupados: como mucho una escritura cada
+WRITE_BACK_DELAY segundos y una final al terminar el proceso.
+
+Endpoints:
+    POST /debug/reload  Vuelve a leer el archivo de datos compartidos (ej: tras editarlo a mano)
+"""
+
+import atexit
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from flask import Blueprint, jsonify
+
+from . import SHARED_DATA_PATH, debug_log
+
+store_bp = Blueprint('store', __name__)
+
+DEFAULT_IP = "127.0.0.1"
+
+# Segundos que se agrupan los cambios antes de escribirlos en el archivo (DEBUG_WRITE_BACK=1)
+WRITE_BACK_DELAY = 1.0
+
+# Fecha de creación de los registros y zonas cargados desde el archivo
+MOCK_TIMESTAMP = "2025-01-01T00:00:00Z"
+
+
+def utc_now():
+    """Fecha actual en el formato de la API de Cloudflare."""
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def zone_payload(zone):
+    """Zona con el formato de la API real de Cloudflare."""
+    return {
+        "id": zone["id"],
+        "name": zone["name"],
+        "status": zone.get("status", "active"),
+        "paused": False,
+        "type": "full",
+        "development_mode": 0,
+        "name_servers": [
+            f"ns1.{zone['name']}",
+            f"ns2.{zone['name']}"
+        ],
+        "original_name_servers": None,
+        "original_registrar": None,
+        "original_dnshost": None,
+        "modified_on": zone.get("modified_on", MOCK_TIMESTAMP),
+        "created_on": zone.get("created_on", MOCK_TIMESTAMP),
+        "activated_on": zone.get("activated_on", MOCK_TIMESTAMP),
+        "meta": {
+            "step": 2,
+            "custom_certificate_quota": 0,
+            "page_rule_quota": 3,
+            "phishing_detected": False
+        },
+        "owner": {
+            "id": "7ae3782b91d2827bcd865d3cd9d7182c",
+            "type": "user",
+            "email": "usuario@ejemplo.com"
+        },
+        "account": {
+            "id": "9fff3513fb250e4890d55655f987effd",
+            "name": f"{zone['name']}'s Account"
+        },
+        "tenant": {
+            "id": None,
+            "name": None
+        },
+        "tenant_unit": {
+            "id": None
+        },
+        "permissions": ["#dns_records:read", "#zone:read"],
+        "plan": {
+            "id": "0feeeeeeeeeeeeeeeeeeeeeeeeeeeeee",
+            "name": "Free Website",
+            "price": 0,
+            "currency": "USD",
+            "frequency": "",
+            "legacy_id": "free",
+            "is_subscribed": True,
+            "can_subscribe": False
+        }
+    }
+
+
+class MockStore:
+    """
+    Zonas, registros DNS e IP simulados, indexados en memoria.
+    Todas las operaciones son seguras entre hilos (servidor con threaded=True o waitress).
+    """
+
+    def __init__(self, path, write_back=False):
+        self.path = path
+        self.write_back = write_back
+        self._lock = threading.RLock()
+        self._save_timer = None
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """Lee el archivo de datos compartidos y reconstruye los índices."""
+        data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"[MOCK][ERROR] Error al leer {self.path}: {e}")
+        else:
+            print(f"[MOCK][ERROR] Archivo no encontrado: {self.path}")
+
+        with self._lock:
+            self._raw = data
+            self._file_ip = data.get('current_ip_services_ip', DEFAULT_IP)
+            self._ip_override = None
+            self.zones = []
+            self.zones_by_id = {}
+            self.zones_by_name = {}
+            self._zone_payloads = {}
+            self.records = {}
+            self._by_name = {}
+            self._by_type = {}
+            self._next_id = {}
+            for idx, (domain, registros) in enumerate(data.get("cloudflare_domains", {}).items()):
+                zone = {
+                    "id": f"mock_zone_id_{idx+1}",
+                    "name": domain,
+                    "status": "active",
+                    "created_on": MOCK_TIMESTAMP,
+                    "modified_on": MOCK_TIMESTAMP
+                }
+                self.zones.append(zone)
+                self.zones_by_id[zone["id"]] = zone
+                self.zones_by_name[domain] = zone
+                self.records[zone["id"]] = {}
+                self._by_name[zone["id"]] = {}
+                self._by_type[zone["id"]] = {}
+                self._next_id[zone["id"]] = len(registros) + 1
+                # Solo registros tipo A
+                for i, reg in enumerate(registros):
+                    self._index({
+                        "id": f"mock_dns_id_{idx+1}_{i+1}",
+                        "type": "A",
+                        "name": reg["name"],
+                        "content": reg["content"],
+                        "proxied": False,
+                        "ttl": 1,
+                        "created_on": MOCK_TIMESTAMP,
+                        "modified_on": MOCK_TIMESTAMP
+                    }, zone["id"])
+
+        total = sum(len(r) for r in self.records.values())
+        print(f"[MOCK] {len(self.zones)} zonas y {total} registros DNS cargados desde: {self.path}")
+        debug_log("[MOCK] Zonas cargadas: %s", [z['name'] for z in self.zones])
+
+    # --- Índices ---
+
+    def _index(self, record, zone_id):
+        self.records[zone_id][record["id"]] = record
+        self._index_fields(record, zone_id)
+
+    def _index_fields(self, record, zone_id):
+        self._by_name[zone_id].setdefault(record["name"], {})[record["id"]] = record
+        self._by_type[zone_id].setdefault(record["type"], {})[record["id"]] = record
+
+    def _unindex(self, record, zone_id):
+        self.records[zone_id].pop(record["id"], None)
+        self._unindex_fields(record, zone_id)
+
+    def _unindex_fields(self, record, zone_id):
+        for index, key in ((self._by_name[zone_id], record["name"]), (self._by_type[zone_id], record["type"])):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(record["id"], None)
+                if not bucket:
+                    del index[key]
+
+    def _ensure_zone(self, zone_id):
+        if zone_id not in self.records:
+            self.records[zone_id] = {}
+            self._by_name[zone_id] = {}
+            self._by_type[zone_id] = {}
+            self._next_id[zone_id] = 1
+
+    # --- IP ---
+
+    def get_ip(self):
+        """IP actual: la fijada con set_ip o la del archivo de datos compartidos."""
+        return self._ip_override or self._file_ip
+
+    def set_ip(self, ip):
+        """Fija la IP actual (None vuelve a la del archivo de datos compartidos)."""
+        self._ip_override = ip
+
+    # --- Zonas ---
+
+    def zone_name(self, zone_id):
+        zone = self.zones_by_id.get(zone_id)
+        return zone["name"] if zone else ""
+
+    def list_zones(self, name=None, status=None):
+        """Payloads de las zonas que coinciden con los filtros (construidos una sola vez por zona)."""
+        if name:
+            zone = self.zones_by_name.get(name)
+            zones = [zone] if zone else []
+        else:
+            zones = self.zones
+        return [self.get_zone_payload(z["id"]) for z in zones if not status or z.get("status") == status]
+
+    def get_zone_payload(self, zone_id):
+        payload = self._zone_payloads.get(zone_id)
+        if payload is None and zone_id in self.zones_by_id:
+            payload = self._zone_payloads[zone_id] = zone_payload(self.zones_by_id[zone_id])
+        return payload
+
+    # --- Registros ---
+
+    def list_records(self, zone_id, record_type=None, name=None):
+        """Copias de los registros de una zona que coinciden con los filtros, en orden de creación."""
+        with self._lock:
+            if zone_id not in self.records:
+                return []
+            if name:
+                candidatos = self._by_name[zone_id].get(name, {}).values()
+                if record_type:
+                    candidatos = [r for r in candidatos if r["type"] == record_type]
+            elif record_type:
+                candidatos = self._by_type[zone_id].get(record_type, {}).values()
+            else:
+                candidatos = self.records[zone_id].values()
+            return [dict(r) for r in candidatos]
+
+    def get_record(self, zone_id, record_id):
+        with self._lock:
+            record = self.records.get(zone_id, {}).get(record_id)
+            return dict(record) if record else None
+
+    def update_record(self, zone_id, record_id, fields):
+        """Actualiza un registro (reindexándolo) y devuelve una copia, o None si no existe."""
+        with self._lock:
+            record = self.records.get(zone_id, {}).get(record_id)
+            if record is None:
+                return None
+            self._unindex_fields(record, zone_id)
+            record.update(fields)
+            record["modified_on"] = utc_now()
+            self._index_fields(record, zone_id)
+            self._changed()
+            return dict(record)
+
+    def apply_batch(self, zone_id, deletes, patches, puts, posts):
+        """
+        Aplica un lote ya validado en el orden de Cloudflare (deletes, patches, puts, posts)
+        y devuelve los registros resultantes por tipo de operación.
+        """
+        now = utc_now()
+        result = {"deletes": [], "patches": [], "puts": [], "posts": []}
+        with self._lock:
+            self._ensure_zone(zone_id)
+            zone_records = self.records[zone_id]
+            for change in deletes:
+                record = zone_records[change['id']]
+                self._unindex(record, zone_id)
+                result["deletes"].append(dict(record))
+
+            for change in patches:
+                record = zone_records[change['id']]
+                self._unindex_fields(record, zone_id)
+                for field in ('name', 'content', 'ttl', 'proxied'):
+                    if field in change:
+                        record[field] = change[field]
+                record["modified_on"] = now
+                self._index_fields(record, zone_id)
+                result["patches"].append(dict(record, zone_id=zone_id))
+
+            for change in puts:
+                record = zone_records[change['id']]
+                self._unindex_fields(record, zone_id)
+                record.update({
+                    "name": change['name'],
+                    "type": change['type'],
+                    "content": change['content'],
+                    "ttl": int(change.get('ttl', 1)),
+                    "proxied": bool(change.get('proxied', False)),
+                    "modified_on": now
+                })
+                self._index_fields(record, zone_id)
+                result["puts"].append(dict(record, zone_id=zone_id))
+
+            for change in posts:
+                record = {
+                    "id": f"mock_dns_id_{zone_id}_batch_{self._next_id[zone_id]}",
+                    "type": change['type'],
+                    "name": change['name'],
+                    "content": change['content'],
+                    "proxied": bool(change.get('proxied', False)),
+                    "ttl": int(change.get('ttl', 1)),
+                    "created_on": now,
+                    "modified_on": now
+                }
+                self._next_id[zone_id] += 1
+                self._index(record, zone_id)
+                result["posts"].append(dict(record, zone_id=zone_id))
+
+            self._changed()
+        return result
+
+    def missing_records(self, zone_id, record_ids):
+        """Ids de 'record_ids' que no existen en la zona."""
+        with self._lock:
+            zone_records = self.records.get(zone_id, {})
+            return [rid for rid in record_ids if rid not in zone_records]
+
+    # --- Escritura en el archivo ---
+
+    def _changed(self):
+        """Programa la escritura en el archivo si DEBUG_WRITE_BACK está activo."""
+        if not self.write_back:
+            return
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(WRITE_BACK_DELAY, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save(self):
+        """Escribe los registros A actuales en 'cloudflare_domains' conservando el resto del archivo."""
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = dict(self._raw)
+            data["cloudflare_domains"] = {
+                zone["name"]: [
+                    {"name": r["name"], "content": r["content"]}
+                    for r in self.records[zone["id"]].values() if r["type"] == "A"
+                ]
+                for zone in self.zones
+            }
+            contenido = json.dumps(data, indent=2)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(contenido)
+        os.replace(tmp, self.path)
+        debug_log("[MOCK] Cambios guardados en %s", self.path)
+
+
+store = MockStore(SHARED_DATA_PATH, write_back=os.environ.get('DEBUG_WRITE_BACK', '').lower() in ('1', 'true', 'yes'))
+atexit.register(store.save)
+
+
+@store_bp.route('/debug/reload', methods=['POST'])
+def reload_store():
+    store.save()
+    store.load()
+    total = sum(len(r) for r in store.records.values())
+    return jsonify({"success": True, "zones": len(store.zones), "records": total, "ip": store.get_ip()})
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark del filtrado de dominios excluidos.
+- Compara el filtrado original (búsqueda en lista, O(dominios × reglas)) con ExclusionMatcher
+  (conjunto hash para nombres exactos, sufijos para comodines y una única expresión regular).
+- Genera una lista sintética de dominios (con repetidos) y de reglas exactas, comodines y regex.
+- Verifica que ambos métodos excluyan lo mismo con reglas exactas.
+- Uso: python benchmark_exclusions.py [DOMINIOS] [REGLAS] [REPETICIONES]   (por defecto: 10000 1000 5)
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT_DIR / "hestia-pppoe"))
+
+from filter_utils import filter_excluded, filter_domains, compile_exclusions  # noqa: E402
+
+
+def generar_dominios(cantidad, semilla=42):
+    """Dominios sintéticos repartidos en zonas, con subdominios y un 5% de repetidos."""
+    rnd = random.Random(semilla)
+    zonas = [f"zona{i}.cl" for i in range(max(cantidad // 20, 1))]
+    dominios = []
+    for i in range(cantidad):
+        zona = rnd.choice(zonas)
+        dominios.append(zona if i % 10 == 0 else f"sitio{i}.{zona}")
+    dominios += rnd.sample(dominios, cantidad // 20)
+    return dominios
+
+
+def generar_reglas(dominios, cantidad, semilla=7):
+    """Reglas exactas (80%), comodines de zona (19%) y alguna expresión regular."""
+    rnd = random.Random(semilla)
+    exactas = rnd.sample(dominios, int(cantidad * 0.8))
+    zonas = sorted({d.split(".", 1)[-1] for d in dominios if d.count(".") > 1})
+    comodines = [f"*.{z}" for z in rnd.sample(zonas, min(len(zonas), int(cantidad * 0.19)))]
+    expresiones = [r"re:sitio\d*7\.zona1\d\.cl"]
+    return exactas, exactas + comodines + expresiones
+
+
+def medir(funcion, repeticiones):
+    """Mejor tiempo (segundos) de 'repeticiones' ejecuciones y el último resultado."""
+    mejor, resultado = float("inf"), None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    n_dominios = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n_reglas = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    repeticiones = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    dominios = generar_dominios(n_dominios)
+    exactas, todas = generar_reglas(dominios, n_reglas)
+    print(f"{len(dominios)} dominios ({len(set(dominios))} distintos), {len(todas)} reglas")
+
+    t_lista, con_lista = medir(lambda: filter_excluded(dominios, exactas), repeticiones)
+    t_compilar, matcher_exactas = medir(lambda: compile_exclusions(exactas), repeticiones)
+    t_exactas, con_matcher = medir(lambda: filter_domains(dominios, matcher_exactas), repeticiones)
+    if list(dict.fromkeys(con_lista)) != con_matcher:
+        print("ERROR: el filtrado con lista y con ExclusionMatcher difieren")
+        return 1
+
+    matcher = compile_exclusions(todas)
+    t_todas, resultado = medir(lambda: filter_domains(dominios, matcher), repeticiones)
+
+    print(f"lista (solo exactas):              {t_lista * 1000:9.2f} ms -> {len(con_lista)} dominios")
+    print(f"compilar reglas exactas:           {t_compilar * 1000:9.2f} ms")
+    print(f"ExclusionMatcher (solo exactas):   {t_exactas * 1000:9.2f} ms -> {len(con_matcher)} dominios")
+    print(f"ExclusionMatcher (todas):          {t_todas * 1000:9.2f} ms -> {len(resultado)} dominios")
+    print(f"Aceleración: x{t_lista / t_exactas:.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""
+Banco de pruebas de rendimiento con una flota sintética de Hestia y Cloudflare.
+- Genera en un directorio de trabajo usuarios, dominios web (con alias) y zonas sintéticos:
+  * shared_data.json: datos del servidor de depuración (tests/debug_api_server)
+  * data/users/<usuario>/{user.conf,web.conf}: HESTIA_DATA_DIR para el backend native
+  * bin/v-list-users, bin/v-list-web-domains, bin/v-update-sys-ip: scripts falsos que devuelven
+    JSON pregenerado y registran cada invocación (los debug_v-list-* con jq son demasiado lentos
+    para miles de dominios)
+- Levanta el servidor de depuración con DEBUG_SHARED_DATA_PATH apuntando a la flota y ejecuta
+  hestia-pppoe/main.py en tres escenarios:
+  * cold: sin estado ni cachés (--force)
+  * reconnect: IP nueva, con el estado y las cachés de la ejecución anterior
+  * noop: misma IP, sin cambios
+- Por escenario informa tiempo total, peticiones por endpoint (/debug/stats), procesos lanzados
+  por la CLI de Hestia y RSS máximo del proceso.
+- Guarda los resultados en JSON junto al commit actual; --compare muestra la diferencia con otro resultado.
+- Uso: python benchmark_fleet.py [--users 100] [--domains 10000] [--zones 2000] [--aliases 1]
+       [--backend auto|native|cli] [--faults JSON] [--output resultados.json] [--compare anterior.json]
+       [--workdir DIR]
+- Requiere: Flask (servidor de depuración) y las dependencias de hestia-pppoe
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+APP_DIR = ROOT_DIR / "hestia-pppoe"
+
+FAKE_CLI_SCRIPTS = {
+    "v-list-users": 'cat "$FLEET_DIR/cli/users.json"',
+    "v-list-web-domains": 'cat "$FLEET_DIR/cli/web/$1.json" 2>/dev/null || { echo "Usuario no encontrado: $1" >&2; exit 3; }',
+    "v-update-sys-ip": 'exit 0',
+}
+
+SCENARIOS = (
+    ("cold", "203.0.113.10", ["--force"]),
+    ("reconnect", "203.0.113.20", []),
+    ("noop", "203.0.113.20", []),
+)
+
+
+def generate_fleet(workdir, users, domains, zones, aliases, missing_ratio=0.02, old_ip="198.51.100.1", seed=42):
+    """
+    Genera la flota sintética en 'workdir'. El dominio i pertenece a la zona i % zones (el primero
+    de cada zona es el propio apex) y al usuario i % users. Cada nombre (dominio y alias) tiene un
+    registro A en Cloudflare con 'old_ip', salvo un 'missing_ratio' que no tiene registro.
+    """
+    rnd = random.Random(seed)
+    workdir = Path(workdir)
+    nombres_usuarios = [f"usuario{u}" for u in range(users)]
+    nombres_zonas = [f"zona{z}.test" for z in range(zones)]
+
+    web_por_usuario = {u: {} for u in nombres_usuarios}
+    registros_por_zona = {z: [] for z in nombres_zonas}
+    total_nombres = 0
+    for i in range(domains):
+        zona = nombres_zonas[i % zones]
+        dominio = zona if i < zones else f"sitio{i}.{zona}"
+        alias = [("www." if k == 0 else f"alias{k}.") + dominio for k in range(aliases)]
+        web_por_usuario[nombres_usuarios[i % users]][dominio] = alias
+        for nombre in [dominio] + alias:
+            total_nombres += 1
+            if rnd.random() >= missing_ratio:
+                registros_por_zona[zona].append({"name": nombre, "content": old_ip})
+
+    shared = {
+        "current_ip_services_ip": old_ip,
+        "cloudflare_domains": registros_por_zona,
+        "hestia_user_names": nombres_usuarios,
+        "hestia_user_web_domains": {
+            u: [{"DOMAIN": d, "IP": old_ip} for d in web] for u, web in web_por_usuario.items()
+        },
+    }
+    (workdir / "shared_data.json").write_text(json.dumps(shared))
+
+    # Backend native: HESTIA_DATA_DIR/users/<usuario>/{user.conf,web.conf}
+    for usuario, web in web_por_usuario.items():
+        user_dir = workdir / "data" / "users" / usuario
+        user_dir.mkdir(parents=True, exist_ok=True)
+        (user_dir / "user.conf").write_text(f"NAME='{usuario}' PACKAGE='default' SUSPENDED='no'\n")
+        (user_dir / "web.conf").write_text("".join(
+            f"DOMAIN='{d}' IP='{old_ip}' ALIAS='{','.join(a)}' TPL='default' SUSPENDED='no'\n" for d, a in web.items()
+        ))
+
+    # Backend cli: JSON pregenerado y scripts que lo devuelven registrando cada invocación
+    web_dir = workdir / "cli" / "web"
+    web_dir.mkdir(parents=True, exist_ok=True)
+    (workdir / "cli" / "users.json").write_text(json.dumps({u: {"NAME": u} for u in nombres_usuarios}))
+    for usuario, web in web_por_usuario.items():
+        (web_dir / f"{usuario}.json").write_text(json.dumps({d: {"ALIAS": ",".join(a)} for d, a in web.items()}))
+    bin_dir = workdir / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    for nombre, cuerpo in FAKE_CLI_SCRIPTS.items():
+        script = bin_dir / nombre
+        script.write_text(
+            "#!/bin/sh\n"
+            f'FLEET_DIR="{workdir}"\n'
+            f'echo "{nombre}" >> "$FLEET_DIR/calls.log"\n'
+            f"{cuerpo}\n"
+        )
+        script.chmod(0o755)
+
+    return {"users": users, "domains": domains, "zones": zones, "aliases": aliases,
+            "hostnames": total_nombres, "a_records": sum(len(r) for r in registros_por_zona.values())}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _http(url, data=None):
+    """GET (o POST con JSON si se indica 'data') al servidor de depuración; devuelve el JSON de respuesta."""
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read() or b"null")
+
+
+def start_server(shared_data_path, port, log_path, faults=None):
+    """Levanta tests/debug_api_server con la flota (y opcionalmente fallos inyectados) y espera a que responda."""
+    # Modo production: waitress si está instalado, si no el servidor multihilo de Werkzeug.
+    # Las conexiones cortadas (drop_rate) solo se simulan con Werkzeug: en ese caso se usa el modo threaded
+    env = dict(os.environ, DEBUG_SHARED_DATA_PATH=str(shared_data_path), PORT=str(port))
+    env.setdefault("DEBUG_SERVER_MODE", "threaded" if faults and '"drop_rate"' in faults else "production")
+    if faults:
+        env["DEBUG_FAULTS"] = faults
+    with open(log_path, "w") as log:
+        proceso = subprocess.Popen([sys.executable, "-m", "tests.debug_api_server.main"], cwd=ROOT_DIR, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+    limite = time.monotonic() + 120
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor de depuración terminó con código {proceso.returncode} (ver {log_path})")
+        try:
+            _http(f"http://127.0.0.1:{port}/debug/stats")
+            return proceso
+        except OSError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError("El servidor de depuración no respondió a tiempo")
+
+
+def run_scenario(workdir, port, backend, args, extra_env):
+    """Ejecuta main.py una vez y devuelve sus métricas."""
+    workdir = Path(workdir)
+    base = f"http://127.0.0.1:{port}"
+    calls_log = workdir / "calls.log"
+    calls_log.write_text("")
+    _http(f"{base}/debug/stats/reset", data={})
+
+    env = dict(os.environ)
+    env.update({
+        "CLOUDFLARE_API_TOKEN": "prueba-token-benchmark",
+        "CLOUDFLARE_API_BASE_URL": f"{base}/client/v4",
+        "IP_SERVICE_URLS": f"{base}/ip",
+        "V_LIST_USERS_PATH": str(workdir / "bin" / "v-list-users"),
+        "V_LIST_WEB_DOMAINS_PATH": str(workdir / "bin" / "v-list-web-domains"),
+        "V_UPDATE_SYS_IP_PATH": str(workdir / "bin" / "v-update-sys-ip"),
+        "HESTIA_DATA_DIR": str(workdir / "data"),
+        "HESTIA_INVENTORY_BACKEND": backend,
+        "STATE_DIR": str(workdir / "state"),
+        "RUN_DEBOUNCE_SECONDS": "0",
+        "LOG_LEVEL": "WARNING",
+    })
+    env.update(extra_env)
+
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, "main.py", *args], cwd=APP_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, uso = os.wait4(proceso.pid, 0)
+    duracion = time.perf_counter() - inicio
+    proceso.returncode = os.waitstatus_to_exitcode(status)
+    stderr = proceso.stderr.read().decode(errors="replace")
+    proceso.stderr.close()
+
+    llamadas = {}
+    for linea in calls_log.read_text().splitlines():
+        llamadas[linea] = llamadas.get(linea, 0) + 1
+    stats = _http(f"{base}/debug/stats")
+    # Duración de cada fase según el reporte de la propia ejecución (RUN_REPORT_PATH)
+    try:
+        fases = json.loads((workdir / "state" / "run_report.json").read_text()).get("phases", {})
+    except (OSError, ValueError):
+        fases = {}
+    return {
+        "exit_code": proceso.returncode,
+        "wall_seconds": round(duracion, 3),
+        "requests_total": stats["total"],
+        "requests": dict(sorted(stats["requests"].items())),
+        "subprocesses": sum(llamadas.values()),
+        "subprocess_calls": llamadas,
+        # ru_maxrss está en KiB en Linux
+        "peak_rss_kb": uso.ru_maxrss,
+        "phase_seconds": {nombre: f["duration"] for nombre, f in fases.items()},
+        "stderr_tail": stderr.strip().splitlines()[-5:],
+    }
+
+
+def git_revision():
+    """Commit actual y si el árbol tiene cambios sin confirmar."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(anterior, actual):
+    """Muestra la diferencia por escenario entre dos resultados."""
+    print(f"\nComparación {anterior.get('commit')} -> {actual.get('commit')}")
+    for nombre, nuevo in actual["scenarios"].items():
+        viejo = anterior.get("scenarios", {}).get(nombre)
+        if not viejo:
+            continue
+        print(f"  {nombre}:")
+        for clave in ("wall_seconds", "requests_total", "subprocesses", "peak_rss_kb"):
+            a, b = viejo.get(clave), nuevo.get(clave)
+            if a is None or b is None:
+                continue
+            delta = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            print(f"    {clave:15} {a:>12} -> {b:>12}  ({delta})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento con una flota sintética")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--domains", type=int, default=10000)
+    parser.add_argument("--zones", type=int, default=2000)
+    parser.add_argument("--aliases", type=int, default=1, help="Alias por dominio (www. y aliasN.)")
+    parser.add_argument("--missing-ratio", type=float, default=0.02, help="Fracción de nombres sin registro A")
+    parser.add_argument("--backend", default="auto", choices=("auto", "native", "cli"))
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="Usar el limitador de tasa configurado (por defecto se desactiva para medir el cliente)")
+    parser.add_argument("--faults", help="Configuración JSON de fallos del servidor de depuración (ver DEBUG_FAULTS)")
+    parser.add_argument("--workdir", help="Directorio de la flota (por defecto uno temporal que se elimina al terminar)")
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto benchmark_fleet_<commit>.json)")
+    parser.add_argument("--compare", help="Resultado anterior con el que comparar")
+    args = parser.parse_args()
+    args.zones = max(min(args.zones, args.domains), 1)
+    args.users = max(min(args.users, args.domains), 1)
+
+    temporal = args.workdir is None
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="hestia-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    shutil.rmtree(workdir / "state", ignore_errors=True)
+
+    extra_env = {}
+    if not args.rate_limit:
+        # La ráfaga debe quedar muy por debajo de las peticiones por ventana: el limitador se recarga a
+        # (peticiones - ráfaga) / ventana tokens por segundo, y con ráfaga igual a las peticiones la
+        # recarga sería de 1 token/s (tras un 429 el cliente quedaría a 1 petición por segundo)
+        extra_env.update({"CLOUDFLARE_RATE_LIMIT_REQUESTS": "100000000", "CLOUDFLARE_RATE_LIMIT_WINDOW": "1",
+                          "CLOUDFLARE_RATE_LIMIT_BURST": "10000"})
+
+    print(f"Generando flota en {workdir}...")
+    flota = generate_fleet(workdir, args.users, args.domains, args.zones, args.aliases, args.missing_ratio)
+    print(f"  {flota['users']} usuarios, {flota['domains']} dominios, {flota['hostnames']} nombres, "
+          f"{flota['zones']} zonas, {flota['a_records']} registros A")
+
+    port = _free_port()
+    servidor = start_server(workdir / "shared_data.json", port, workdir / "server.log", faults=args.faults)
+    escenarios = {}
+    try:
+        for nombre, ip, main_args in SCENARIOS:
+            _http(f"http://127.0.0.1:{port}/debug/ip", data={"ip": ip})
+            resultado = run_scenario(workdir, port, args.backend, main_args, extra_env)
+            escenarios[nombre] = resultado
+            print(f"  {nombre:10} rc={resultado['exit_code']} {resultado['wall_seconds']:8.3f}s "
+                  f"{resultado['requests_total']:6} peticiones {resultado['subprocesses']:5} procesos "
+                  f"{resultado['peak_rss_kb'] / 1024:7.1f} MiB")
+            if resultado["phase_seconds"]:
+                print("             " + ", ".join(f"{f} {d:.2f}s" for f, d in resultado["phase_seconds"].items()))
+            if resultado["exit_code"] != 0:
+                print("    " + "\n    ".join(resultado["stderr_tail"]))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+        if temporal:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    commit, dirty = git_revision()
+    resultados = {
+        "commit": commit,
+        "dirty": dirty,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "backend": args.backend,
+        "rate_limit": args.rate_limit,
+        "faults": json.loads(args.faults) if args.faults else None,
+        "fleet": flota,
+        "scenarios": escenarios,
+    }
+    salida = Path(args.output or f"benchmark_fleet_{commit or 'sin-commit'}.json")
+    salida.write_text(json.dumps(resultados, indent=2, ensure_ascii=False))
+    print(f"Resultados guardados en {salida}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), resultados)
+    return 0 if all(r["exit_code"] == 0 for r in escenarios.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
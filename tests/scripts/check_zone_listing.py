@@ -0,0 +1,71 @@
+"""
+Script para verificar que cada ejecución lista las zonas de Cloudflare una sola vez, sin importar
+cuántos dominios gestione Hestia.
+- Genera con benchmark_fleet dos flotas con las mismas zonas (más de una página de GET /zones) y
+  distinta cantidad de dominios (1 y N), ejecuta hestia-pppoe/main.py --force contra el servidor de
+  depuración y cuenta las peticiones a GET /client/v4/zones de cada una (/debug/stats).
+- Uso: python check_zone_listing.py [--zones 120] [--domains 2000]
+- Requiere: Flask (servidor de depuración) y las dependencias de hestia-pppoe
+- Sale con código 1 si la cantidad de peticiones difiere o no corresponde a un único recorrido paginado.
+"""
+import argparse
+import math
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from benchmark_fleet import generate_fleet, start_server, run_scenario, _free_port  # noqa: E402
+
+ZONES_ENDPOINT = "GET /client/v4/zones"
+# Tamaño de página que pide el cliente (cloudflare_dns.ZONES_MAX_PER_PAGE)
+ZONES_PER_PAGE = 50
+# Limitador de tasa sin efecto: solo interesa contar peticiones. La ráfaga queda muy por debajo de
+# las peticiones por ventana para que la recarga sea prácticamente instantánea (ver rate_limiter)
+NO_RATE_LIMIT_ENV = {"CLOUDFLARE_RATE_LIMIT_REQUESTS": "100000000", "CLOUDFLARE_RATE_LIMIT_WINDOW": "1",
+                     "CLOUDFLARE_RATE_LIMIT_BURST": "10000"}
+
+
+def count_zone_listings(domains, zones):
+    """Ejecuta una vez main.py con una flota de 'domains' dominios y devuelve las peticiones a GET /zones."""
+    workdir = Path(tempfile.mkdtemp(prefix="hestia-zonas-"))
+    try:
+        generate_fleet(workdir, users=min(10, domains), domains=domains, zones=zones, aliases=0, missing_ratio=0)
+        port = _free_port()
+        servidor = start_server(workdir / "shared_data.json", port, workdir / "server.log")
+        try:
+            resultado = run_scenario(workdir, port, "native", ["--force"], NO_RATE_LIMIT_ENV)
+        finally:
+            servidor.terminate()
+            servidor.wait()
+        if resultado["exit_code"] != 0:
+            print("\n".join(resultado["stderr_tail"]))
+            raise RuntimeError(f"main.py terminó con código {resultado['exit_code']} ({domains} dominios)")
+        return resultado["requests"].get(ZONES_ENDPOINT, 0)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica que las zonas se listan una sola vez por ejecución")
+    parser.add_argument("--zones", type=int, default=120)
+    parser.add_argument("--domains", type=int, default=2000)
+    args = parser.parse_args()
+
+    paginas = math.ceil(args.zones / ZONES_PER_PAGE)
+    uno = count_zone_listings(1, args.zones)
+    muchos = count_zone_listings(max(args.domains, args.zones), args.zones)
+    print(f"{ZONES_ENDPOINT}: {uno} peticiones con 1 dominio, {muchos} con {max(args.domains, args.zones)} dominios "
+          f"({args.zones} zonas, {paginas} páginas)")
+
+    if uno == muchos == paginas:
+        print("OK: una sola consulta paginada de zonas por ejecución")
+        return 0
+    print("ERROR: la cantidad de consultas de zonas depende de los dominios o repite páginas")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
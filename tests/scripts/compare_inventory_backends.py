@@ -0,0 +1,40 @@
+"""
+Script para verificar que los backends de inventario de Hestia (native y cli) producen el mismo resultado.
+- Usa los datos de prueba de tests/debug_hestia_cli: data/users/*/{user.conf,web.conf} para el backend
+  native y los scripts debug_v-list-* (que leen debug_shared_data.json) para el backend cli.
+- Requiere: jq (lo usan los scripts debug_v-list-*)
+- Uso: python compare_inventory_backends.py [HESTIA_DATA_DIR]
+- Sale con código 1 si los inventarios difieren.
+"""
+import json
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+DEBUG_CLI_DIR = ROOT_DIR / "tests" / "debug_hestia_cli"
+sys.path.insert(0, str(ROOT_DIR / "hestia-pppoe"))
+
+from hestia_inventory import collect_inventory  # noqa: E402
+
+
+def main():
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else str(DEBUG_CLI_DIR / "data")
+    users_cmd = str(DEBUG_CLI_DIR / "debug_v-list-users")
+    domains_cmd = str(DEBUG_CLI_DIR / "debug_v-list-web-domains")
+
+    native = collect_inventory("native", data_dir=data_dir)
+    cli = collect_inventory("cli", users_cmd=users_cmd, domains_cmd=domains_cmd)
+
+    if native == cli:
+        total = sum(len(dominios) for dominios in native.values())
+        print(f"OK: ambos backends devuelven {len(native)} usuarios y {total} dominios")
+        return 0
+
+    print("ERROR: los inventarios difieren")
+    print("native:", json.dumps(native, indent=2, ensure_ascii=False))
+    print("cli:", json.dumps(cli, indent=2, ensure_ascii=False))
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -34,6 +34,11 @@ Write-Log "`n3. Probando listar zonas CON autenticación:"
 $result = curl.exe -s -v -H "Authorization: Bearer $token" "http://$server/client/v4/zones" 2>&1
 Write-Log ($result -join "`n")
 
+# 3.1 Listar zonas paginadas (segunda página de a 2 zonas)
+Write-Log "`n3.1 Probando listar zonas paginadas (page=2, per_page=2):"
+$result = curl.exe -s -v -H "Authorization: Bearer $token" "http://$server/client/v4/zones?page=2&per_page=2" 2>&1
+Write-Log ($result -join "`n")
+
 # 4. Listar registros DNS
 Write-Log "`n4. Probando listar registros DNS:"
 $result = curl.exe -s -v -H "Authorization: Bearer $token" "http://$server/client/v4/zones/$zoneId/dns_records" 2>&1